@@ -0,0 +1,121 @@
+"""
+Read latency during a login flood, with and without admission control.
+
+Two servers run one after the other: "off" (ADMISSION_AUTH_CONCURRENCY=0, no
+limit on concurrent auth requests) and "on" (the current environment's
+settings). Both run with the rate limits off, because the flood comes from
+one address. Each server is measured twice. First, readers alone fetch
+dashboards and invoice pages. Then the same readers run while --flood
+connections log in as fast as they can.
+
+    python -m benchmarks.seed --users 1000 --invoices 1000000
+    python -m benchmarks.admission --readers 20 --flood 200 --duration 20
+
+Reports read p50 / p95 / p99 for each phase, and the login status counts
+and p50 during the flood.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, bench_email
+from utils.security import create_access_token
+
+
+def start(env: dict, port: int, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ, OUTBOX_SENDER="0", ADMISSION_CLIENT_RATE="0",
+                 ADMISSION_EMAIL_RATE="0", **env),
+    )
+    for _ in range(600):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not come up within 60s")
+
+
+def percentiles(samples: list) -> dict:
+    if len(samples) < 2:
+        return {"count": len(samples)}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "count": len(samples),
+        "p50_ms": round(cuts[49] * 1000, 1),
+        "p95_ms": round(cuts[94] * 1000, 1),
+        "p99_ms": round(cuts[98] * 1000, 1),
+    }
+
+
+async def phase(base_url: str, args, flood: int) -> dict:
+    reads, logins, statuses = [], [], {}
+    deadline = time.perf_counter() + args.duration
+
+    async def reader(client):
+        while time.perf_counter() < deadline:
+            user_id = random.randint(1, args.users)
+            token = create_access_token({"sub": bench_email(user_id), "role": "user", "id": user_id})
+            path = random.choice([f"/users/{user_id}/dashboard", f"/users/{user_id}/invoices/?limit=50"])
+            start = time.perf_counter()
+            response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+            response.raise_for_status()
+            reads.append(time.perf_counter() - start)
+
+    async def login(client):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/users/login", json={
+                "email": bench_email(random.randint(1, args.users)), "password": BENCH_PASSWORD,
+            })
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                logins.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=args.readers + flood)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(
+            [reader(client) for _ in range(args.readers)] + [login(client) for _ in range(flood)]
+        ))
+    result = {"reads": percentiles(reads)}
+    if flood:
+        result["logins"] = {"status": statuses, "ok": percentiles(logins)}
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--flood", type=int, default=200, help="concurrent login connections")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per phase")
+    parser.add_argument("--users", type=int, default=1000, help="bench users to pick from")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8774)
+    args = parser.parse_args()
+
+    results = {}
+    for name, env in (("off", {"ADMISSION_AUTH_CONCURRENCY": "0"}), ("on", {})):
+        server = start(env, args.port, args.workers)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            results[name] = {
+                "reads alone": asyncio.run(phase(base_url, args, 0)),
+                "during flood": asyncio.run(phase(base_url, args, args.flood)),
+            }
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,119 @@
+"""
+Cold-start latency: how long a process takes to import the app, how long a
+uvicorn process takes from spawn to its first response under each
+SCHEMA_MODE, and how long gunicorn takes to bring an extra worker online
+(TTIN) with and without preload_app.
+
+    python -m benchmarks.boot --runs 5
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+READY_LINE = "Application startup complete"
+
+
+def _median(samples) -> float:
+    return round(statistics.median(samples), 1)
+
+
+def import_ms(runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            capture_output=True, text=True, check=True
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return _median(samples)
+
+
+def uvicorn_boot_ms(schema_mode: str, runs: int, port: int) -> float:
+    env = dict(os.environ, SCHEMA_MODE=schema_mode, OUTBOX_SENDER="0")
+    base_url = f"http://127.0.0.1:{port}"
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                try:
+                    httpx.get(base_url + "/", timeout=1).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if server.poll() is not None:
+                        raise RuntimeError("uvicorn exited during startup")
+                    time.sleep(0.01)
+            samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            server.terminate()
+            server.wait()
+    return _median(samples)
+
+
+def gunicorn_worker_boot_ms(preload: bool, schema_mode: str, runs: int, port: int) -> float:
+    env = dict(
+        os.environ, PORT=str(port), WEB_CONCURRENCY="1", OUTBOX_SENDER="0",
+        PRELOAD_APP="1" if preload else "0", SCHEMA_MODE=schema_mode,
+    )
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app",
+         "--log-level", "info"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    lines = queue.Queue()
+    threading.Thread(
+        target=lambda: [lines.put(line) for line in master.stderr], daemon=True
+    ).start()
+
+    def wait_ready():
+        while READY_LINE not in lines.get(timeout=60):
+            pass
+
+    samples = []
+    try:
+        wait_ready()
+        for _ in range(runs):
+            start = time.perf_counter()
+            master.send_signal(signal.SIGTTIN)  # fork one more worker
+            wait_ready()
+            samples.append((time.perf_counter() - start) * 1000)
+            master.send_signal(signal.SIGTTOU)
+    finally:
+        master.terminate()
+        master.wait()
+    return _median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    results = {"import_ms": import_ms(args.runs), "uvicorn_boot_ms": {}, "gunicorn_worker_boot_ms": {}}
+    for mode in ("create", "check", "skip"):
+        results["uvicorn_boot_ms"][mode] = uvicorn_boot_ms(mode, args.runs, args.port)
+    for preload in (False, True):
+        key = "preload" if preload else "no_preload"
+        results["gunicorn_worker_boot_ms"][key] = gunicorn_worker_boot_ms(
+            preload, "create", args.runs, args.port
+        )
+    print(json.dumps(results, indent=2))
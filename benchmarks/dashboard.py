@@ -0,0 +1,100 @@
+"""
+Admin dashboard benchmark: the original ten-query implementation against the
+single-pass aggregate in routes/admin.py.
+
+    python -m benchmarks.seed --invoices 5000000
+    python -m benchmarks.dashboard --runs 20
+
+Reports statements issued per call and p50/p95 latency for each variant.
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import case, event, func, select
+
+from database import async_engine, engine, session_scope
+from models import Invoice
+from routes.admin import compute_dashboard
+
+
+def legacy_dashboard(db):
+    """The pre-aggregation dashboard, kept verbatim as the baseline."""
+    today = date.today()
+    week_end = today + timedelta(days=7)
+    db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(
+        Invoice.status == "Pending").scalar()
+    db.query(Invoice).filter(
+        Invoice.due_date == today, Invoice.status == "Pending").count()
+    db.query(Invoice).filter(
+        Invoice.status == "Paid",
+        func.date_part("month", Invoice.issue_date) == today.month,
+        func.date_part("year", Invoice.issue_date) == today.year).count()
+    db.query(Invoice).filter(
+        Invoice.due_date < today, Invoice.status == "Pending").count()
+    db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(
+        Invoice.due_date.between(today, week_end),
+        Invoice.status == "Pending").scalar()
+    db.query(Invoice).filter(
+        Invoice.due_date < today, Invoice.status == "Pending"
+    ).order_by(Invoice.due_date.asc()).limit(3).all()
+    db.query(
+        func.to_char(Invoice.issue_date, 'Mon').label("month"),
+        func.sum(case((Invoice.status == "Paid", Invoice.amount), else_=0)),
+        func.sum(case((Invoice.status == "Pending", Invoice.amount), else_=0))
+    ).group_by("month").order_by("month").all()
+    db.query(func.count()).filter(Invoice.status == "Paid").scalar()
+    db.query(func.count()).filter(
+        Invoice.status == "Pending", Invoice.due_date >= today).scalar()
+    db.query(func.count()).filter(
+        Invoice.status == "Pending", Invoice.due_date < today).scalar()
+
+
+async def measure(fn, runs: int) -> dict:
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+    for target in engines:
+        event.listen(target, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(runs + 1):
+            async with session_scope() as db:
+                start = time.perf_counter()
+                await fn(db)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", count)
+
+    timings = sorted(timings[1:])  # first call warms the cache
+    return {
+        "queries_per_call": statements // (runs + 1),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+    }
+
+
+async def main(runs: int) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(select(func.count()).select_from(Invoice)).scalar()
+    return {
+        "invoices": rows,
+        "legacy": await measure(lambda db: db.run_sync(legacy_dashboard), runs),
+        "single_pass": await measure(compute_dashboard, runs),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.runs)), indent=2))
@@ -0,0 +1,83 @@
+"""
+A/B throughput of DB_MODE=async (asyncpg) against DB_MODE=sync (psycopg2 in
+the threadpool). Each mode gets its own uvicorn process; the same read-heavy
+request mix is then driven at a fixed concurrency.
+
+    python -m benchmarks.seed --invoices 1000000
+    python -m benchmarks.db_modes --concurrency 200 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from utils.security import create_access_token
+
+
+async def drive(base_url: str, concurrency: int, duration: float, users: int) -> dict:
+    token = create_access_token({"sub": "bench1@example.com", "role": "admin", "id": 1})
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = [
+        "/users/{uid}/invoices/?limit=50",
+        "/reminders/user/{uid}/reminders",
+        "/users/{uid}/invoices/?limit=10",
+    ]
+    done = errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        nonlocal done, errors
+        i = n
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30) as client:
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)].format(uid=i % users + 1)
+                i += concurrency
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"requests": done, "errors": errors, "rps": round(done / elapsed, 1)}
+
+
+def run_mode(mode: str, args) -> dict:
+    env = dict(os.environ, DB_MODE=mode, DASHBOARD_CACHE_SIZE="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(base_url + "/")
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        return asyncio.run(drive(base_url, args.concurrency, args.duration, args.users))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    results = {mode: run_mode(mode, args) for mode in ("sync", "async")}
+    print(json.dumps(results, indent=2))
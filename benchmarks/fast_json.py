@@ -0,0 +1,98 @@
+"""
+Large list responses with FAST_JSON=0 (ORM objects validated into the
+response model) against FAST_JSON=1 (column tuples dumped by orjson). Both
+servers run side by side and are called alternately with the same requests;
+bodies and X-Next-Cursor headers must match byte for byte, or the run fails.
+
+    python -m benchmarks.seed --users 200 --invoices 300000
+    python -m benchmarks.fast_json --runs 20
+
+Reports p50 / p95 latency and body size per endpoint.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.security import create_access_token
+
+ENDPOINTS = [
+    "/admin/invoices?limit=1000",
+    "/users/{uid}/invoices/?limit=1000",
+    "/users/{uid}/invoices/?stream=true",
+    "/reminders/admin/reminders?limit=1000",
+    "/reminders/user/{uid}/reminders",
+]
+
+
+def start(fast: bool, port: int) -> subprocess.Popen:
+    env = dict(os.environ, FAST_JSON="1" if fast else "0", OUTBOX_SENDER="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(600):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn did not come up")
+
+
+def measure(clients: dict, path: str, runs: int) -> dict:
+    samples = {name: [] for name in clients}
+    bodies = {}
+    for _ in range(runs):
+        for name, client in clients.items():
+            start = time.perf_counter()
+            response = client.get(path)
+            samples[name].append(time.perf_counter() - start)
+            response.raise_for_status()
+            bodies[name] = (response.content, response.headers.get(NEXT_CURSOR_HEADER))
+    if bodies["default"] != bodies["fast"]:
+        raise RuntimeError(f"{path}: FAST_JSON=1 returned a different body or cursor")
+
+    def ms(values, q):
+        return round(statistics.quantiles(values, n=100)[q - 1] * 1000, 1) if len(values) > 1 else round(values[0] * 1000, 1)
+
+    result = {"bytes": len(bodies["fast"][0])}
+    for name, values in samples.items():
+        result[name] = {"p50_ms": ms(values, 50), "p95_ms": ms(values, 95)}
+    result["speedup_p50"] = round(result["default"]["p50_ms"] / result["fast"]["p50_ms"], 2)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--user", type=int, default=1, help="user whose lists are fetched")
+    parser.add_argument("--port", type=int, default=8770)
+    args = parser.parse_args()
+
+    token = create_access_token({"sub": "bench1@example.com", "role": "admin", "id": 1})
+    servers = {"default": start(False, args.port), "fast": start(True, args.port + 1)}
+    try:
+        clients = {
+            name: httpx.Client(base_url=f"http://127.0.0.1:{args.port + i}", timeout=120,
+                               headers={"Authorization": f"Bearer {token}"})
+            for i, name in enumerate(servers)
+        }
+        results = {}
+        for path in ENDPOINTS:
+            path = path.format(uid=args.user)
+            measure(clients, path, 2)  # warm both servers' caches and pools
+            results[path] = measure(clients, path, args.runs)
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,119 @@
+"""
+Server-side invoice filtering against what the frontend did before: download
+the whole list (?stream=true), then filter and sort it in the client. Each
+scenario fetches one 50-row page both ways and checks that both return the
+same rows.
+
+    python -m benchmarks.seed --users 1000 --invoices 1000000
+    python -m benchmarks.invoice_query --runs 10
+
+Reports bytes on the wire and p50 latency (client-side time includes parsing
+and filtering the download) per scenario.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.seed import customer_name
+from utils.security import create_access_token
+
+PAGE = 50
+
+
+def scenarios(user_id: int) -> list:
+    """(name, listing path, query params, client-side filter, sort key, descending)"""
+    today = date.today()
+    user = f"/users/{user_id}/invoices/"
+    return [
+        ("user: overdue, oldest first", user,
+         {"status": "Pending", "due_to": str(today - timedelta(days=1))},
+         lambda i: i["status"] == "Pending" and i["due_date"] < str(today),
+         lambda i: (i["due_date"], i["id"]), False),
+        ("user: over 2000, largest first", user,
+         {"amount_min": 2000, "sort": "-amount"},
+         lambda i: i["amount"] >= 2000,
+         lambda i: (i["amount"], i["id"]), True),
+        ("user: one customer", user,
+         {"customer_name": customer_name(user_id, 7)},
+         lambda i: i["customer_name"] == customer_name(user_id, 7),
+         lambda i: (i["due_date"], i["id"]), False),
+        ("user: due in the last 30 days, by amount", user,
+         {"due_from": str(today - timedelta(days=30)), "due_to": str(today), "sort": "amount"},
+         lambda i: str(today - timedelta(days=30)) <= i["due_date"] <= str(today),
+         lambda i: (i["amount"], i["id"]), False),
+        ("admin: pending, largest first", "/admin/invoices",
+         {"status": "Pending", "sort": "-amount"},
+         lambda i: i["status"] == "Pending",
+         lambda i: (i["amount"], i["id"]), True),
+    ]
+
+
+def client_side(client, path, keep, sort_key, descending):
+    response = client.get(path, params={"stream": "true"})
+    response.raise_for_status()
+    rows = [row for row in map(json.loads, response.content.splitlines()) if keep(row)]
+    rows.sort(key=sort_key, reverse=descending)
+    return len(response.content), [row["id"] for row in rows[:PAGE]]
+
+
+def server_side(client, path, params):
+    response = client.get(path, params={**params, "limit": PAGE})
+    response.raise_for_status()
+    return len(response.content), [row["id"] for row in response.json()]
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, round(statistics.median(samples) * 1000, 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--user", type=int, default=1, help="user whose invoices are queried")
+    parser.add_argument("--port", type=int, default=8772)
+    args = parser.parse_args()
+
+    token = create_access_token({"sub": "bench1@example.com", "role": "admin", "id": 1})
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=dict(os.environ, OUTBOX_SENDER="0"),
+    )
+    results = {}
+    try:
+        client = httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=300,
+                              headers={"Authorization": f"Bearer {token}"})
+        for _ in range(600):
+            try:
+                client.get("/").raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        for name, path, params, keep, sort_key, descending in scenarios(args.user):
+            (client_bytes, client_ids), client_ms = timed(
+                lambda: client_side(client, path, keep, sort_key, descending), args.runs)
+            (server_bytes, server_ids), server_ms = timed(
+                lambda: server_side(client, path, params), args.runs)
+            if client_ids != server_ids:
+                raise RuntimeError(f"{name}: server page differs from client-side filtering")
+            results[name] = {
+                "client_side": {"bytes": client_bytes, "p50_ms": client_ms},
+                "server_side": {"bytes": server_bytes, "p50_ms": server_ms},
+                "bytes_saved": f"{(1 - server_bytes / client_bytes) * 100:.1f}%",
+                "speedup_p50": round(client_ms / server_ms, 1),
+            }
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps(results, indent=2))
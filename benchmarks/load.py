@@ -0,0 +1,343 @@
+"""
+Whole-API load test: virtual users log in, open their dashboards, page
+through invoices and reminders and send reminders, at a fixed concurrency.
+Reports throughput and p50 / p95 / p99 latency per route and saves the run,
+tagged with the git commit, under benchmarks/results/ for later comparison.
+
+    python -m benchmarks.seed --users 1000 --invoices 1000000
+    python -m benchmarks.load --concurrency 50 --duration 60
+    python -m benchmarks.load --compare benchmarks/results/a.json benchmarks/results/b.json
+
+Without --url a uvicorn process is started for the run, with the current
+environment (DB_MODE, DB_POOL_SIZE, ...). The data must come from
+benchmarks.seed: virtual users log in as its bench users. A server given
+with --url needs ADMISSION_CLIENT_RATE=0 and ADMISSION_EMAIL_RATE=0, or its
+rate limits will refuse most of the logins.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, bench_email
+from utils.pagination import NEXT_CURSOR_HEADER
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Relative weight of each action in the mix; override with --mix name=weight
+DEFAULT_MIX = {
+    "login": 2,
+    "user_dashboard": 20,
+    "user_invoices": 25,
+    "user_reminders": 15,
+    "create_reminder": 8,
+    "user_trend": 5,
+    "admin_dashboard": 5,
+    "admin_invoices": 5,
+}
+# Environment worth recording with each run
+SERVER_SETTINGS = (
+    "DB_MODE", "DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_PGBOUNCER", "HASH_WORKERS",
+    "DASHBOARD_CACHE_SIZE", "WEB_CONCURRENCY",
+)
+
+
+class Recorder:
+    """Latency samples and status counts per route, for requests started in the window."""
+
+    def __init__(self, warmup: float, duration: float):
+        self.measure_from = time.perf_counter() + warmup
+        self.measure_until = self.measure_from + duration
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, route: str, started: float, status):
+        if not self.measure_from <= started < self.measure_until:
+            return
+        self.latencies.setdefault(route, []).append(time.perf_counter() - started)
+        statuses = self.statuses.setdefault(route, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "error" or status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self) -> dict:
+        elapsed = self.measure_until - self.measure_from
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            samples.sort()
+            routes[route] = {
+                "requests": len(samples),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": percentile_ms(samples, 50),
+                "p95_ms": percentile_ms(samples, 95),
+                "p99_ms": percentile_ms(samples, 99),
+                "max_ms": round(samples[-1] * 1000, 1),
+                "statuses": dict(sorted((str(k), v) for k, v in self.statuses[route].items())),
+            }
+        total = sum(r["requests"] for r in routes.values())
+        return {
+            "seconds": round(elapsed, 1),
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "rps": round(total / elapsed, 1),
+            "routes": routes,
+        }
+
+
+def percentile_ms(sorted_samples: list, pct: float) -> float:
+    """Nearest-rank percentile of sorted samples (seconds), in milliseconds."""
+    rank = max(math.ceil(len(sorted_samples) * pct / 100) - 1, 0)
+    return round(sorted_samples[rank] * 1000, 1)
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, user_id: int, admin_headers: dict):
+        self.client = client
+        self.recorder = recorder
+        self.user_id = user_id
+        self.admin_headers = admin_headers
+        self.headers = {}
+        self.invoice_ids = []
+        self.cursor = None
+
+    async def request(self, route: str, method: str, path: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(route, started, "error")
+            return None
+        self.recorder.record(route, started, response.status_code)
+        return response
+
+    # ---------- ACTIONS ----------
+
+    async def login(self):
+        response = await self.request("POST /users/login", "POST", "/users/login", json={
+            "email": bench_email(self.user_id), "password": BENCH_PASSWORD,
+        })
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def ensure_login(self, deadline: float):
+        # Logins shed by the hash queue (503) are retried after Retry-After,
+        # as a real client would, rather than carrying on unauthenticated
+        while not self.headers and time.perf_counter() < deadline:
+            response = await self.login()
+            if not self.headers:
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                await asyncio.sleep(float(retry_after or 1))
+
+    async def user_dashboard(self):
+        await self.request("GET /users/{user_id}/dashboard", "GET",
+                           f"/users/{self.user_id}/dashboard", headers=self.headers)
+
+    async def user_invoices(self):
+        # Carry on paging half the time, like someone scrolling
+        params = {"limit": 50}
+        if self.cursor and random.random() < 0.5:
+            params["after"] = self.cursor
+        response = await self.request("GET /users/{user_id}/invoices/", "GET",
+                                      f"/users/{self.user_id}/invoices/",
+                                      params=params, headers=self.headers)
+        if response is not None and response.status_code == 200:
+            self.cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            self.invoice_ids = [invoice["id"] for invoice in response.json()] or self.invoice_ids
+
+    async def user_reminders(self):
+        await self.request("GET /reminders/user/{user_id}/reminders", "GET",
+                           f"/reminders/user/{self.user_id}/reminders", headers=self.headers)
+
+    async def create_reminder(self):
+        if not self.invoice_ids:
+            await self.user_invoices()
+        if self.invoice_ids:
+            await self.request("POST /reminders/reminders/create", "POST",
+                               "/reminders/reminders/create", headers=self.headers, json={
+                                   "user_id": self.user_id,
+                                   "invoice_id": random.choice(self.invoice_ids),
+                               })
+
+    async def user_trend(self):
+        await self.request("GET /users/{user_id}/trend", "GET", f"/users/{self.user_id}/trend",
+                           params={"granularity": "month"}, headers=self.headers)
+
+    async def admin_dashboard(self):
+        await self.request("GET /admin/dashboard", "GET", "/admin/dashboard",
+                           headers=self.admin_headers)
+
+    async def admin_invoices(self):
+        await self.request("GET /admin/invoices", "GET", "/admin/invoices",
+                           params={"limit": 50}, headers=self.admin_headers)
+
+
+async def drive(base_url: str, args, mix: dict) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        admin = VirtualUser(client, Recorder(0, 0), 1, {})
+        await admin.ensure_login(time.perf_counter() + 30)
+        if not admin.headers:
+            raise RuntimeError("Admin login failed: seed the database with benchmarks.seed first")
+
+        recorder = Recorder(args.warmup, args.duration)
+        deadline = recorder.measure_until
+
+        async def run(n: int):
+            # Spread virtual users over the bench users, heavy accounts included
+            user = VirtualUser(client, recorder, n % args.users + 1, admin.headers)
+            while time.perf_counter() < deadline:
+                await user.ensure_login(deadline)
+                await getattr(user, random.choices(names, weights)[0])()
+
+        await asyncio.gather(*(run(n) for n in range(args.concurrency)))
+        return recorder.summary()
+
+
+def start_server(args) -> subprocess.Popen:
+    # Every virtual user logs in from this one address
+    env = dict(os.environ, OUTBOX_SENDER="0", ADMISSION_CLIENT_RATE="0", ADMISSION_EMAIL_RATE="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(600):
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not come up within 60s")
+
+
+def git_revision() -> dict:
+    def git(*command) -> str:
+        return subprocess.run(["git", *command], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    return {
+        "commit": git("rev-parse", "HEAD") or "unknown",
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def save(result: dict) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    commit = result["git"]["commit"][:10] + ("-dirty" if result["git"]["dirty"] else "")
+    path = RESULTS_DIR / f"{stamp}-{commit}{'-' + result['label'] if result['label'] else ''}.json"
+    path.write_text(json.dumps(result, indent=2) + "\n")
+    return path
+
+
+def print_table(summary: dict):
+    print(f"{'route':44} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, r in summary["routes"].items():
+        print(f"{route:44} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+    print(f"{'total':44} {summary['requests']:>7} {summary['errors']:>5} {summary['rps']:>8}")
+
+
+def compare(base_path: str, new_path: str):
+    """Per-route change in throughput and latency percentiles between two runs."""
+    base, new = (json.loads(Path(p).read_text()) for p in (base_path, new_path))
+    for name, run in (("base", base), ("new ", new)):
+        print(f"{name} {run['git']['commit'][:10]} {run['git']['subject']} "
+              f"{run['label']} {json.dumps(run['config']['server'])}")
+    print()
+
+    def delta(old, current) -> str:
+        if not old:
+            return "n/a"
+        return f"{(current - old) / old * 100:+.1f}%"
+
+    print(f"{'route':44} {'rps':>16} {'p50':>16} {'p95':>16} {'p99':>16}")
+    routes = dict(base["summary"]["routes"])
+    for route, r in new["summary"]["routes"].items():
+        old = routes.get(route)
+        if old is None:
+            print(f"{route:44} (new route)")
+            continue
+        cells = [f"{r[k]:>8} {delta(old[k], r[k]):>7}" for k in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{route:44} " + " ".join(cells))
+    print(f"{'total rps':44} {new['summary']['rps']:>8} "
+          f"{delta(base['summary']['rps'], new['summary']['rps']):>7}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown action {name!r}; one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="unmeasured seconds first")
+    parser.add_argument("--users", type=int, default=1000, help="bench users seeded")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="action weights, e.g. login=0,create_reminder=20")
+    parser.add_argument("--url", help="target an already running server instead")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--label", default="", help="appended to the results file name")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the action mix")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    random.seed(args.seed)
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    server = None if args.url else start_server(args)
+    try:
+        summary = asyncio.run(drive(args.url or f"http://127.0.0.1:{args.port}", args, args.mix))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result = {
+        "git": git_revision(),
+        "label": args.label,
+        "started_at": started_at,
+        "host": {"python": platform.python_version(), "machine": platform.machine(),
+                 "cpus": os.cpu_count()},
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "users": args.users, "mix": args.mix, "url": args.url, "workers": args.workers,
+            "server": {name: os.environ[name] for name in SERVER_SETTINGS if name in os.environ},
+        },
+        "summary": summary,
+    }
+    print_table(summary)
+    if not args.no_save:
+        print(f"\nSaved {save(result)}")
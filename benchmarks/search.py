@@ -0,0 +1,99 @@
+"""
+Invoice search latency on seeded data: exact and partial invoice numbers,
+customer-name prefixes, words and typos, admin-wide and per user.
+
+    python -m benchmarks.seed --users 1000 --invoices 10000000
+    python -m benchmarks.search --runs 20
+
+Reports p50 / p95, the number of hits and the indexes of `invoices` the plan
+used (partition indexes are reported by their parent's name). Without pg_trgm on the server the unindexed ILIKE fallback is
+measured instead (and typo queries find nothing).
+"""
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+
+from benchmarks.seed import customer_name
+from database import engine
+from utils.search import search_statement
+
+
+def queries(user_id: int) -> list:
+    """(name, q, user_id or None)"""
+    name = customer_name(user_id, 3)
+    first, second = name.split()[:2]
+    typo = first[:-2] + first[-1] + " " + second  # one dropped letter; two fall below the threshold
+    return [
+        ("exact invoice number", f"INV-{user_id}-17", None),
+        ("invoice number prefix", f"INV-{user_id}-1", None),
+        ("customer prefix", first[:5], None),
+        ("customer word", second.lower(), None),
+        ("customer typo", typo, None),
+        ("customer word, one user", second.lower(), user_id),
+        ("customer typo, one user", typo, user_id),
+    ]
+
+
+def measure(conn, q, user_id, trigram, runs):
+    stmt = search_statement(q, trigram, user_id)
+    compiled = stmt.compile(dialect=conn.dialect)
+    sql, params = str(compiled), compiled.params
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).scalar()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        hits = len(conn.exec_driver_sql(sql, params).all())
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "q": q,
+        "hits": hits,
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 2),
+        "indexes": plan_indexes(conn, plan),
+    }
+
+
+def plan_indexes(conn, plan) -> list:
+    """Indexes scanned anywhere in `plan`, each partition index as its root."""
+    names, nodes = set(), list(plan)
+    while nodes:
+        node = nodes.pop()
+        node = node.get("Plan", node)
+        if "Index Name" in node:
+            names.add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+    return sorted({
+        conn.execute(text("SELECT pg_partition_root(CAST(:name AS regclass))::text"), {"name": name}).scalar()
+        or name
+        for name in names
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--user", type=int, default=1)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        trigram = bool(conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+        )).scalar())
+        # Estimated rows, summed over the partitions
+        invoices = conn.execute(text(
+            "SELECT sum(c.reltuples)::bigint FROM pg_partition_tree('invoices') t "
+            "JOIN pg_class c ON c.oid = t.relid WHERE t.isleaf"
+        )).scalar()
+        results = {
+            "backend": "pg_trgm" if trigram else "ILIKE fallback (no pg_trgm)",
+            "invoices": invoices,
+            "queries": {
+                name: measure(conn, q, user_id, trigram, args.runs)
+                for name, q, user_id in queries(args.user)
+            },
+        }
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,206 @@
+"""
+Synthetic data for benchmarks.
+
+Point DATABASE_URL at a scratch database: seeding TRUNCATEs the users,
+invoices, reminders, outbox and reset token tables and the invoice read
+models.
+
+    python -m benchmarks.seed --users 1000 --invoices 5000000
+
+Rows are generated in Python and streamed in with COPY. The shape is meant
+to look like a real ledger rather than uniform noise:
+
+- invoices per user follow a power law (--skew; 0 is uniform), so a few
+  users own a large share of the data, as the big accounts do in production;
+- issue dates lean towards the recent end of the --days window;
+- payment terms are 7 / 14 / 30 / 45 / 60 days, mostly 30;
+- amounts are log-normal (median ~400, long tail);
+- most invoices past their due date are Paid, and the share still Pending
+  shrinks the older they get, so overdue lists are realistic in size;
+- overdue invoices carry one reminder a week after the due date (up to
+  four), and some paid invoices were reminded before they were settled.
+
+The first user is an admin; every user's password is BENCH_PASSWORD.
+"""
+import argparse
+import io
+import math
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from database import engine
+from models import Base
+from utils.security import hash_password
+
+BENCH_PASSWORD = "bench-password"
+# Rows per COPY; each COPY fires the read-model triggers once
+CHUNK_ROWS = 100_000
+
+# Customer names are built from these, so search sees realistic, mostly
+# distinct trigrams rather than one repeated prefix
+NAME_FIRST = (
+    "Acme", "Apex", "Atlas", "Beacon", "Birch", "Blue", "Cedar", "Clear", "Coastal",
+    "Crown", "Delta", "Eagle", "Ember", "Evergreen", "Falcon", "Granite", "Harbor",
+    "Highland", "Horizon", "Iron", "Juniper", "Keystone", "Lakeside", "Liberty", "Maple",
+    "Meridian", "Northwind", "Oak", "Orchard", "Pioneer", "Quartz", "Redwood", "Riverside",
+    "Sterling", "Summit", "Sunrise", "Timber", "Union", "Vertex", "Willow",
+)
+NAME_SECOND = (
+    "Analytics", "Bakery", "Builders", "Capital", "Clinic", "Consulting", "Design",
+    "Dynamics", "Electric", "Engineering", "Farms", "Foods", "Freight", "Furniture",
+    "Graphics", "Health", "Hardware", "Hospitality", "Imports", "Interiors", "Labs",
+    "Logistics", "Marine", "Media", "Motors", "Networks", "Outfitters", "Packaging",
+    "Pharma", "Plumbing", "Printing", "Realty", "Robotics", "Solar", "Studios",
+    "Supply", "Systems", "Textiles", "Travel", "Ventures",
+)
+NAME_SUFFIX = ("Ltd", "Inc", "LLC", "GmbH", "& Co", "Group")
+CUSTOMERS_PER_USER = 40
+
+TERMS = (7, 14, 30, 45, 60)
+TERM_WEIGHTS = (5, 15, 50, 20, 10)
+
+TRUNCATE = text("""
+    TRUNCATE users, invoices, reminders, email_outbox, password_reset_tokens,
+             user_invoice_summary, invoice_trend_daily, invoice_ids
+    RESTART IDENTITY CASCADE
+""")
+
+
+def bench_email(user_id: int) -> str:
+    return f"bench{user_id}@example.com"
+
+
+def customer_name(user_id: int, k: int) -> str:
+    """The k-th of a user's CUSTOMERS_PER_USER customers (deterministic)."""
+    n = (user_id * 7919 + k * 104729) % (len(NAME_FIRST) * len(NAME_SECOND) * len(NAME_SUFFIX))
+    first, rest = divmod(n, len(NAME_SECOND) * len(NAME_SUFFIX))
+    second, suffix = divmod(rest, len(NAME_SUFFIX))
+    return f"{NAME_FIRST[first]} {NAME_SECOND[second]} {NAME_SUFFIX[suffix]}"
+
+
+def _owner_weights(users: int, skew: float) -> list:
+    """Cumulative weights for picking an invoice's owner (user 1 heaviest)."""
+    total, cumulative = 0.0, []
+    for rank in range(1, users + 1):
+        total += rank ** -skew
+        cumulative.append(total)
+    return cumulative
+
+
+def _status(due: date, today: date) -> str:
+    if due >= today:
+        return "Paid" if random.random() < 0.08 else "Pending"
+    # Just past due: ~55% paid; three months on: ~95%
+    days_late = (today - due).days
+    return "Paid" if random.random() > 0.45 * math.exp(-days_late / 45) else "Pending"
+
+
+def _reminder_days(due: date, status: str, today: date) -> list:
+    """Dates a reminder went out for this invoice."""
+    if due >= today:
+        return []
+    if status == "Pending":
+        weeks = min((today - due).days // 7, 4)
+        return [due + timedelta(days=7 * (n + 1) - 4) for n in range(weeks)]
+    return [due + timedelta(days=3)] if random.random() < 0.3 else []
+
+
+def _copy(cursor, table: str, columns: str, rows) -> int:
+    """COPY `rows` (tab-separated lines) into `table`, CHUNK_ROWS at a time."""
+    count = 0
+    buffer = io.StringIO()
+    for n, line in enumerate(rows, 1):
+        buffer.write(line)
+        if n % CHUNK_ROWS == 0:
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+            buffer = io.StringIO()
+        count = n
+    if buffer.tell():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+    return count
+
+
+def seed(users: int, invoices: int, skew: float = 0.7, days: int = 730, random_seed: int = 1) -> dict:
+    random.seed(random_seed)
+    Base.metadata.create_all(bind=engine)
+    today = date.today()
+    password = hash_password(BENCH_PASSWORD)
+    owners = range(1, users + 1)
+    cumulative = _owner_weights(users, skew)
+    # Reminder rows are spooled to disk while the invoices stream, then copied
+    reminders = tempfile.TemporaryFile("w+")
+
+    def user_rows():
+        for user_id in owners:
+            role = "admin" if user_id == 1 else "user"
+            yield f"{user_id}\tBench User {user_id}\t{bench_email(user_id)}\t{password}\t{role}\n"
+
+    def invoice_rows():
+        sequence = [0] * (users + 1)
+        for invoice_id in range(1, invoices + 1):
+            user_id = random.choices(owners, cum_weights=cumulative)[0]
+            sequence[user_id] += 1
+            issued = today - timedelta(days=int(days * random.random() ** 1.4))
+            due = issued + timedelta(days=random.choices(TERMS, TERM_WEIGHTS)[0])
+            status = _status(due, today)
+            amount = round(min(max(random.lognormvariate(6.0, 1.1), 5), 250_000), 2)
+            customer = customer_name(user_id, random.randrange(CUSTOMERS_PER_USER))
+            for sent_on in _reminder_days(due, status, today):
+                if sent_on <= today:
+                    reminders.write(
+                        f"{user_id}\t{invoice_id}\temail\tsent\t{sent_on} "
+                        f"{random.randrange(8, 18):02d}:{random.randrange(60):02d}:00+00\n"
+                    )
+            yield (
+                f"{invoice_id}\tINV-{user_id}-{sequence[user_id]}\t{customer}\t{amount}\t"
+                f"{issued}\t{due}\t{status}\t{user_id}\t{bench_email(user_id)}\n"
+            )
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(TRUNCATE)
+        cursor = conn.connection.cursor()
+        counts = {
+            "users": _copy(cursor, "users", "id, name, email, password, role", user_rows()),
+            # The statement-level triggers fold each chunk into the read models
+            "invoices": _copy(cursor, "invoices",
+                              "id, invoice_number, customer_name, amount, issue_date, "
+                              "due_date, status, user_id, user_email", invoice_rows()),
+        }
+        reminders.seek(0)
+        counts["reminders"] = _copy(cursor, "reminders",
+                                    "user_id, invoice_id, reminder_type, status, sent_at",
+                                    reminders)
+        reminders.close()
+        # Ids were supplied explicitly; move the sequences past them
+        for table in ("users", "invoices"):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+            ))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in ("users", "invoices", "reminders", "user_invoice_summary", "invoice_trend_daily"):
+            conn.execute(text(f"VACUUM ANALYZE {table}"))
+    counts["seconds"] = round(time.perf_counter() - start, 1)
+    print(f"Seeded {counts['users']} users / {counts['invoices']} invoices / "
+          f"{counts['reminders']} reminders in {counts['seconds']}s")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--invoices", type=int, default=5_000_000)
+    parser.add_argument("--skew", type=float, default=0.7,
+                        help="power-law exponent for invoices per user (0 = uniform)")
+    parser.add_argument("--days", type=int, default=730, help="issue dates span this many days")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for repeatable data")
+    args = parser.parse_args()
+    seed(args.users, args.invoices, args.skew, args.days, args.seed)
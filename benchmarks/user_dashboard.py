@@ -0,0 +1,94 @@
+"""
+User dashboard benchmark: the original per-call aggregates against the
+trigger-maintained user_invoice_summary lookup in routes/users.py.
+
+    python -m benchmarks.seed --users 100 --invoices 5000000
+    python -m benchmarks.user_dashboard --user-id 1 --runs 20
+
+Both variants must return the same dashboard; reports statements issued per
+call and p50/p95 latency.
+"""
+import argparse
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy import case, func, select
+
+from benchmarks.dashboard import measure
+from database import session_scope
+from models import Invoice, User
+from routes.users import compute_user_dashboard
+
+
+def legacy_user_dashboard(db, user_id: int) -> dict:
+    """The pre-summary dashboard, kept verbatim as the baseline."""
+    user = db.get(User, user_id)
+    mine = Invoice.user_id == user_id
+    total_invoices = db.scalar(select(func.count(Invoice.id)).where(mine))
+    pending_amount = db.scalar(select(func.coalesce(func.sum(Invoice.amount), 0)).where(
+        mine, Invoice.status == "Pending"))
+    total_paid = db.scalar(select(func.coalesce(func.sum(Invoice.amount), 0)).where(
+        mine, Invoice.status == "Paid"))
+    next_due = db.scalar(select(Invoice.due_date).where(
+        mine, Invoice.status == "Pending", Invoice.due_date >= date.today()
+    ).order_by(Invoice.due_date.asc()).limit(1))
+    db.execute(select(
+        func.to_char(Invoice.issue_date, 'Mon').label("month"),
+        func.sum(case((Invoice.status == "Paid", Invoice.amount), else_=0)),
+        func.sum(case((Invoice.status == "Pending", Invoice.amount), else_=0))
+    ).where(mine).group_by("month").order_by("month")).all()
+    paid_count = db.scalar(select(func.count()).where(mine, Invoice.status == "Paid"))
+    pending_count = db.scalar(select(func.count()).where(mine, Invoice.status == "Pending"))
+    overdue_count = db.scalar(select(func.count()).where(
+        mine, Invoice.status == "Pending", Invoice.due_date < date.today()))
+    return {
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "summary": {
+            "totalInvoices": total_invoices,
+            "pendingAmount": pending_amount,
+            "totalPaid": total_paid,
+            "nextDueDate": next_due,
+        },
+        "paymentStatus": {
+            "paid": paid_count, "pending": pending_count, "overdue": overdue_count
+        },
+    }
+
+
+def _same(legacy: dict, current: dict) -> bool:
+    # Amounts: float sums vs numeric sums differ only in the last few ulps
+    close = lambda a, b: abs(a - b) <= 1e-6 * max(1.0, abs(a))
+    return (
+        legacy["user"] == current["user"]
+        and legacy["paymentStatus"] == current["paymentStatus"]
+        and legacy["summary"]["totalInvoices"] == current["summary"]["totalInvoices"]
+        and legacy["summary"]["nextDueDate"] == current["summary"]["nextDueDate"]
+        and close(legacy["summary"]["pendingAmount"], current["summary"]["pendingAmount"])
+        and close(legacy["summary"]["totalPaid"], current["summary"]["totalPaid"])
+    )
+
+
+async def main(user_id: int, runs: int) -> dict:
+    async with session_scope() as db:
+        legacy = await db.run_sync(legacy_user_dashboard, user_id)
+        current = await compute_user_dashboard(db, user_id)
+    return {
+        "user_id": user_id,
+        "user_invoices": legacy["summary"]["totalInvoices"],
+        "results_match": _same(legacy, current),
+        "legacy": await measure(
+            lambda db: db.run_sync(legacy_user_dashboard, user_id), runs
+        ),
+        "summary_table": await measure(
+            lambda db: compute_user_dashboard(db, user_id), runs
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.user_id, args.runs)), indent=2))
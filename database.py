@@ -1,17 +1,42 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import itertools
+import time
+import uuid
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+from utils.db_pool import DB_PGBOUNCER, instrument, max_connections, pool_options, pool_stats
+
 import urllib.parse
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Diagnostic logging to help identify connection issues on Render
-# We do not log the password for security reasons.
-if DATABASE_URL:
+# "async": routes talk to Postgres through asyncpg on the event loop.
+# "sync":  the same routes run psycopg2 sessions in the threadpool instead,
+#          which is how every route behaved before the async port.
+DB_MODE = os.getenv("DB_MODE", "async").lower()
+
+def log_dsn_diagnostic():
+    """
+    Diagnostic logging to help identify connection issues on Render.
+    We do not log the password for security reasons. Called from the app
+    lifespan rather than at import, so tools importing models stay quiet.
+    """
+    if not DATABASE_URL:
+        return
     try:
         parsed = urllib.parse.urlparse(DATABASE_URL)
         print(f"--- DB DIAGNOSTIC ---")
@@ -23,10 +48,9 @@ if DATABASE_URL:
     except Exception as e:
         print(f"ERROR: Could not parse DATABASE_URL: {e}")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True
-)
+# Pool sizing, recycle, timeout and pre-ping come from DB_POOL_* (utils/db_pool.py)
+engine = create_engine(DATABASE_URL, **pool_options())
+instrument(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -38,3 +62,415 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dispose_engines(close: bool = True):
+    """
+    Drop pooled connections. In a freshly forked worker pass close=False:
+    the sockets belong to the parent, which may still be using them.
+    """
+    for sync_engine in sync_engines():
+        sync_engine.dispose(close=close)
+
+
+def sync_engines() -> list:
+    """Every engine in the process, as sync engines: primary first, then replicas."""
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    for replica in replicas:
+        engines.extend(replica.sync_engines())
+    return engines
+
+
+# ---------- ASYNC ----------
+
+def _asyncpg_url(url: str):
+    """Rewrite a libpq-style DSN for asyncpg, which spells sslmode as `ssl`."""
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    connect_args = {}
+    sslmode = query.pop("sslmode", None)
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    if DB_PGBOUNCER:
+        # asyncpg prepares every statement; behind transaction pooling the
+        # prepare and the execute can hit different servers, so cache none
+        # and give each one a unique name
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    return parsed.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async" and DATABASE_URL:
+    _async_url, _async_connect_args = _asyncpg_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_url,
+        connect_args=_async_connect_args,
+        **pool_options(is_async=True)
+    )
+    instrument(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# Sessions handed to async routes in sync mode. expire_on_commit matches the
+# async sessions so routes behave the same in either mode.
+ThreadedSessionLocal = sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=engine
+)
+
+# Never hand out more threaded sessions than the pool has connections: a
+# session waiting for a connection holds a threadpool worker, and enough of
+# them starve the workers that would close sessions and release connections.
+# (Under DB_PGBOUNCER there is no local pool; the same number still caps
+# how many connections one process opens to PgBouncer.)
+_threaded_slots = asyncio.Semaphore(max_connections())
+
+
+def db_pool_stats() -> dict:
+    stats = {"pgbouncer": DB_PGBOUNCER, "sync": pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = pool_stats(async_engine.sync_engine)
+    if replicas:
+        stats["replicas"] = {replica.name: replica.stats() for replica in replicas}
+    return stats
+
+
+class ThreadedSession:
+    """
+    The subset of the AsyncSession API the routes use, backed by a sync
+    Session whose I/O runs in the threadpool. Selected with DB_MODE=sync.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kw)
+
+    async def scalar(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kw)
+
+    async def scalars(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kw)
+
+    async def get(self, entity, ident, **kw):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kw)
+
+    async def stream(self, statement, params=None, **kw):
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kw)
+        return _ThreadedResult(result)
+
+    async def stream_scalars(self, statement, params=None, **kw):
+        result = await run_in_threadpool(self.sync_session.scalars, statement, params, **kw)
+        return _iterate_in_threadpool(result)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def connection(self):
+        return await run_in_threadpool(self.sync_session.connection)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def run_sync(self, fn, *args, **kw):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kw)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def _iterate_in_threadpool(result, batch_size: int = 500):
+    while True:
+        rows = await run_in_threadpool(result.fetchmany, batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield row
+
+
+class _ThreadedResult:
+    """AsyncResult stand-in for ThreadedSession.stream."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def __aiter__(self):
+        return _iterate_in_threadpool(self._result)
+
+    async def partitions(self, size: int = 500):
+        while True:
+            rows = await run_in_threadpool(self._result.fetchmany, size)
+            if not rows:
+                break
+            yield rows
+
+
+@asynccontextmanager
+async def session_scope():
+    """An AsyncSession, or a ThreadedSession when DB_MODE=sync."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield session
+    else:
+        async with _threaded_slots:
+            session = ThreadedSession(ThreadedSessionLocal())
+            try:
+                yield session
+            finally:
+                await session.close()
+
+
+async def get_async_db(request: Request):
+    if request.method not in SAFE_METHODS:
+        note_write(request.headers.get("authorization"))
+    async with session_scope() as db:
+        yield db
+
+
+# ---------- READ REPLICAS ----------
+
+# Comma-separated DSNs of streaming replicas. Routes that only read take
+# get_read_db and are spread over the healthy ones, round-robin; unset, they
+# use the primary like everything else.
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+# Seconds between health checks; a replica replaying more than
+# REPLICA_MAX_LAG_SECONDS behind the primary is skipped until it catches up
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+# After a write, reads with the same bearer token go to the primary for this
+# long (read-your-own-writes). Tracked per process.
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+REPLICA_STICKY_MAX_KEYS = 100_000
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        -- Nothing left to replay: an idle primary is not lag
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    """One replica: its engines, and whether reads may go there right now."""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(
+            url, connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT}, **self.pool_options()
+        )
+        instrument(self.engine)
+        self.async_engine = None
+        if DB_MODE == "async":
+            async_url, connect_args = _asyncpg_url(url)
+            self.async_engine = create_async_engine(
+                async_url,
+                connect_args={**connect_args, "timeout": REPLICA_CONNECT_TIMEOUT},
+                **self.pool_options(is_async=True)
+            )
+            instrument(self.async_engine.sync_engine)
+            self._async_sessions = async_sessionmaker(
+                self.async_engine, autoflush=False, expire_on_commit=False
+            )
+        self._sync_sessions = sessionmaker(autoflush=False, expire_on_commit=False, bind=self.engine)
+        self._slots = asyncio.Semaphore(max_connections())
+        # Optimistic until the first check: a dead one fails over on first use
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.routed = 0
+        self.failures = 0
+
+    @staticmethod
+    def pool_options(is_async: bool = False) -> dict:
+        # Always ping on checkout: a pooled connection to a replica that has
+        # since gone away must fail over at checkout, not fail the route
+        options = pool_options(is_async)
+        if "pool_pre_ping" in options:
+            options["pool_pre_ping"] = True
+        return options
+
+    def mark_down(self, error: Exception):
+        if self.healthy:
+            print(f"Replica {self.name} is down: {error}")
+        self.healthy = False
+        self.error = str(error)
+        self.failures += 1
+
+    def check(self):
+        """Blocking health check; run from the threadpool."""
+        try:
+            with self.engine.connect() as conn:
+                lag = float(conn.execute(_LAG_SQL).scalar())
+        except Exception as e:
+            self.lag = None
+            self.mark_down(e)
+            return
+        self.lag = lag
+        if lag > REPLICA_MAX_LAG_SECONDS:
+            self.mark_down(RuntimeError(f"{lag:.1f}s behind the primary"))
+            return
+        if not self.healthy:
+            print(f"Replica {self.name} is back")
+        self.healthy = True
+        self.error = None
+
+    @asynccontextmanager
+    async def session(self):
+        if self.async_engine is not None:
+            async with self._async_sessions() as session:
+                yield session
+        else:
+            async with self._slots:
+                session = ThreadedSession(self._sync_sessions())
+                try:
+                    yield session
+                finally:
+                    await session.close()
+
+    def sync_engines(self) -> list:
+        return [self.engine] + ([self.async_engine.sync_engine] if self.async_engine else [])
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+            "routed": self.routed,
+            "failures": self.failures,
+            "pools": {
+                "sync": pool_stats(self.engine),
+                **({"async": pool_stats(self.async_engine.sync_engine)} if self.async_engine else {}),
+            },
+        }
+
+
+replicas = [Replica(url) for url in DATABASE_REPLICA_URLS]
+_replica_turn = itertools.count()
+_recent_writes = OrderedDict()
+# Key the current request's reads are routed by; streams opened later in the
+# request (stream_ndjson, exports) read it to route the same way
+_read_key = contextvars.ContextVar("read_key", default=None)
+
+
+def note_write(key):
+    if not key or not replicas:
+        return
+    _recent_writes[key] = time.monotonic() + REPLICA_STICKY_SECONDS
+    _recent_writes.move_to_end(key)
+    while len(_recent_writes) > REPLICA_STICKY_MAX_KEYS:
+        _recent_writes.popitem(last=False)
+
+
+def _wrote_recently(key) -> bool:
+    until = _recent_writes.get(key) if key else None
+    if until is None:
+        return False
+    if until < time.monotonic():
+        del _recent_writes[key]
+        return False
+    return True
+
+
+@asynccontextmanager
+async def read_session_scope(key=None):
+    """
+    A session on the next healthy replica, or on the primary when there is
+    none or `key` (the bearer token) wrote recently. The connection is
+    checked out up front, so a replica that went down since its last
+    check fails over here instead of failing the route.
+    """
+    key = key or _read_key.get()
+    if replicas and not _wrote_recently(key):
+        start = next(_replica_turn)
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            if not replica.healthy:
+                continue
+            async with replica.session() as session:
+                try:
+                    await session.connection()
+                except Exception as e:
+                    replica.mark_down(e)
+                    continue
+                replica.routed += 1
+                try:
+                    yield session
+                except DBAPIError as e:
+                    if e.connection_invalidated:
+                        replica.mark_down(e)
+                    raise
+                return
+    async with session_scope() as session:
+        yield session
+
+
+async def route_reads(request: Request):
+    """
+    Route this request's later reads (streams, exports) by its bearer token,
+    for routes that open their sessions themselves. A coroutine so that the
+    context variable is set in the request's context, not a threadpool copy.
+    """
+    key = request.headers.get("authorization")
+    _read_key.set(key)
+    return key
+
+
+async def get_read_db(request: Request):
+    """get_async_db for routes that only read."""
+    async with read_session_scope(await route_reads(request)) as db:
+        yield db
+
+
+async def _replica_monitor():
+    while True:
+        await asyncio.gather(*(run_in_threadpool(replica.check) for replica in replicas))
+        await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+
+_monitor = None
+
+
+def start_replica_monitor():
+    global _monitor
+    if replicas and REPLICA_CHECK_INTERVAL > 0 and _monitor is None:
+        _monitor = asyncio.create_task(_replica_monitor())
+
+
+async def stop_replica_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.cancel()
+        try:
+            await _monitor
+        except asyncio.CancelledError:
+            pass
+        _monitor = None
@@ -0,0 +1,44 @@
+"""
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports the app once (preload_app) and prepares the schema once,
+so workers -- including ones recycled by max_requests -- fork ready to serve
+without importing anything or querying the catalog.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+# Recycle workers to bound slow leaks; cheap now that boots skip the catalog
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+# Proxies whose X-Forwarded-For uvicorn applies; utils/admission.py keys its
+# per-client rate limit off the same variable
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Read before main is imported. With preload the master runs the configured
+# mode once in on_starting and workers inherit "skip"; without it each worker
+# imports the app itself and runs the mode in its lifespan.
+_schema_mode = os.getenv("SCHEMA_MODE", "create").lower()
+if preload_app:
+    os.environ["SCHEMA_MODE"] = "skip"
+
+
+def on_starting(server):
+    if not preload_app:
+        return  # importing main here would preload it anyway
+    from database import dispose_engines
+    from main import prepare_schema
+
+    prepare_schema(_schema_mode)
+    # Don't leave the master's connections for the workers to inherit
+    dispose_engines()
+
+
+def post_fork(server, worker):
+    from database import dispose_engines
+
+    dispose_engines(close=False)
@@ -1,22 +1,66 @@
-from fastapi import FastAPI
-from database import engine
+from contextlib import asynccontextmanager
+import os
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect
+from database import engine, log_dsn_diagnostic, start_replica_monitor, stop_replica_monitor
 from models import Base
 from routes import users, invoices, auth
 from fastapi.middleware.cors import CORSMiddleware
 from routes import admin, reminders
 from fastapi import Depends
 from utils.auth_bearer import get_current_user, get_admin_user
+from utils.hashing import start_hash_pool, shutdown_hash_pool
+from utils.outbox import start_outbox_sender, stop_outbox_sender
+from utils.reset_tokens import start_token_purger, stop_token_purger
+from utils.request_metrics import RequestMetricsMiddleware, instrument_engines, metrics_response
 
 
-try:
-    print("Initializing database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables initialized successfully.")
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to initialize database: {e}")
-    # We continue so the health check endpoint can still run and we see logs
+# "create": create missing tables at startup (create_all)
+# "check":  only verify the tables exist; migrations own the schema
+# "skip":   no catalog queries at all (gunicorn.conf.py prepares the schema
+#           once in the master and sets this for its workers)
+SCHEMA_MODE = os.getenv("SCHEMA_MODE", "create").lower()
 
-app = FastAPI(title="Payment Reminder Backend")
+
+def prepare_schema(mode: str = SCHEMA_MODE):
+    if mode not in ("create", "check", "skip"):
+        raise RuntimeError(f"Unknown SCHEMA_MODE {mode!r}")
+    if mode == "skip":
+        return
+    try:
+        if mode == "create":
+            print("Initializing database tables...")
+            Base.metadata.create_all(bind=engine)
+            print("Database tables initialized successfully.")
+        else:
+            missing = set(Base.metadata.tables) - set(inspect(engine).get_table_names())
+            if missing:
+                print(f"CRITICAL ERROR: Missing tables {sorted(missing)}; run `alembic upgrade head`")
+            else:
+                print("Database schema check passed.")
+    except Exception as e:
+        print(f"CRITICAL ERROR: Failed to initialize database: {e}")
+        # We continue so the health check endpoint can still run and we see logs
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here runs at import, so gunicorn can preload the app and
+    # fork workers that never touched the database
+    log_dsn_diagnostic()
+    await run_in_threadpool(prepare_schema)
+    await start_hash_pool()
+    start_outbox_sender()
+    start_token_purger()
+    start_replica_monitor()
+    yield
+    await stop_replica_monitor()
+    await stop_token_purger()
+    stop_outbox_sender()
+    shutdown_hash_pool()
+
+
+app = FastAPI(title="Payment Reminder Backend", lifespan=lifespan)
 origins = [
     "*",
 ]
@@ -27,7 +71,11 @@ app.add_middleware(
     allow_credentials=False,  # credentials=True is incompatible with allow_origins=["*"]
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # keyset pagination cursor
 )
+# Added last so it is outermost: times CORS and error handling too
+app.add_middleware(RequestMetricsMiddleware)
+instrument_engines()
 
 app.include_router(auth.router)
 app.include_router(admin.router, dependencies=[Depends(get_admin_user)])
@@ -38,3 +86,8 @@ app.include_router(reminders.router, dependencies=[Depends(get_current_user)])
 @app.get("/")
 def health():
     return {"status": "Backend running 🚀"}
+
+# Prometheus scrape target; see METRICS_TOKEN / SLOW_REQUEST_MS
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    return metrics_response(request)
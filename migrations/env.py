@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import DATABASE_URL, engine
+import models
+from utils.partitions import is_partition
+from utils.search import TRGM_INDEXES
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+# Only created where the server has pg_trgm (utils/search.py), so they are
+# not in the models and autogenerate must not try to drop them
+UNMANAGED_INDEXES = {name for name, _ in TRGM_INDEXES}
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if type_ == "table" and is_partition(name):
+        # Partitions of invoices (utils/partitions.py), not models of their own
+        return False
+    return not (type_ == "index" and name in UNMANAGED_INDEXES)
+
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection, target_metadata=target_metadata, include_object=include_object
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,42 @@
+"""indexes for dashboard, listing and reminder query shapes
+
+Built CONCURRENTLY so the migration does not lock writes on a live table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_invoices_user_status_due", "invoices", ["user_id", "status", "due_date"], None),
+    ("ix_invoices_user_due_id", "invoices", ["user_id", "due_date", "id"], None),
+    ("ix_invoices_due_id", "invoices", ["due_date", "id"], None),
+    ("ix_invoices_pending_due", "invoices", ["due_date"], "status = 'Pending'"),
+    ("ix_reminders_sent_id", "reminders", ["sent_at", "id"], None),
+    ("ix_reminders_user_sent", "reminders", ["user_id", "sent_at"], None),
+    ("ix_reminders_invoice_id", "reminders", ["invoice_id"], None),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
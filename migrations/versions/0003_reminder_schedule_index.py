@@ -0,0 +1,40 @@
+"""reminders (invoice_id, sent_at) for the batch scheduler
+
+Replaces the single-column invoice_id index: the composite serves the same
+foreign-key lookups plus the scheduler's "reminded since" anti-join.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_reminders_invoice_sent", "reminders", ["invoice_id", "sent_at"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_reminders_invoice_id", table_name="reminders",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_reminders_invoice_id", "reminders", ["invoice_id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_reminders_invoice_sent", table_name="reminders",
+            postgresql_concurrently=True,
+        )
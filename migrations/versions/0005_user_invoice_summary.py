@@ -0,0 +1,131 @@
+"""user_invoice_summary read model, maintained by triggers on invoices
+
+Backfills from the existing invoices under a SHARE lock, so invoice writes
+wait for the duration of one GROUP BY over the table.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the DDL in utils/invoice_summary.py as of this revision;
+# later edits to that module must not change what 0005 does.
+def _apply(deltas: str) -> str:
+    # `deltas` yields (user_id, status, amount, n) with n = +1 / -1
+    return f"""
+        INSERT INTO user_invoice_summary AS s (
+            user_id, invoice_count, pending_count, pending_amount,
+            paid_count, paid_amount, updated_at
+        )
+        SELECT
+            user_id,
+            sum(n),
+            coalesce(sum(n) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+            now()
+        FROM ({deltas}) AS delta
+        GROUP BY user_id
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            invoice_count = s.invoice_count + EXCLUDED.invoice_count,
+            pending_count = s.pending_count + EXCLUDED.pending_count,
+            pending_amount = s.pending_amount + EXCLUDED.pending_amount,
+            paid_count = s.paid_count + EXCLUDED.paid_count,
+            paid_amount = s.paid_amount + EXCLUDED.paid_amount,
+            updated_at = EXCLUDED.updated_at;"""
+
+
+_CHANGED = """
+    SELECT o.user_id, o.status, o.amount, -1 AS n
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE (o.user_id, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.status, n.amount)
+    UNION ALL
+    SELECT n.user_id, n.status, n.amount, 1
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE (o.user_id, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.status, n.amount)
+"""
+
+SUMMARY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION user_invoice_summary_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_apply("SELECT user_id, status, amount, 1 AS n FROM new_rows")}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_apply("SELECT user_id, status, amount, -1 AS n FROM old_rows")}
+    ELSE
+        {_apply(_CHANGED)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+SUMMARY_TRIGGERS = [
+    """CREATE TRIGGER invoices_summary_insert AFTER INSERT ON invoices
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+    """CREATE TRIGGER invoices_summary_update AFTER UPDATE ON invoices
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+    """CREATE TRIGGER invoices_summary_delete AFTER DELETE ON invoices
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+]
+
+BACKFILL_SUMMARY = """
+    INSERT INTO user_invoice_summary (
+        user_id, invoice_count, pending_count, pending_amount,
+        paid_count, paid_amount, updated_at
+    )
+    SELECT
+        user_id,
+        count(*),
+        count(*) FILTER (WHERE status = 'Pending'),
+        coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0),
+        count(*) FILTER (WHERE status = 'Paid'),
+        coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+        now()
+    FROM invoices
+    GROUP BY user_id
+"""
+
+
+def upgrade():
+    op.create_table(
+        "user_invoice_summary",
+        sa.Column(
+            "user_id", sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("invoice_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pending_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pending_amount", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("paid_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("paid_amount", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.execute(SUMMARY_FUNCTION)
+    for statement in SUMMARY_TRIGGERS:
+        op.execute(statement)
+    op.execute("LOCK TABLE invoices IN SHARE MODE")
+    op.execute(BACKFILL_SUMMARY)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS invoices_summary_insert ON invoices")
+    op.execute("DROP TRIGGER IF EXISTS invoices_summary_update ON invoices")
+    op.execute("DROP TRIGGER IF EXISTS invoices_summary_delete ON invoices")
+    op.execute("DROP FUNCTION IF EXISTS user_invoice_summary_apply()")
+    op.drop_table("user_invoice_summary")
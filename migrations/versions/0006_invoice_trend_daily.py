@@ -0,0 +1,125 @@
+"""invoice_trend_daily rollup, maintained by triggers on invoices
+
+Backfills from the existing invoices under a SHARE lock.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the DDL in utils/invoice_summary.py as of this revision;
+# later edits to that module must not change what 0006 does. user_id 0 holds
+# the all-users total.
+def _apply_trend(deltas: str) -> str:
+    # `deltas` yields (user_id, issue_date, status, amount, n)
+    return f"""
+        INSERT INTO invoice_trend_daily AS t (
+            user_id, day, paid_count, paid_amount, pending_count, pending_amount
+        )
+        SELECT
+            owner.user_id,
+            delta.issue_date,
+            coalesce(sum(n) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Pending'), 0)
+        FROM ({deltas}) AS delta
+        CROSS JOIN LATERAL (VALUES (delta.user_id), (0)) AS owner (user_id)
+        WHERE status IN ('Paid', 'Pending')
+        GROUP BY owner.user_id, delta.issue_date
+        ORDER BY owner.user_id, delta.issue_date
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            paid_count = t.paid_count + EXCLUDED.paid_count,
+            paid_amount = t.paid_amount + EXCLUDED.paid_amount,
+            pending_count = t.pending_count + EXCLUDED.pending_count,
+            pending_amount = t.pending_amount + EXCLUDED.pending_amount;"""
+
+
+_TREND_KEY = "(o.user_id, o.issue_date, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.issue_date, n.status, n.amount)"
+
+_TREND_CHANGED = f"""
+    SELECT o.user_id, o.issue_date, o.status, o.amount, -1 AS n
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+    UNION ALL
+    SELECT n.user_id, n.issue_date, n.status, n.amount, 1
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+"""
+
+TREND_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION invoice_trend_daily_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, 1 AS n FROM new_rows")}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, -1 AS n FROM old_rows")}
+    ELSE
+        {_apply_trend(_TREND_CHANGED)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TREND_TRIGGERS = [
+    """CREATE TRIGGER invoices_trend_insert AFTER INSERT ON invoices
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+    """CREATE TRIGGER invoices_trend_update AFTER UPDATE ON invoices
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+    """CREATE TRIGGER invoices_trend_delete AFTER DELETE ON invoices
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+]
+
+BACKFILL_TREND = """
+    INSERT INTO invoice_trend_daily (
+        user_id, day, paid_count, paid_amount, pending_count, pending_amount
+    )
+    SELECT owner.user_id, issue_date,
+           count(*) FILTER (WHERE status = 'Paid'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+           count(*) FILTER (WHERE status = 'Pending'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0)
+    FROM invoices
+    CROSS JOIN LATERAL (VALUES (invoices.user_id), (0)) AS owner (user_id)
+    WHERE status IN ('Paid', 'Pending')
+    GROUP BY owner.user_id, issue_date
+"""
+
+
+def upgrade():
+    op.create_table(
+        "invoice_trend_daily",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("paid_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("paid_amount", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("pending_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pending_amount", sa.Numeric(), nullable=False, server_default="0"),
+    )
+    op.execute(TREND_FUNCTION)
+    for statement in TREND_TRIGGERS:
+        op.execute(statement)
+    op.execute("LOCK TABLE invoices IN SHARE MODE")
+    op.execute(BACKFILL_TREND)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS invoices_trend_insert ON invoices")
+    op.execute("DROP TRIGGER IF EXISTS invoices_trend_update ON invoices")
+    op.execute("DROP TRIGGER IF EXISTS invoices_trend_delete ON invoices")
+    op.execute("DROP FUNCTION IF EXISTS invoice_trend_daily_apply()")
+    op.drop_table("invoice_trend_daily")
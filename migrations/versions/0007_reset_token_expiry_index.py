@@ -0,0 +1,32 @@
+"""password_reset_tokens (expires_at) for the batch purge
+
+Only the RESET_TOKEN_BACKEND=table store writes this table; the purge job
+walks expired rows through this index instead of scanning the table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_password_reset_tokens_expires_at", "password_reset_tokens", ["expires_at"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_password_reset_tokens_expires_at", table_name="password_reset_tokens",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,38 @@
+"""indexes for the filtered / sorted invoice listings
+
+One index per sort order in utils/invoice_query.py, with and without a
+leading user_id, so every page is an index range scan that stops after
+`limit` rows. The (user_id, customer_name, due_date, id) index also serves
+the exact customer_name filter in the default due-date order. Built
+CONCURRENTLY so the migration does not lock writes on a live table.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_invoices_user_amount_id", ["user_id", "amount", "id"]),
+    ("ix_invoices_user_customer_due_id", ["user_id", "customer_name", "due_date", "id"]),
+    ("ix_invoices_amount_id", ["amount", "id"]),
+    ("ix_invoices_customer_due_id", ["customer_name", "due_date", "id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "invoices", columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="invoices", postgresql_concurrently=True)
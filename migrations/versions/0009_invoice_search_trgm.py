@@ -0,0 +1,49 @@
+"""pg_trgm GIN indexes for invoice search
+
+Creates the pg_trgm extension and trigram indexes on invoice_number and
+customer_name (see utils/search.py), built CONCURRENTLY. On a server
+without pg_trgm the indexes are skipped with a notice and search falls
+back to an unindexed ILIKE scan. `utils.search.install_search` is
+idempotent: run it against the database once the extension is available.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+# Frozen as of this revision; utils/search.py keeps its own copy
+TRGM_INDEXES = (
+    ("ix_invoices_number_trgm", "invoice_number"),
+    ("ix_invoices_customer_trgm", "customer_name"),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    available = bind.exec_driver_sql(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    ).scalar()
+    if not available:
+        print("pg_trgm is not available on this server; invoice search will not be indexed")
+        return
+    with op.get_context().autocommit_block():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in TRGM_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON invoices USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    # The extension stays: other objects may depend on it
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(TRGM_INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
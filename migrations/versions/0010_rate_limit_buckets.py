@@ -0,0 +1,31 @@
+"""rate_limit_buckets for shared admission control
+
+Written only with ADMISSION_BACKEND=table (see utils/admission.py). The
+table is UNLOGGED: rate-limit state is not worth WAL, and losing it in a
+crash only resets the limits.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(32), primary_key=True),
+        sa.Column("full_at", sa.DateTime(timezone=True), nullable=False),
+        prefixes=["UNLOGGED"],
+    )
+
+
+def downgrade():
+    op.drop_table("rate_limit_buckets")
@@ -0,0 +1,172 @@
+"""Partition invoices by status, Paid invoices further by due_date
+
+Rebuilds `invoices` as a partitioned table (layout in utils/partitions.py)
+and copies every row across under an ACCESS EXCLUSIVE lock: invoices are
+unreadable for the duration of the copy, the index builds and the read
+model backfills, so run it in a maintenance window. Along the way status
+becomes NOT NULL (NULLs are copied as 'Pending'), the redundant
+ix_invoices_id goes (the primary key leads with id), and
+reminders.invoice_id loses its foreign key, which a partitioned table
+keyed on (id, status, due_date) cannot be the target of.
+
+Downgrade copies the rows back into a plain table, archive partitions
+included.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, invoice_number, customer_name, amount, issue_date, due_date, status, user_id, user_email"
+
+# As of this revision (models.py, 0002 and 0008)
+INDEXES = [
+    ("ix_invoices_user_status_due", "user_id, status, due_date"),
+    ("ix_invoices_user_due_id", "user_id, due_date, id"),
+    ("ix_invoices_due_id", "due_date, id"),
+    ("ix_invoices_user_amount_id", "user_id, amount, id"),
+    ("ix_invoices_user_customer_due_id", "user_id, customer_name, due_date, id"),
+    ("ix_invoices_amount_id", "amount, id"),
+    ("ix_invoices_customer_due_id", "customer_name, due_date, id"),
+]
+
+# Everything below is frozen as of this revision rather than imported from
+# utils/, so later edits there cannot change what 0011 does.
+
+# 0009; created only where pg_trgm is installed
+TRGM_INDEXES = [
+    ("ix_invoices_number_trgm", "invoice_number"),
+    ("ix_invoices_customer_trgm", "customer_name"),
+]
+
+# utils/partitions.py
+PARTITIONS = [
+    "CREATE TABLE invoices_pending PARTITION OF invoices FOR VALUES IN ('Pending')",
+    "CREATE TABLE invoices_paid PARTITION OF invoices FOR VALUES IN ('Paid') "
+    "PARTITION BY RANGE (due_date)",
+    "CREATE TABLE invoices_paid_recent PARTITION OF invoices_paid DEFAULT",
+    "CREATE TABLE invoices_other PARTITION OF invoices DEFAULT",
+]
+
+# The read model triggers of 0005 and 0006; their functions are unchanged
+TRIGGERS = [
+    (name, event, transitions, function)
+    for prefix, function in (("summary", "user_invoice_summary_apply"),
+                             ("trend", "invoice_trend_daily_apply"))
+    for name, event, transitions in (
+        (f"invoices_{prefix}_insert", "INSERT", "NEW TABLE AS new_rows"),
+        (f"invoices_{prefix}_update", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        (f"invoices_{prefix}_delete", "DELETE", "OLD TABLE AS old_rows"),
+    )
+]
+
+# Backfills of both read models, for the NULL statuses copied as Pending
+REBUILD = [
+    "DELETE FROM user_invoice_summary",
+    """INSERT INTO user_invoice_summary (
+           user_id, invoice_count, pending_count, pending_amount,
+           paid_count, paid_amount, updated_at
+       )
+       SELECT
+           user_id,
+           count(*),
+           count(*) FILTER (WHERE status = 'Pending'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0),
+           count(*) FILTER (WHERE status = 'Paid'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+           now()
+       FROM invoices
+       GROUP BY user_id""",
+    "DELETE FROM invoice_trend_daily",
+    """INSERT INTO invoice_trend_daily (
+           user_id, day, paid_count, paid_amount, pending_count, pending_amount
+       )
+       SELECT owner.user_id, issue_date,
+              count(*) FILTER (WHERE status = 'Paid'),
+              coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+              count(*) FILTER (WHERE status = 'Pending'),
+              coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0)
+       FROM invoices
+       CROSS JOIN LATERAL (VALUES (invoices.user_id), (0)) AS owner (user_id)
+       WHERE status IN ('Paid', 'Pending')
+       GROUP BY owner.user_id, issue_date""",
+]
+
+
+def _replace_invoices(partitioned: bool):
+    """Swap `invoices` for a copy of itself, partitioned or not."""
+    bind = op.get_bind()
+    trigram = bind.exec_driver_sql(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+    ).scalar()
+    op.execute("LOCK TABLE invoices IN ACCESS EXCLUSIVE MODE")
+    # Free the index and constraint names for the new table; the triggers
+    # go with the old one
+    for name in [name for name, _ in INDEXES + TRGM_INDEXES] + ["ix_invoices_pending_due", "ix_invoices_id"]:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE invoices DROP CONSTRAINT invoices_user_id_fkey")
+    op.execute("ALTER TABLE invoices RENAME TO invoices_old")
+    op.execute("ALTER INDEX invoices_pkey RENAME TO invoices_old_pkey")
+    op.execute("ALTER SEQUENCE invoices_id_seq OWNED BY NONE")
+
+    op.execute(f"""
+        CREATE TABLE invoices (
+            id integer NOT NULL DEFAULT nextval('invoices_id_seq'),
+            invoice_number varchar NOT NULL,
+            customer_name varchar NOT NULL,
+            amount double precision NOT NULL,
+            issue_date date NOT NULL,
+            due_date date NOT NULL,
+            status varchar{" NOT NULL" if partitioned else ""},
+            user_id integer NOT NULL CONSTRAINT invoices_user_id_fkey REFERENCES users (id),
+            user_email varchar NOT NULL,
+            CONSTRAINT invoices_pkey PRIMARY KEY ({"id, status, due_date" if partitioned else "id"})
+        ){" PARTITION BY LIST (status)" if partitioned else ""}
+    """)
+    if partitioned:
+        for statement in PARTITIONS:
+            op.execute(statement)
+    op.execute(f"""
+        INSERT INTO invoices ({COLUMNS})
+        SELECT {COLUMNS.replace("status", "coalesce(status, 'Pending')")} FROM invoices_old
+    """)
+    op.execute("ALTER SEQUENCE invoices_id_seq OWNED BY invoices.id")
+    op.execute("DROP TABLE invoices_old")
+
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON invoices ({columns})")
+    op.execute("CREATE INDEX ix_invoices_pending_due ON invoices (due_date) WHERE status = 'Pending'")
+    if not partitioned:
+        op.execute("CREATE INDEX ix_invoices_id ON invoices (id)")
+    if trigram:
+        for name, column in TRGM_INDEXES:
+            op.execute(f"CREATE INDEX {name} ON invoices USING gin ({column} gin_trgm_ops)")
+
+    for name, event, transitions, function in TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON invoices REFERENCING {transitions} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+    for statement in REBUILD:
+        op.execute(statement)
+    op.execute("ANALYZE invoices")
+
+
+def upgrade():
+    op.execute("ALTER TABLE reminders DROP CONSTRAINT IF EXISTS reminders_invoice_id_fkey")
+    _replace_invoices(partitioned=True)
+
+
+def downgrade():
+    _replace_invoices(partitioned=False)
+    op.execute(
+        "ALTER TABLE reminders ADD CONSTRAINT reminders_invoice_id_fkey "
+        "FOREIGN KEY (invoice_id) REFERENCES invoices (id)"
+    )
@@ -0,0 +1,34 @@
+"""btree indexes for exact and prefix invoice search
+
+lower(invoice_number) and lower(customer_name) with text_pattern_ops, which
+serve both `lower(x) = 'q'` and `lower(x) LIKE 'q%'` as range scans that stop
+at the candidate limit (see utils/search.py), with or without pg_trgm.
+Indexes on the partitioned `invoices` cannot be built CONCURRENTLY: writes
+to invoices wait for the build.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_invoices_number_lower", "invoice_number"),
+    ("ix_invoices_customer_lower", "customer_name"),
+]
+
+
+def upgrade():
+    for name, column in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON invoices (lower({column}) text_pattern_ops)")
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.execute(f"DROP INDEX {name}")
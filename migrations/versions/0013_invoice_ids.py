@@ -0,0 +1,92 @@
+"""invoice_ids: unique invoice ids and the reminders.invoice_id foreign key
+
+The partitioned `invoices` (0011) cannot enforce a unique `id` or be the
+target of reminders.invoice_id's foreign key. Statement-level triggers now
+keep every invoice id in `invoice_ids` (id PRIMARY KEY), and
+reminders.invoice_id references that table (see utils/partitions.py).
+
+Fails, changing nothing, if two invoices share an id or a reminder points
+at a missing invoice: fix those rows and run it again. Invoice writes block
+while the ids are copied (SHARE lock).
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+# Frozen as of this revision; utils/partitions.py keeps its own copy
+FUNCTION = """
+CREATE OR REPLACE FUNCTION invoice_ids_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO invoice_ids (id) SELECT id FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM invoice_ids WHERE id IN (SELECT id FROM old_rows);
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM invoice_ids;
+    ELSE
+        -- Only the ids the UPDATE changed; a status change keeps its id
+        DELETE FROM invoice_ids WHERE id IN (SELECT id FROM old_rows EXCEPT SELECT id FROM new_rows);
+        INSERT INTO invoice_ids (id) SELECT id FROM new_rows EXCEPT ALL SELECT id FROM old_rows;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = [
+    ("invoices_ids_insert", "INSERT", "REFERENCING NEW TABLE AS new_rows"),
+    ("invoices_ids_update", "UPDATE", "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ("invoices_ids_delete", "DELETE", "REFERENCING OLD TABLE AS old_rows"),
+    ("invoices_ids_truncate", "TRUNCATE", ""),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.execute("LOCK TABLE invoices IN SHARE MODE")
+    duplicated = bind.exec_driver_sql(
+        "SELECT count(*) FROM (SELECT id FROM invoices GROUP BY id HAVING count(*) > 1) AS d"
+    ).scalar()
+    orphaned = bind.exec_driver_sql(
+        "SELECT count(*) FROM reminders "
+        "WHERE NOT EXISTS (SELECT 1 FROM invoices WHERE invoices.id = reminders.invoice_id)"
+    ).scalar()
+    if duplicated or orphaned:
+        raise RuntimeError(
+            f"{duplicated} invoice ids are used more than once and {orphaned} reminders "
+            "point at missing invoices; fix those rows before upgrading"
+        )
+
+    op.create_table(
+        "invoice_ids",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO invoice_ids (id) SELECT id FROM invoices")
+    op.execute(FUNCTION)
+    for name, event, referencing in TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON invoices {referencing} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION invoice_ids_apply()"
+        )
+    op.create_foreign_key(
+        "reminders_invoice_id_fkey", "reminders", "invoice_ids", ["invoice_id"], ["id"]
+    )
+
+
+def downgrade():
+    op.drop_constraint("reminders_invoice_id_fkey", "reminders", type_="foreignkey")
+    for name, _, _ in reversed(TRIGGERS):
+        op.execute(f"DROP TRIGGER {name} ON invoices")
+    op.execute("DROP FUNCTION invoice_ids_apply()")
+    op.drop_table("invoice_ids")
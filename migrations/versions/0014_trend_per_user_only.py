@@ -0,0 +1,118 @@
+"""invoice_trend_daily without the all-users rows
+
+Drops the user_id 0 rows of 0006. Every invoice write upserted the
+(0, issue_date) row too, so concurrent writers of all users queued on one
+row lock until commit. The admin trend now sums the per-user rows through
+a covering index on `day`, and user_id becomes a foreign key to users
+(ON DELETE CASCADE), as in user_invoice_summary.
+
+Downgrade restores the all-users rows and the trigger function that
+maintains them.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+INDEX_COLUMNS = ["paid_count", "paid_amount", "pending_count", "pending_amount"]
+
+
+# Frozen copy of the DDL in utils/invoice_summary.py as of this revision;
+# with all_users, the 0006 version that also maintains the user_id 0 rows
+def _owner(all_users: bool, source: str) -> tuple:
+    if all_users:
+        return "owner.user_id", f"CROSS JOIN LATERAL (VALUES ({source}.user_id), (0)) AS owner (user_id)"
+    return "user_id", ""
+
+
+def _apply_trend(deltas: str, all_users: bool) -> str:
+    # `deltas` yields (user_id, issue_date, status, amount, n)
+    owner, lateral = _owner(all_users, "delta")
+    return f"""
+        INSERT INTO invoice_trend_daily AS t (
+            user_id, day, paid_count, paid_amount, pending_count, pending_amount
+        )
+        SELECT
+            {owner},
+            delta.issue_date,
+            coalesce(sum(n) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Pending'), 0)
+        FROM ({deltas}) AS delta
+        {lateral}
+        WHERE status IN ('Paid', 'Pending')
+        GROUP BY {owner}, delta.issue_date
+        ORDER BY {owner}, delta.issue_date
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            paid_count = t.paid_count + EXCLUDED.paid_count,
+            paid_amount = t.paid_amount + EXCLUDED.paid_amount,
+            pending_count = t.pending_count + EXCLUDED.pending_count,
+            pending_amount = t.pending_amount + EXCLUDED.pending_amount;"""
+
+
+_TREND_KEY = "(o.user_id, o.issue_date, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.issue_date, n.status, n.amount)"
+
+_TREND_CHANGED = f"""
+    SELECT o.user_id, o.issue_date, o.status, o.amount, -1 AS n
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+    UNION ALL
+    SELECT n.user_id, n.issue_date, n.status, n.amount, 1
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+"""
+
+
+def _trend_function(all_users: bool) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION invoice_trend_daily_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, 1 AS n FROM new_rows", all_users)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, -1 AS n FROM old_rows", all_users)}
+    ELSE
+        {_apply_trend(_TREND_CHANGED, all_users)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade():
+    op.execute("LOCK TABLE invoices IN SHARE MODE")
+    op.execute(_trend_function(all_users=False))
+    op.execute("DELETE FROM invoice_trend_daily WHERE user_id NOT IN (SELECT id FROM users)")
+    op.create_foreign_key(
+        "invoice_trend_daily_user_id_fkey", "invoice_trend_daily", "users",
+        ["user_id"], ["id"], ondelete="CASCADE",
+    )
+    op.create_index(
+        "ix_invoice_trend_daily_day", "invoice_trend_daily", ["day"],
+        postgresql_include=INDEX_COLUMNS,
+    )
+
+
+def downgrade():
+    op.execute("LOCK TABLE invoices IN SHARE MODE")
+    op.drop_index("ix_invoice_trend_daily_day", table_name="invoice_trend_daily")
+    op.drop_constraint("invoice_trend_daily_user_id_fkey", "invoice_trend_daily", type_="foreignkey")
+    op.execute(_trend_function(all_users=True))
+    op.execute("""
+        INSERT INTO invoice_trend_daily (
+            user_id, day, paid_count, paid_amount, pending_count, pending_amount
+        )
+        SELECT 0, day, sum(paid_count), sum(paid_amount), sum(pending_count), sum(pending_amount)
+        FROM invoice_trend_daily
+        GROUP BY day
+    """)
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey,DateTime, func, text
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey,DateTime, Index, Numeric, PrimaryKeyConstraint, Text, event, func, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from database import Base
+from utils.invoice_summary import install_summary, install_trend
+from utils.partitions import install_invoice_ids, install_partitions
 
 class User(Base):
     __tablename__ = "users"
@@ -15,21 +17,116 @@ class User(Base):
     role = Column(String(20), nullable=False, default="user")
 
 class Invoice(Base):
+    """Partitioned by status, Paid by due_date too (utils/partitions.py)."""
     __tablename__ = "invoices"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, autoincrement=True)
     invoice_number = Column(String, nullable=False)
     customer_name = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
     issue_date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=False)
-    status = Column(String, default="Pending")
+    status = Column(String, nullable=False, default="Pending")
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="invoices")
     user_email = Column(String, nullable=False)
-    reminders = relationship("Reminder", back_populates="invoice", cascade="all, delete-orphan")
+    reminders = relationship(
+        "Reminder", back_populates="invoice", cascade="all, delete-orphan",
+        primaryjoin="Invoice.id == foreign(Reminder.invoice_id)",
+    )
+
+    # The partition keys must be in the primary key; `id` alone identifies
+    # an invoice everywhere else (db.get, relationships)
+    __mapper_args__ = {"primary_key": [id]}
+
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "status", "due_date", name="invoices_pkey"),
+        # Per-user dashboard filters and listings
+        Index("ix_invoices_user_status_due", "user_id", "status", "due_date"),
+        Index("ix_invoices_user_due_id", "user_id", "due_date", "id"),
+        # Admin keyset listing on (due_date, id)
+        Index("ix_invoices_due_id", "due_date", "id"),
+        # The other listing sort orders (utils/invoice_query.py), per user and admin-wide
+        Index("ix_invoices_user_amount_id", "user_id", "amount", "id"),
+        Index("ix_invoices_user_customer_due_id", "user_id", "customer_name", "due_date", "id"),
+        Index("ix_invoices_amount_id", "amount", "id"),
+        Index("ix_invoices_customer_due_id", "customer_name", "due_date", "id"),
+        # Exact and prefix invoice search (utils/search.py): lower(x) = 'q', LIKE 'q%'
+        Index(
+            "ix_invoices_number_lower", func.lower(invoice_number).label("number_lower"),
+            postgresql_ops={"number_lower": "text_pattern_ops"}
+        ),
+        Index(
+            "ix_invoices_customer_lower", func.lower(customer_name).label("customer_lower"),
+            postgresql_ops={"customer_lower": "text_pattern_ops"}
+        ),
+        # Overdue / due-today / expected-collection only ever look at Pending
+        Index(
+            "ix_invoices_pending_due", "due_date",
+            postgresql_where=text("status = 'Pending'")
+        ),
+        {"postgresql_partition_by": "LIST (status)"},
+    )
+
+
+class InvoiceId(Base):
+    """Every invoice id, kept by triggers on `invoices` (utils/partitions.py)."""
+    __tablename__ = "invoice_ids"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+
+
+
+class UserInvoiceSummary(Base):
+    """Per-user invoice counters, maintained by triggers on `invoices`."""
+    __tablename__ = "user_invoice_summary"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    invoice_count = Column(Integer, nullable=False, server_default="0")
+    pending_count = Column(Integer, nullable=False, server_default="0")
+    # numeric so repeated +/- deltas don't accumulate float error
+    pending_amount = Column(Numeric(asdecimal=False), nullable=False, server_default="0")
+    paid_count = Column(Integer, nullable=False, server_default="0")
+    paid_amount = Column(Numeric(asdecimal=False), nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
+class InvoiceTrendDaily(Base):
+    """Paid / pending totals per user and issue day, maintained by triggers."""
+    __tablename__ = "invoice_trend_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    paid_count = Column(Integer, nullable=False, server_default="0")
+    paid_amount = Column(Numeric(asdecimal=False), nullable=False, server_default="0")
+    pending_count = Column(Integer, nullable=False, server_default="0")
+    pending_amount = Column(Numeric(asdecimal=False), nullable=False, server_default="0")
+
+    __table_args__ = (
+        # The all-users trend: an index-only scan of the range, summed
+        Index(
+            "ix_invoice_trend_daily_day", "day",
+            postgresql_include=["paid_count", "paid_amount", "pending_count", "pending_amount"]
+        ),
+    )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_invoice_read_models(target, connection, tables=(), **kw):
+    # Only when create_all actually created the tables (fresh databases);
+    # migrated databases get the same DDL from Alembic.
+    if Invoice.__table__ in tables:
+        install_partitions(connection)
+    if InvoiceId.__table__ in tables:
+        install_invoice_ids(connection)
+    if UserInvoiceSummary.__table__ in tables:
+        install_summary(connection)
+    if InvoiceTrendDaily.__table__ in tables:
+        install_trend(connection)
+    if Invoice.__table__ in tables:
+        from utils.search import install_search  # imports models
+        install_search(connection)
 
 
 class Reminder(Base):
@@ -38,7 +135,9 @@ class Reminder(Base):
     id = Column(Integer, primary_key=True, index=True)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False)
+    # invoices is partitioned and its key includes status and due_date, so
+    # the FK targets the id registry instead
+    invoice_id = Column(Integer, ForeignKey("invoice_ids.id"), nullable=False)
 
     reminder_type = Column(String, default="email")
     status = Column(String, default="sent")
@@ -46,7 +145,17 @@ class Reminder(Base):
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User")
-    invoice = relationship("Invoice", back_populates="reminders")
+    invoice = relationship(
+        "Invoice", back_populates="reminders",
+        primaryjoin="Invoice.id == foreign(Reminder.invoice_id)",
+    )
+
+    __table_args__ = (
+        Index("ix_reminders_sent_id", "sent_at", "id"),
+        Index("ix_reminders_user_sent", "user_id", "sent_at"),
+        # Scheduler's "already reminded in this window" probe
+        Index("ix_reminders_invoice_sent", "invoice_id", "sent_at"),
+    )
 
 class PasswordResetToken(Base) :
     __tablename__ = "password_reset_tokens"
@@ -55,5 +164,36 @@ class PasswordResetToken(Base) :
     email = Column(String, nullable=False)
     token = Column(String, nullable=False, index=True)
     role = Column(String, nullable=False) # 'user' or 'admin'
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # purge scans
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(30), nullable=False)  # 'password_reset' or 'reminder'
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # The sender only ever polls for due, unsent messages
+        Index(
+            "ix_email_outbox_due", "next_attempt_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+    )
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    # ADMISSION_BACKEND=table only. Unlogged: a crash just resets the limits.
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(32), primary_key=True)  # sha256 of scope:value, truncated
+    full_at = Column(DateTime(timezone=True), nullable=False)  # when the bucket is full again
@@ -1,96 +1,219 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User,Invoice
-from schemas import UserResponse,InvoiceResponse, UserUpdate, ForgotPasswordRequest, ResetPasswordFlowRequest
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, get_read_db, db_pool_stats, route_reads
+from models import User,Invoice,Reminder,UserInvoiceSummary
+from schemas import UserResponse,InvoiceResponse, InvoiceSearchResult, UserUpdate, ForgotPasswordRequest, ResetPasswordFlowRequest
 from utils.security import hash_password
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func, case
-from datetime import date, timedelta
+from sqlalchemy import delete, func, or_, select
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, stream_ndjson
+from utils.cache import ADMIN_DASHBOARD_KEY, cached_dashboard, dashboard_cache, invalidate_dashboards
+from utils.export import export_response
+from utils.fast_json import FAST_JSON, RowShape, fast_page, fast_stream
+from utils.invoice_query import InvoiceQuery, invoice_query
+from utils.search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_invoices, search_term
+from utils.admission import admission_stats
+from utils.hashing import hashing_stats
+from utils.outbox import outbox_stats
+from utils.reset_tokens import reset_tokens
+from utils.auth_bearer import token_cache
+from utils.reminder_scheduler import run_reminder_schedule
+from utils.trend import GRANULARITY_PATTERN, monthly_trend, trend_series
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+INVOICE_SHAPE = RowShape(InvoiceResponse, Invoice)
+
 @router.get("/users", response_model=list[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+async def get_all_users(db: AsyncSession = Depends(get_read_db)):
+    return (await db.scalars(select(User))).all()
 
 
 @router.get("/invoices", response_model=list[InvoiceResponse])
-def get_all_invoices(db: Session = Depends(get_db)):
-    invoices = (
-        db.query(Invoice)
-        .options(joinedload(Invoice.user))
-        .all()
+async def get_all_invoices(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    query: InvoiceQuery = Depends(invoice_query),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Keyset on the sort key (due_date, id by default); ?stream=true returns
+    # every matching row as NDJSON
+    stmt = query.apply(select(Invoice), after)
+    if FAST_JSON:
+        if stream:
+            return fast_stream(stmt, INVOICE_SHAPE)
+        return await fast_page(db, stmt, INVOICE_SHAPE, query.key, limit)
+    stmt = stmt.options(joinedload(Invoice.user))
+    if stream:
+        return stream_ndjson(stmt, InvoiceResponse)
+    return await paginate(db, stmt, query.key, limit, response)
+
+
+@router.get("/invoices/search", response_model=list[InvoiceSearchResult])
+async def search_all_invoices(
+    q: str = Depends(search_term),
+    user_id: Optional[int] = None,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # 🔍 Partial invoice number or customer name across all users
+    return await search_invoices(db, q, user_id, limit)
+
+
+# 📤 Exports: plain column tuples, no ORM objects or response models, so a
+# multi-million-row download streams in constant memory
+INVOICE_EXPORT_COLUMNS = (
+    Invoice.id, Invoice.invoice_number, Invoice.customer_name, Invoice.amount,
+    Invoice.issue_date, Invoice.due_date, Invoice.status, Invoice.user_id,
+    Invoice.user_email,
+)
+REMINDER_EXPORT_COLUMNS = (
+    Reminder.id, Reminder.user_id, Reminder.invoice_id, Invoice.invoice_number,
+    Invoice.customer_name, Reminder.reminder_type, Reminder.status, Reminder.sent_at,
+)
+
+
+def _utc_day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+# Exports open their own read session once the download starts
+# (utils/export.py); route_reads gives it the replica routing and sticky
+# read-your-writes of get_read_db
+@router.get("/exports/invoices", dependencies=[Depends(route_reads)])
+async def export_invoices(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+):
+    stmt = select(*INVOICE_EXPORT_COLUMNS)
+    if status:
+        stmt = stmt.where(Invoice.status == status)
+    if user_id is not None:
+        stmt = stmt.where(Invoice.user_id == user_id)
+    if due_from:
+        stmt = stmt.where(Invoice.due_date >= due_from)
+    if due_to:
+        stmt = stmt.where(Invoice.due_date <= due_to)
+    # (due_date, id) matches the listing indexes, so rows stream without a sort
+    stmt = stmt.order_by(Invoice.due_date, Invoice.id)
+    return export_response(
+        stmt, [col.key for col in INVOICE_EXPORT_COLUMNS], fmt, "invoices"
+    )
+
+
+@router.get("/exports/reminders", dependencies=[Depends(route_reads)])
+async def export_reminders(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    user_id: Optional[int] = None,
+    invoice_id: Optional[int] = None,
+    reminder_type: Optional[str] = None,
+    sent_from: Optional[date] = None,
+    sent_to: Optional[date] = None,
+):
+    stmt = select(*REMINDER_EXPORT_COLUMNS).join(
+        Invoice, Invoice.id == Reminder.invoice_id
+    )
+    if user_id is not None:
+        stmt = stmt.where(Reminder.user_id == user_id)
+    if invoice_id is not None:
+        stmt = stmt.where(Reminder.invoice_id == invoice_id)
+    if reminder_type:
+        stmt = stmt.where(Reminder.reminder_type == reminder_type)
+    # Dates are whole UTC days, sent_to inclusive
+    if sent_from:
+        stmt = stmt.where(Reminder.sent_at >= _utc_day_start(sent_from))
+    if sent_to:
+        stmt = stmt.where(Reminder.sent_at < _utc_day_start(sent_to + timedelta(days=1)))
+    stmt = stmt.order_by(Reminder.sent_at, Reminder.id)
+    return export_response(
+        stmt, [col.key for col in REMINDER_EXPORT_COLUMNS], fmt, "reminders"
     )
-    return invoices
 
 
+# Cached dashboards are built on the primary: one built on a lagging replica
+# after an invalidation would be cached, stale, until the entry expires
 @router.get("/dashboard")
-def get_dashboard_data(db: Session = Depends(get_db)):
+async def get_dashboard_data(db: AsyncSession = Depends(get_async_db)):
+    return await cached_dashboard(ADMIN_DASHBOARD_KEY, lambda: compute_dashboard(db))
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {"dashboard": dashboard_cache.stats(), "jwt": token_cache.stats()}
+
+
+@router.get("/metrics/hashing")
+async def get_hashing_metrics():
+    return hashing_stats()
+
+@router.get("/metrics/admission")
+async def get_admission_metrics():
+    return admission_stats()
+
+@router.get("/metrics/outbox")
+async def get_outbox_metrics():
+    return outbox_stats()
+
+@router.get("/metrics/reset-tokens")
+async def get_reset_token_metrics():
+    return reset_tokens.stats()
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics():
+    return db_pool_stats()
+
+
+async def compute_dashboard(db: AsyncSession):
     today = date.today()
     week_end = today + timedelta(days=7)
 
-    # 1️⃣ STATS CARDS
-    total_pending = db.query(
-        func.coalesce(func.sum(Invoice.amount), 0)
-    ).filter(Invoice.status == "Pending").scalar()
+    pending = Invoice.status == "Pending"
+    summary = UserInvoiceSummary
 
-    due_today = db.query(Invoice).filter(
-        Invoice.due_date == today,
-        Invoice.status == "Pending"
-    ).count()
+    # 1️⃣ CARDS + DONUT: status totals are sums over the trigger-maintained
+    # per-user summary; the date-dependent figures are range probes on the
+    # Pending-only due_date index.
+    totals = (await db.execute(select(
+        func.coalesce(func.sum(summary.pending_amount), 0.0).label("pending_amount"),
+        func.coalesce(func.sum(summary.pending_count), 0).label("pending_count"),
+        func.coalesce(func.sum(summary.paid_count), 0).label("paid_count"),
+        select(func.count()).where(pending, Invoice.due_date == today)
+            .scalar_subquery().label("due_today"),
+        select(func.count()).where(pending, Invoice.due_date < today)
+            .scalar_subquery().label("overdue"),
+        select(func.coalesce(func.sum(Invoice.amount), 0.0))
+            .where(pending, Invoice.due_date.between(today, week_end))
+            .scalar_subquery().label("expected"),
+    ))).one()
 
-    completed_month = db.query(Invoice).filter(
-        Invoice.status == "Paid",
-        func.date_part("month", Invoice.issue_date) == today.month,
-        func.date_part("year", Invoice.issue_date) == today.year
-    ).count()
+    # 📈 TREND: last twelve months from the daily rollup; the current month's
+    # bucket also gives the paid-this-month count
+    monthly_trend_rows = await monthly_trend(db, today=today)
+    completed_month = monthly_trend_rows[-1]["paid_count"]
 
-    overdue = db.query(Invoice).filter(
-        Invoice.due_date < today,
-        Invoice.status == "Pending"
-    ).count()
-
-    # 2️⃣ EXPECTED COLLECTION
-    expected_collection = db.query(
-        func.coalesce(func.sum(Invoice.amount), 0)
-    ).filter(
-        Invoice.due_date.between(today, week_end),
-        Invoice.status == "Pending"
-    ).scalar()
-
-    # 3️⃣ TOP OVERDUE
-    top_overdue = db.query(Invoice).filter(
+    total_pending = totals.pending_amount
+    due_today = totals.due_today
+    overdue = totals.overdue
+    expected_collection = totals.expected
+    paid_count = totals.paid_count
+    pending_count = totals.pending_count - totals.overdue
+    overdue_count = overdue
+
+    # 2️⃣ TOP OVERDUE
+    top_overdue = (await db.execute(select(
+        Invoice.customer_name, Invoice.due_date, Invoice.amount
+    ).where(
         Invoice.due_date < today,
-        Invoice.status == "Pending"
-    ).order_by(Invoice.due_date.asc()).limit(3).all()
-
-    # 4️⃣ MONTHLY PAYMENT TREND (BAR GRAPH)
-    monthly_trend = db.query(
-        func.to_char(Invoice.issue_date, 'Mon').label("month"),
-        func.sum(
-            case((Invoice.status == "Paid", Invoice.amount), else_=0)
-        ).label("paid"),
-        func.sum(
-            case((Invoice.status == "Pending", Invoice.amount), else_=0)
-        ).label("pending")
-    ).group_by("month").order_by("month").all()
-
-    # 5️⃣ PAYMENT STATUS (DONUT)
-    paid_count = db.query(func.count()).filter(
-        Invoice.status == "Paid"
-    ).scalar()
-
-    pending_count = db.query(func.count()).filter(
-        Invoice.status == "Pending",
-        Invoice.due_date >= today
-    ).scalar()
-
-    overdue_count = db.query(func.count()).filter(
-        Invoice.status == "Pending",
-        Invoice.due_date < today
-    ).scalar()
+        pending
+    ).order_by(Invoice.due_date.asc()).limit(3))).all()
 
     return {
         "stats": {
@@ -115,11 +238,11 @@ def get_dashboard_data(db: Session = Depends(get_db)):
         "analytics": {
             "monthlyTrend": [
                 {
-                    "month": row.month.strip(),
-                    "paid": row.paid,
-                    "pending": row.pending
+                    "month": bucket["period"].strftime("%b"),
+                    "paid": bucket["paid"],
+                    "pending": bucket["pending"]
                 }
-                for row in monthly_trend
+                for bucket in monthly_trend_rows
             ],
             "paymentStatus": {
                 "paid": paid_count,
@@ -130,13 +253,29 @@ def get_dashboard_data(db: Session = Depends(get_db)):
     }
     
     
+@router.get("/trend")
+async def get_trend(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # 📈 All users' paid / pending by issue date (every user's rollup rows, summed)
+    return await trend_series(db, start=start, end=end, granularity=granularity)
+
+
+@router.post("/reminders/run")
+async def run_reminders(db: AsyncSession = Depends(get_async_db)):
+    return await run_reminder_schedule(db)
+
+
 @router.put("/users/{user_id}")
-def update_user(
+async def update_user(
     user_id: int,
     data: UserUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -147,10 +286,10 @@ def update_user(
 
     # 🔄 Update email (check uniqueness)
     if data.email is not None:
-        existing = db.query(User).filter(
+        existing = await db.scalar(select(User.id).where(
             User.email == data.email,
             User.id != user_id
-        ).first()
+        ))
 
         if existing:
             raise HTTPException(
@@ -161,8 +300,9 @@ def update_user(
         user.email = data.email
 
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_dashboards(user_id)
+    await db.refresh(user)
 
     return {
         "message": "User updated successfully",
@@ -174,13 +314,28 @@ def update_user(
     }
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Set-based deletes: the ORM cascade loaded every invoice, then each
+    # invoice's reminders one SELECT at a time, and deleted row by row
+    user_invoices = select(Invoice.id).where(Invoice.user_id == user_id)
+    await db.execute(
+        delete(Reminder)
+        .where(or_(Reminder.user_id == user_id, Reminder.invoice_id.in_(user_invoices)))
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(Invoice).where(Invoice.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = await db.execute(
+        delete(User).where(User.id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    if not deleted.rowcount:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="User not found")
-    
-    db.delete(user)
-    db.commit()
+    await db.commit()
+    invalidate_dashboards(user_id)
     
     return {"message": f"User {user_id} and all their associated data have been deleted successfully"}
     
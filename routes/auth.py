@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, PasswordResetToken
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import User
 from schemas import ForgotPasswordRequest, TokenValidationRequest, ResetPasswordFlowRequest
-from utils.auth_utils import generate_secure_token, send_reset_email
-from utils.security import hash_password
-from datetime import datetime, timedelta, timezone
+from utils.auth_utils import reset_email
+from utils.admission import admission
+from utils.hashing import hash_password_async
+from utils.outbox import enqueue_email
+from utils.reset_tokens import reset_tokens
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-def handle_forgot_password(email: str, role: str, db: Session):
+async def handle_forgot_password(email: str, role: str, db: AsyncSession):
     # Verify email exists with the correct role
-    user = db.query(User).filter(User.email == email, User.role == role).first()
+    user = await db.scalar(select(User).where(User.email == email, User.role == role))
     
     # We always return the same message to prevent email enumeration
     success_message = {"message": "If the email exists, a reset link has been sent"}
@@ -19,70 +22,42 @@ def handle_forgot_password(email: str, role: str, db: Session):
     if not user:
         return success_message
 
-    # Generate token and set expiry (15 minutes)
-    token = generate_secure_token()
-    expiry = datetime.now(timezone.utc) + timedelta(minutes=15)
-    
-    # Save token to DB
-    reset_token = PasswordResetToken(
-        email=email,
-        token=token,
-        role=role,
-        expires_at=expiry
-    )
-    db.add(reset_token)
-    db.commit()
-    
-    # Send email
-    send_reset_email(email, token)
+    # Expires after RESET_TOKEN_TTL_MINUTES (15); see utils/reset_tokens.py
+    token = await reset_tokens.issue(db, user)
+
+    # Queue the email in the same transaction; the outbox sender delivers it
+    subject, body = reset_email(token)
+    enqueue_email(db, "password_reset", email, subject, body)
+    await db.commit()
     
     return success_message
 
 @router.post("/user/forgot-password")
-def user_forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    return handle_forgot_password(request.email, "user", db)
+async def user_forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    return await handle_forgot_password(request.email, "user", db)
 
 @router.post("/admin/forgot-password")
-def admin_forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    return handle_forgot_password(request.email, "admin", db)
+async def admin_forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    return await handle_forgot_password(request.email, "admin", db)
 
 @router.post("/validate-reset-token")
-def validate_reset_token(request: TokenValidationRequest, db: Session = Depends(get_db)):
-    token_record = db.query(PasswordResetToken).filter(PasswordResetToken.token == request.token).first()
+async def validate_reset_token(request: TokenValidationRequest, db: AsyncSession = Depends(get_async_db)):
+    # Signed tokens are checked in memory; only the table backend queries
+    reason = await reset_tokens.check(db, request.token)
     
-    if not token_record:
-        return {"valid": False, "message": "Invalid token"}
-    
-    if token_record.expires_at < datetime.now(timezone.utc):
-        return {"valid": False, "message": "Token has expired"}
+    if reason:
+        return {"valid": False, "message": reason}
     
     return {"valid": True, "message": "Token is valid"}
 
-@router.post("/reset-password")
-def reset_password(request: ResetPasswordFlowRequest, db: Session = Depends(get_db)):
-    token_record = db.query(PasswordResetToken).filter(PasswordResetToken.token == request.token).first()
-    
-    if not token_record:
-        raise HTTPException(status_code=400, detail="Invalid token")
-    
-    if token_record.expires_at < datetime.now(timezone.utc):
-        db.delete(token_record)
-        db.commit()
-        raise HTTPException(status_code=400, detail="Token has expired")
-    
-    # Find the user/admin
-    user = db.query(User).filter(User.email == token_record.email, User.role == token_record.role).first()
-    if not user:
-        db.delete(token_record)
-        db.commit()
-        raise HTTPException(status_code=404, detail="User not found")
+@router.post("/reset-password", dependencies=[admission("auth")])
+async def reset_password(request: ResetPasswordFlowRequest, db: AsyncSession = Depends(get_async_db)):
+    # Raises 400/404 for unusable tokens; redeeming is one-time use
+    user = await reset_tokens.consume(db, request.token)
     
     # Update password
-    user.password = hash_password(request.new_password)
-    
-    # Delete token (one-time use)
-    db.delete(token_record)
+    user.password = await hash_password_async(request.new_password)
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Password reset successful"}
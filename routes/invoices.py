@@ -1,41 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from database import get_async_db, get_read_db
 from models import Invoice, User
-from schemas import InvoiceCreate, InvoiceResponse
+from schemas import InvoiceCreate, InvoiceResponse, InvoiceSearchResult
+from utils.cache import invalidate_dashboards
+from utils.fast_json import FAST_JSON, RowShape, fast_page, fast_stream
+from utils.invoice_query import InvoiceQuery, invoice_query
+from utils.search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_invoices, search_term
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, stream_ndjson
+from utils.ingest import IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS, MAX_BIND_PARAMS, iter_csv_rows, iter_lines, iter_ndjson_rows, validate_row
+from typing import Optional
+
+INVOICE_SHAPE = RowShape(InvoiceResponse, Invoice)
 
 router = APIRouter(prefix="/users/{user_id}/invoices", tags=["Invoices"])
 
 @router.post("/create", response_model=InvoiceResponse)
-def create_invoice(
+async def create_invoice(
     user_id: int,
     invoice: InvoiceCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    # Attach the loaded user so serializing `user` needs no lazy load
     db_invoice = Invoice(
         **invoice.dict(),
-        user_id=user_id,
+        user=user,
         user_email=user.email
     )
 
     db.add(db_invoice)
-    db.commit()
-    db.refresh(db_invoice)
+    await db.commit()
+    invalidate_dashboards(user_id)
     return db_invoice
 
 
+@router.post("/import")
+async def import_invoices(
+    user_id: int,
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bulk-create invoices from a raw CSV (header row required) or NDJSON
+    request body. The body is parsed as it streams in; valid rows are inserted
+    and committed in batches, invalid rows are skipped and reported.
+    """
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_email = user.email
+
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "ndjson" if "json" in content_type else "csv"
+    lines = iter_lines(request.stream())
+    rows = iter_csv_rows(lines) if fmt == "csv" else iter_ndjson_rows(lines)
+
+    inserted = failed = 0
+    errors = []
+    batch = []
+
+    async def flush():
+        nonlocal inserted
+        if batch:
+            # One multi-row INSERT per slice, so the read model triggers fire
+            # once per statement. (An executemany would go out row by row on
+            # asyncpg.)
+            rows = MAX_BIND_PARAMS // len(batch[0])
+            for start in range(0, len(batch), rows):
+                await db.execute(insert(Invoice).values(batch[start:start + rows]))
+            await db.commit()
+            invalidate_dashboards(user_id)
+            inserted += len(batch)
+            batch.clear()
+
+    async for row_number, value in rows:
+        invoice, row_errors = validate_row(InvoiceCreate, value)
+        if row_errors:
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"row": row_number, "errors": row_errors})
+            continue
+        batch.append({
+            **invoice.model_dump(),
+            "status": "Pending",
+            "user_id": user_id,
+            "user_email": user_email
+        })
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors)
+    }
+
+
+async def _invoice_listing(stmt, query: InvoiceQuery, response, limit, after, stream, db):
+    # 🔎 Filters and sort run in SQL; the cursor follows the sort key
+    stmt = query.apply(stmt, after)
+    # ⚡ FAST_JSON: column tuples straight to orjson, same body and schema
+    if FAST_JSON:
+        if stream:
+            return fast_stream(stmt, INVOICE_SHAPE)
+        return await fast_page(db, stmt, INVOICE_SHAPE, query.key, limit)
+    stmt = stmt.options(joinedload(Invoice.user))
+    if stream:
+        return stream_ndjson(stmt, InvoiceResponse)
+    return await paginate(db, stmt, query.key, limit, response)
+
+
 @router.get("/", response_model=list[InvoiceResponse])
-def get_user_invoices(
+async def get_user_invoices(
     user_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    query: InvoiceQuery = Depends(invoice_query),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return db.query(Invoice).filter(Invoice.user_id == user_id).all()
+    stmt = select(Invoice).where(Invoice.user_id == user_id)
+    return await _invoice_listing(stmt, query, response, limit, after, stream, db)
+
+
+@router.get("/search", response_model=list[InvoiceSearchResult])
+async def search_user_invoices(
+    user_id: int,
+    q: str = Depends(search_term),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # 🔍 Partial invoice number or customer name, best match first
+    return await search_invoices(db, q, user_id, limit)
 
 
 @router.get("/all", response_model=list[InvoiceResponse])
-def get_all_invoices(db: Session = Depends(get_db)):
-    return db.query(Invoice).all()
+async def get_all_invoices(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    query: InvoiceQuery = Depends(invoice_query),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await _invoice_listing(select(Invoice), query, response, limit, after, stream, db)
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, get_read_db
 from models import Reminder, User, Invoice
 from schemas import ReminderCreate, ReminderResponse, ReminderCreateResponse
+from utils.cache import invalidate_dashboards
+from utils.fast_json import FAST_JSON, RowShape, fast_list, fast_page, fast_stream
+from utils.outbox import enqueue_email, reminder_email
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset, paginate, stream_ndjson
+from datetime import datetime
+from typing import Optional
+
+REMINDER_KEY = (Reminder.sent_at, Reminder.id)
+REMINDER_SHAPE = RowShape(ReminderResponse, Reminder)
 
 router = APIRouter(prefix="/reminders", tags=["Reminders"])
 
 @router.post("/reminders/create")
-def create_reminder(payload: ReminderCreate, db: Session = Depends(get_db)):
+async def create_reminder(payload: ReminderCreate, db: AsyncSession = Depends(get_async_db)):
 
-    invoice = db.query(Invoice).filter(Invoice.id == payload.invoice_id).first()
+    invoice = await db.get(Invoice, payload.invoice_id)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    user = db.query(User).filter(User.id == payload.user_id).first()
+    user = await db.get(User, payload.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -25,8 +35,10 @@ def create_reminder(payload: ReminderCreate, db: Session = Depends(get_db)):
     )
 
     db.add(reminder)
-    db.commit()
-    db.refresh(reminder)
+    enqueue_email(db, "reminder", user.email, *reminder_email(invoice))
+    await db.commit()
+    invalidate_dashboards(user.id, invoice.user_id)
+    await db.refresh(reminder)
 
     # 👇 THIS IS THE IMPORTANT PART
     return {
@@ -41,10 +53,29 @@ def create_reminder(payload: ReminderCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/user/{user_id}/reminders", response_model=list[ReminderResponse])
-def get_user_reminders(user_id: int, db: Session = Depends(get_db)):
-    return db.query(Reminder).filter(Reminder.user_id == user_id)\
-        .order_by(Reminder.sent_at.desc()).all()
+async def get_user_reminders(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    stmt = select(Reminder).where(Reminder.user_id == user_id).order_by(Reminder.sent_at.desc())
+    if FAST_JSON:
+        return await fast_list(db, stmt, REMINDER_SHAPE)
+    return (await db.scalars(stmt)).all()
 
 @router.get("/admin/reminders", response_model=list[ReminderResponse])
-def get_all_reminders(db: Session = Depends(get_db)):
-    return db.query(Reminder).order_by(Reminder.sent_at.desc()).all()
+async def get_all_reminders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Newest first: keyset on (sent_at, id) descending
+    stmt = keyset(
+        select(Reminder), REMINDER_KEY,
+        (datetime.fromisoformat, int), after, descending=True
+    )
+    if FAST_JSON:
+        if stream:
+            return fast_stream(stmt, REMINDER_SHAPE)
+        return await fast_page(db, stmt, REMINDER_SHAPE, REMINDER_KEY, limit)
+    if stream:
+        return stream_ndjson(stmt, ReminderResponse)
+    return await paginate(db, stmt, REMINDER_KEY, limit, response)
@@ -1,27 +1,31 @@
-from fastapi import APIRouter, Depends,HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Invoice
+from fastapi import APIRouter, Depends,HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, get_read_db
+from models import User, Invoice, UserInvoiceSummary
 from schemas import UserRegister, UserLogin, UserResponse,UserUpdate, ForgotPasswordRequest, ResetPasswordFlowRequest, ChangePasswordRequest
-from utils.security import hash_password, verify_password, create_access_token
+from utils.security import create_access_token
+from utils.hashing import hash_password_async, verify_password_async
+from utils.admission import admission, limit
 from utils.auth_bearer import get_current_user
-from sqlalchemy import func, case
+from sqlalchemy import func, select
 from datetime import date
-
-from database import get_db
+from typing import Optional
+from utils.cache import cached_dashboard, invalidate_dashboards, user_dashboard_key
+from utils.trend import GRANULARITY_PATTERN, monthly_trend, trend_series
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.post("/register", response_model=UserResponse)
-def register_user(user: UserRegister, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+# 🔐 bcrypt-bound routes: rate-limited per client and queued in the "auth" class
+@router.post("/register", response_model=UserResponse, dependencies=[admission("auth")])
+async def register_user(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(select(User.id).where(User.email == user.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    hashed_pwd = hash_password(user.password)
+    hashed_pwd = await hash_password_async(user.password)
     db_user = User(
         name=user.name,
         email=user.email,
@@ -31,21 +35,23 @@ def register_user(user: UserRegister, db: Session = Depends(get_db)):
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 
-@router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+@router.post("/login", dependencies=[admission("auth")])
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    # Per account too, so guesses spread over many addresses still run dry
+    await limit("email", user.email)
+    db_user = await db.scalar(select(User).where(User.email == user.email))
 
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # verify hashed password
-    if not verify_password(user.password, db_user.password):
+    if not await verify_password_async(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # Create access token
@@ -63,19 +69,19 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         }
     }
 
-@router.post("/change-password/{user_id}", dependencies=[Depends(get_current_user)])
-def change_password(user_id: int, request: ChangePasswordRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+@router.post("/change-password/{user_id}", dependencies=[Depends(get_current_user), admission("auth")])
+async def change_password(user_id: int, request: ChangePasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # 🕵️ Verify old password
-    if not verify_password(request.old_password, user.password):
+    if not await verify_password_async(request.old_password, user.password):
         raise HTTPException(status_code=400, detail="Incorrect old password")
     
     # 🔒 Hash and update new password
-    user.password = hash_password(request.new_password)
-    db.commit()
+    user.password = await hash_password_async(request.new_password)
+    await db.commit()
     
     return {"message": "Password updated successfully"}
 
@@ -83,114 +89,109 @@ def change_password(user_id: int, request: ChangePasswordRequest, db: Session =
 
 
 @router.get("/", response_model=list[UserResponse], dependencies=[Depends(get_current_user)])
-def get_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+async def get_users(db: AsyncSession = Depends(get_read_db)):
+    return (await db.scalars(select(User))).all()
 
 
 
 @router.get("/{user_id}/dashboard")
-def user_dashboard(
+async def user_dashboard(
     user_id: int,
-    db: Session = Depends(get_db),
+    # Built on the primary, like the admin dashboard (routes/admin.py)
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    # ✅ Ensure user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    return await cached_dashboard(
+        user_dashboard_key(user_id),
+        lambda: compute_user_dashboard(db, user_id)
+    )
+
+
+async def compute_user_dashboard(db: AsyncSession, user_id: int):
+    today = date.today()
+    pending = (Invoice.user_id == user_id, Invoice.status == "Pending")
+    summary = UserInvoiceSummary
+
+    # 1️⃣ Summary + payment status: the user row, its trigger-maintained
+    # counters (PK lookups) and the two date-dependent figures, which are
+    # index range probes over that user's Pending invoices
+    stats = (await db.execute(select(
+        User.id,
+        User.name,
+        User.email,
+        func.coalesce(summary.invoice_count, 0).label("invoice_count"),
+        func.coalesce(summary.pending_count, 0).label("pending_count"),
+        func.coalesce(summary.pending_amount, 0.0).label("pending_amount"),
+        func.coalesce(summary.paid_count, 0).label("paid_count"),
+        func.coalesce(summary.paid_amount, 0.0).label("paid_amount"),
+        select(func.min(Invoice.due_date))
+            .where(*pending, Invoice.due_date >= today)
+            .scalar_subquery().label("next_due"),
+        select(func.count())
+            .where(*pending, Invoice.due_date < today)
+            .scalar_subquery().label("overdue_count"),
+    ).outerjoin(summary, summary.user_id == User.id).where(User.id == user_id))).first()
+
+    if not stats:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 1️⃣ Summary
-    total_invoices = db.query(func.count(Invoice.id)).filter(
-        Invoice.user_id == user_id
-    ).scalar()
-
-    pending_amount = db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Pending"
-    ).scalar()
-
-    total_paid = db.query(func.coalesce(func.sum(Invoice.amount), 0)).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Paid"
-    ).scalar()
-
-    next_due = db.query(Invoice.due_date).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Pending",
-        Invoice.due_date >= date.today()
-    ).order_by(Invoice.due_date.asc()).first()
-
-    # 2️⃣ Monthly Trend
-    trend = db.query(
-        func.to_char(Invoice.issue_date, 'Mon').label("month"),
-        func.sum(
-            case((Invoice.status == "Paid", Invoice.amount), else_=0)
-        ).label("paid"),
-        func.sum(
-            case((Invoice.status == "Pending", Invoice.amount), else_=0)
-        ).label("pending")
-    ).filter(
-        Invoice.user_id == user_id
-    ).group_by("month").order_by("month").all()
-
-    # 3️⃣ Payment Status
-    paid_count = db.query(func.count()).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Paid"
-    ).scalar()
-
-    pending_count = db.query(func.count()).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Pending"
-    ).scalar()
-
-    overdue_count = db.query(func.count()).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == "Pending",
-        Invoice.due_date < date.today()
-    ).scalar()
-
-    total_amount = pending_amount + total_paid
-    recovery_rate = int((total_paid / total_amount) * 100) if total_amount else 0
+    # 2️⃣ Monthly Trend: last twelve months from the daily rollup
+    trend = await monthly_trend(db, user_id, today)
+
+    total_amount = stats.pending_amount + stats.paid_amount
+    recovery_rate = int((stats.paid_amount / total_amount) * 100) if total_amount else 0
 
     return {
         "user": {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email
+            "id": stats.id,
+            "name": stats.name,
+            "email": stats.email
         },
         "summary": {
-            "totalInvoices": total_invoices,
-            "pendingAmount": pending_amount,
-            "totalPaid": total_paid,
-            "nextDueDate": next_due[0] if next_due else None
+            "totalInvoices": stats.invoice_count,
+            "pendingAmount": stats.pending_amount,
+            "totalPaid": stats.paid_amount,
+            "nextDueDate": stats.next_due
         },
         "paymentTrend": [
             {
-                "month": row.month.strip(),
-                "paid": row.paid,
-                "pending": row.pending
-            } for row in trend
+                "month": bucket["period"].strftime("%b"),
+                "paid": bucket["paid"],
+                "pending": bucket["pending"]
+            } for bucket in trend
         ],
         "paymentStatus": {
-            "paid": paid_count,
-            "pending": pending_count,
-            "overdue": overdue_count
+            "paid": stats.paid_count,
+            "pending": stats.pending_count,
+            "overdue": stats.overdue_count
         },
         "recoveryRate": recovery_rate
     }
 
 
 
+@router.get("/{user_id}/trend")
+async def user_trend(
+    user_id: int,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: str = Query("month", pattern=GRANULARITY_PATTERN),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    # 📈 Paid / pending by issue date; defaults to the last year, monthly
+    return await trend_series(db, user_id, start, end, granularity)
+
+
 # --- user update endpoint ---
 @router.put("/{user_id}")
-def update_user(
+async def update_user(
     user_id: int,
     data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -201,10 +202,10 @@ def update_user(
 
     # 🔄 Update email (check uniqueness)
     if data.email is not None:
-        existing = db.query(User).filter(
+        existing = await db.scalar(select(User.id).where(
             User.email == data.email,
             User.id != user_id
-        ).first()
+        ))
 
         if existing:
             raise HTTPException(
@@ -215,8 +216,9 @@ def update_user(
         user.email = data.email
 
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_dashboards(user_id)
+    await db.refresh(user)
 
     return {
         "message": "User updated successfully",
@@ -78,6 +78,11 @@ class InvoiceResponse(InvoiceCreate):
         from_attributes = True
 
 
+class InvoiceSearchResult(InvoiceResponse):
+    # 1.0 is a perfect match
+    score: float
+
+
 # ---------- REMINDER ----------
 class ReminderCreate(BaseModel):
     user_id: int
@@ -0,0 +1,32 @@
+"""
+Move Paid invoices of past years into their yearly archive partitions
+(utils/partitions.py). Meant for a nightly or monthly cron; a run with
+nothing to archive is a single index probe:
+
+    python -m scripts.archive_invoices
+    python -m scripts.archive_invoices --after-days 730
+
+Prints the rows moved per year. Invoices stay readable and writable through
+the API wherever they live; archiving only keeps the partitions that the
+dashboards read small.
+"""
+import argparse
+import json
+import time
+
+from database import engine
+from utils.partitions import INVOICE_ARCHIVE_AFTER_DAYS, archive_cutoff, archive_paid_invoices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--after-days", type=int, default=INVOICE_ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    archived = archive_paid_invoices(engine, after_days=args.after_days)
+    print(json.dumps({
+        "cutoff": archive_cutoff(after_days=args.after_days).isoformat(),
+        "archived": archived,
+        "seconds": round(time.perf_counter() - start, 1),
+    }))
@@ -0,0 +1,153 @@
+"""
+End-to-end check of the email outbox against a local aiosmtpd stand-in.
+
+Migrates the database at DATABASE_URL (a scratch database -- the outbox is
+emptied), drives the real forgot-password, reminder and scheduler paths, then
+drains the outbox through the pooled sender and checks what the SMTP server
+received. Exits non-zero on any mismatch.
+
+    pip install -r benchmarks/requirements.txt
+    python -m scripts.check_outbox_delivery
+"""
+import os
+import socket
+import sys
+import uuid
+from datetime import date, timedelta
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+SMTP_PORT = _free_port()
+# utils.mailer / utils.outbox read their settings at import
+os.environ.update(
+    SMTP_HOST="127.0.0.1",
+    SMTP_PORT=str(SMTP_PORT),
+    SMTP_SECURITY="none",
+    SMTP_POOL_SIZE="2",
+    OUTBOX_SENDER="0",
+    OUTBOX_RETRY_BASE_SECONDS="0",
+)
+
+BOUNCE = "bounce@example.com"  # always refused with 550
+FLAKY = "flaky@example.com"    # refused once with 451, then accepted
+
+
+class Handler:
+    def __init__(self):
+        self.received = []
+        self.sessions = 0
+        self._flaked = False
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == BOUNCE:
+            return "550 No such mailbox"
+        if address == FLAKY and not self._flaked:
+            self._flaked = True
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def main() -> list:
+    from aiosmtpd.controller import Controller
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete, select
+
+    from database import SessionLocal
+    from models import EmailOutbox
+    from utils.outbox import OutboxSender, enqueue_email
+
+    command.upgrade(Config("alembic.ini"), "head")
+    from main import app  # TestClient runs the lifespan (create_all) after the migration
+    with SessionLocal() as db:
+        db.execute(delete(EmailOutbox))
+        enqueue_email(db, "test", BOUNCE, "bounce", "should fail permanently")
+        enqueue_email(db, "test", FLAKY, "flaky", "should succeed on retry")
+        db.commit()
+
+    email = f"outbox-{uuid.uuid4().hex[:8]}@example.com"
+    today = date.today()
+    with TestClient(app) as client:
+        client.post("/users/register", json={
+            "name": "Outbox", "email": email, "password": "password1", "role": "admin"
+        }).raise_for_status()
+        login = client.post("/users/login", json={"email": email, "password": "password1"})
+        login.raise_for_status()
+        user_id = login.json()["user"]["id"]
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        client.post("/auth/admin/forgot-password", json={"email": email}).raise_for_status()
+        invoice_ids = []
+        for number, due in (("OUTBOX-1", today), ("OUTBOX-2", today + timedelta(days=10))):
+            created = client.post(f"/users/{user_id}/invoices/create", headers=headers, json={
+                "invoice_number": number, "customer_name": "Outbox Ltd", "amount": 42.5,
+                "issue_date": today.isoformat(), "due_date": due.isoformat(),
+            })
+            created.raise_for_status()
+            invoice_ids.append(created.json()["id"])
+
+        # OUTBOX-1 is due today, so the scheduler reminds it; OUTBOX-2 by hand
+        client.post("/admin/reminders/run", headers=headers).raise_for_status()
+        client.post("/reminders/reminders/create", headers=headers, json={
+            "user_id": user_id, "invoice_id": invoice_ids[1]
+        }).raise_for_status()
+
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    sender = OutboxSender()
+    try:
+        while sender.send_batch():
+            pass
+    finally:
+        sender.stop()
+        controller.stop()
+
+    with SessionLocal() as db:
+        rows = {row.subject: row for row in db.scalars(select(EmailOutbox))}
+
+    failures = []
+
+    def expect(condition, message):
+        print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+        if not condition:
+            failures.append(message)
+
+    reset = rows.get("Password Reset Request")
+    expect(reset is not None and reset.status == "sent", "reset email delivered")
+    for number, path in (("OUTBOX-1", "scheduler"), ("OUTBOX-2", "reminder route")):
+        reminder = rows.get(f"Payment reminder: invoice {number}")
+        expect(reminder is not None and reminder.status == "sent"
+               and reminder.recipient == email and "42.50" in reminder.body,
+               f"{path} email rendered and delivered")
+    expect(rows["bounce"].status == "failed" and rows["bounce"].attempts == 1,
+           "5xx bounce failed without retry")
+    expect(rows["flaky"].status == "sent" and rows["flaky"].attempts == 2,
+           "4xx deferral retried and delivered")
+    expect(sorted(handler.received) == sorted([email, email, email, FLAKY]),
+           "server received exactly the deliverable messages")
+    expect(handler.sessions <= 2, f"SMTP sessions reused ({handler.sessions} opened)")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = main()
+    if failed:
+        print(f"\n{len(failed)} outbox checks failed")
+        sys.exit(1)
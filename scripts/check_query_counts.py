@@ -0,0 +1,206 @@
+"""
+N+1 guard: SQL statements per request must not grow with the data.
+
+Migrates and seeds the database at DATABASE_URL (a scratch database -- it is
+TRUNCATEd), calls every route twice -- once with a few invoices and
+reminders per user, once with many -- and counts the statements each call
+issues. Exits non-zero if a route's count changes between the two sizes or
+exceeds MAX_STATEMENTS.
+
+    python -m scripts.check_query_counts
+"""
+import json
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+
+# Caches would hide queries on the second pass; the sender and purger would
+# add statements of their own; every call comes from one client address
+os.environ.update(DASHBOARD_CACHE_SIZE="0", OUTBOX_SENDER="0", RESET_TOKEN_PURGE_INTERVAL="0",
+                  ADMISSION_CLIENT_RATE="0", ADMISSION_EMAIL_RATE="0")
+
+SMALL, LARGE = 3, 60
+# Statements any one request may issue
+MAX_STATEMENTS = 6
+
+
+def main() -> list:
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, insert, select, text
+
+    from database import SessionLocal, async_engine, engine
+    from models import Invoice, Reminder, User
+    from utils.reset_tokens import reset_tokens
+    from utils.security import create_access_token, hash_password
+
+    command.upgrade(Config("alembic.ini"), "head")
+    from main import app
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "TRUNCATE users, invoices, reminders, email_outbox, password_reset_tokens, "
+            "user_invoice_summary, invoice_trend_daily, invoice_ids RESTART IDENTITY CASCADE"
+        ))
+
+    password = "password1"
+    hashed = hash_password(password)
+
+    def add_user(db, role="user") -> User:
+        user = User(name="Count", email=f"count-{uuid.uuid4().hex[:10]}@example.com",
+                    password=hashed, role=role)
+        db.add(user)
+        db.flush()
+        return user
+
+    def add_invoices(db, user, count):
+        today = date.today()
+        rows = [{
+            "invoice_number": f"QC-{uuid.uuid4().hex[:8]}", "customer_name": "Count Ltd",
+            "amount": 10.0 + i, "issue_date": today - timedelta(days=i),
+            "due_date": today + timedelta(days=i % 7 - 3), "status": "Pending",
+            "user_id": user.id, "user_email": user.email,
+        } for i in range(count)]
+        invoice_ids = db.scalars(insert(Invoice).returning(Invoice.id), rows).all()
+        db.execute(insert(Reminder), [
+            {"user_id": user.id, "invoice_id": invoice_id} for invoice_id in invoice_ids
+        ])
+
+    with SessionLocal() as db:
+        admin = add_user(db, role="admin")
+        owner = add_user(db)
+        db.commit()
+        admin_id, admin_email, owner_id, owner_email = admin.id, admin.email, owner.id, owner.email
+    admin_headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": admin_email, "role": "admin", "id": admin_id})}
+
+    def victim(size) -> int:
+        """A throwaway user with `size` invoices, for the delete route."""
+        with SessionLocal() as db:
+            user = add_user(db)
+            add_invoices(db, user, size)
+            db.commit()
+            return user.id
+
+    def first_invoice_id() -> int:
+        with SessionLocal() as db:
+            return db.scalar(select(Invoice.id).where(Invoice.user_id == owner_id).limit(1))
+
+    def reset_token() -> str:
+        with SessionLocal() as db:
+            token = client.portal.call(reset_tokens.issue, db, db.get(User, owner_id))
+            db.commit()  # the table backend adds a row
+            return token
+
+    def import_body() -> str:
+        return "\n".join(json.dumps({
+            "invoice_number": f"IMP-{i}", "customer_name": "Import Ltd", "amount": 5,
+            "issue_date": date.today().isoformat(), "due_date": date.today().isoformat(),
+        }) for i in range(5))
+
+    # (method, path, kwargs factory taking the data size)
+    u = owner_id
+    cases = [
+        ("GET", "/", lambda n: {}),
+        ("GET", "/metrics", lambda n: {}),
+        ("POST", "/users/register", lambda n: {"json": {
+            "name": "New", "email": f"new-{uuid.uuid4().hex[:10]}@example.com",
+            "password": password}}),
+        ("POST", "/users/login", lambda n: {"json": {"email": owner_email, "password": password}}),
+        ("POST", f"/users/change-password/{u}", lambda n: {"json": {
+            "old_password": password, "new_password": password}}),
+        ("GET", "/users/", lambda n: {}),
+        ("GET", f"/users/{u}/dashboard", lambda n: {}),
+        ("GET", f"/users/{u}/trend", lambda n: {"params": {"granularity": "day"}}),
+        ("PUT", f"/users/{u}", lambda n: {"json": {"name": f"Count {n}"}}),
+        ("POST", f"/users/{u}/invoices/create", lambda n: {"json": {
+            "invoice_number": f"NEW-{n}", "customer_name": "New Ltd", "amount": 1,
+            "issue_date": date.today().isoformat(), "due_date": date.today().isoformat()}}),
+        ("POST", f"/users/{u}/invoices/import", lambda n: {
+            "params": {"format": "ndjson"}, "content": import_body()}),
+        ("GET", f"/users/{u}/invoices/", lambda n: {"params": {"limit": 500}}),
+        ("GET", f"/users/{u}/invoices/", lambda n: {"params": {"stream": True}}),
+        ("GET", f"/users/{u}/invoices/", lambda n: {"params": {
+            "status": "Pending", "amount_min": 5, "sort": "-amount", "limit": 500}}),
+        ("GET", f"/users/{u}/invoices/all", lambda n: {"params": {"limit": 500}}),
+        ("GET", f"/users/{u}/invoices/search", lambda n: {"params": {"q": "count"}}),
+        ("POST", "/reminders/reminders/create", lambda n: {"json": {
+            "user_id": u, "invoice_id": first_invoice_id()}}),
+        ("GET", f"/reminders/user/{u}/reminders", lambda n: {}),
+        ("GET", "/reminders/admin/reminders", lambda n: {"params": {"limit": 500}}),
+        ("POST", "/auth/user/forgot-password", lambda n: {"json": {"email": owner_email}}),
+        ("POST", "/auth/admin/forgot-password", lambda n: {"json": {"email": admin_email}}),
+        ("POST", "/auth/validate-reset-token", lambda n: {"json": {"token": reset_token()}}),
+        ("POST", "/auth/reset-password", lambda n: {"json": {
+            "token": reset_token(), "new_password": password}}),
+        ("GET", "/admin/users", lambda n: {}),
+        ("GET", "/admin/invoices", lambda n: {"params": {"limit": 500}}),
+        ("GET", "/admin/invoices", lambda n: {"params": {"stream": True}}),
+        ("GET", "/admin/invoices", lambda n: {"params": {
+            "customer_name": "Count Ltd", "sort": "customer_name", "limit": 500}}),
+        ("GET", "/admin/invoices/search", lambda n: {"params": {"q": "qc-", "limit": 50}}),
+        ("GET", "/admin/exports/invoices", lambda n: {}),
+        ("GET", "/admin/exports/reminders", lambda n: {}),
+        ("GET", "/admin/dashboard", lambda n: {}),
+        ("GET", "/admin/trend", lambda n: {"params": {"granularity": "week"}}),
+        ("GET", "/admin/cache/stats", lambda n: {}),
+        ("GET", "/admin/metrics/db-pool", lambda n: {}),
+        ("POST", "/admin/reminders/run", lambda n: {}),
+        ("PUT", f"/admin/users/{u}", lambda n: {"json": {"name": f"Admin {n}"}}),
+        ("DELETE", "/admin/users/{victim}", lambda n: {"victim": victim(n)}),
+    ]
+
+    statements = []
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    for sync_engine in engines:
+        event.listen(sync_engine, "after_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+
+    def run(client, size) -> dict:
+        counts = {}
+        for method, path, make in cases:
+            kwargs = make(size)
+            url = path.format(victim=kwargs.pop("victim", None))
+            statements.clear()
+            response = client.request(method, url, headers=admin_headers, **kwargs)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text}")
+            counts[(method, path, json.dumps(kwargs.get("params")))] = list(statements)
+        return counts
+
+    with TestClient(app) as client:
+        with SessionLocal() as db:
+            add_invoices(db, db.get(User, owner_id), SMALL)
+            db.commit()
+        # The first search in a process checks for pg_trgm once
+        client.get("/admin/invoices/search", params={"q": "count"}, headers=admin_headers)
+        small = run(client, SMALL)
+        with SessionLocal() as db:
+            add_invoices(db, db.get(User, owner_id), LARGE - SMALL)
+            for _ in range(LARGE - SMALL):
+                add_user(db)
+            db.commit()
+        large = run(client, LARGE)
+
+    failures = []
+    for key, small_statements in small.items():
+        method, path, params = key
+        name = f"{method} {path}" + (f" {params}" if params != "null" else "")
+        grows = len(large[key]) != len(small_statements)
+        over = len(large[key]) > MAX_STATEMENTS
+        print(f"{'FAIL' if grows or over else 'ok  '}  {name}: "
+              f"{len(small_statements)} -> {len(large[key])} statements")
+        if grows or over:
+            failures.append(name)
+            for statement in large[key]:
+                print(f"        {' '.join(statement.split())[:160]}")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = main()
+    if failed:
+        print(f"\n{len(failed)} routes issue too many statements")
+        sys.exit(1)
@@ -0,0 +1,198 @@
+"""
+EXPLAIN regression check for hot-path queries.
+
+Migrates and seeds the database at DATABASE_URL (a scratch database -- it is
+TRUNCATEd), then EXPLAINs each query the dashboards and listings issue and
+exits non-zero if any of them falls back to a sequential scan on a large table,
+or if a dashboard query on Pending invoices reads any partition but
+invoices_pending.
+
+    python -m scripts.check_query_plans --invoices 200000
+"""
+import argparse
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, select
+
+from database import engine
+from models import Invoice, Reminder, User
+from benchmarks.seed import customer_name
+from utils.invoice_query import INVOICE_SORTS, InvoiceQuery
+from utils.pagination import encode_cursor, keyset
+from utils.partitions import is_partition
+
+INVOICE_KEY = (Invoice.due_date, Invoice.id)
+REMINDER_KEY = (Reminder.sent_at, Reminder.id)
+
+# Dashboard queries that partition pruning must confine to invoices_pending
+PENDING_ONLY = {
+    "admin dashboard: top overdue",
+    "admin dashboard: overdue count",
+    "admin dashboard: expected collection",
+    "user dashboard: status totals",
+    "user dashboard: next due date",
+    "user dashboard: overdue count",
+}
+
+
+def hot_path_queries():
+    """(name, statement, tables that must not be seq-scanned)"""
+    today = date.today()
+    user_id = 1
+    pending = Invoice.status == "Pending"
+    invoice_cursor = encode_cursor(today - timedelta(days=365), 1)
+    reminder_cursor = encode_cursor(
+        datetime.combine(today, time.min, tzinfo=timezone.utc), 1
+    )
+    parse_invoice = (date.fromisoformat, int)
+    parse_reminder = (datetime.fromisoformat, int)
+
+    return [
+        ("login: user by email",
+         select(User).where(User.email == "bench1@example.com"),
+         {"users"}),
+        ("invoices: user listing, first page",
+         keyset(select(Invoice).where(Invoice.user_id == user_id),
+                INVOICE_KEY, parse_invoice).limit(101),
+         {"invoices"}),
+        ("invoices: user listing, after cursor",
+         keyset(select(Invoice).where(Invoice.user_id == user_id),
+                INVOICE_KEY, parse_invoice, invoice_cursor).limit(101),
+         {"invoices"}),
+        ("invoices: admin listing, first page",
+         keyset(select(Invoice), INVOICE_KEY, parse_invoice).limit(101),
+         {"invoices"}),
+        ("invoices: admin listing, after cursor",
+         keyset(select(Invoice), INVOICE_KEY, parse_invoice, invoice_cursor).limit(101),
+         {"invoices"}),
+        ("admin dashboard: top overdue",
+         select(Invoice.customer_name, Invoice.due_date, Invoice.amount)
+         .where(Invoice.due_date < today, pending)
+         .order_by(Invoice.due_date.asc()).limit(3),
+         {"invoices"}),
+        ("admin dashboard: overdue count",
+         select(func.count()).where(pending, Invoice.due_date < today),
+         {"invoices"}),
+        ("admin dashboard: expected collection",
+         select(func.sum(Invoice.amount))
+         .where(pending, Invoice.due_date.between(today, today + timedelta(days=7))),
+         {"invoices"}),
+        ("user dashboard: status totals",
+         select(func.count(), func.sum(Invoice.amount))
+         .where(Invoice.user_id == user_id, pending),
+         {"invoices"}),
+        ("user dashboard: next due date",
+         select(Invoice.due_date)
+         .where(Invoice.user_id == user_id, pending, Invoice.due_date >= today)
+         .order_by(Invoice.due_date.asc()).limit(1),
+         {"invoices"}),
+        ("user dashboard: overdue count",
+         select(func.count())
+         .where(Invoice.user_id == user_id, pending, Invoice.due_date < today),
+         {"invoices"}),
+        ("reminders: admin listing, first page",
+         keyset(select(Reminder), REMINDER_KEY, parse_reminder,
+                descending=True).limit(101),
+         {"reminders"}),
+        ("reminders: admin listing, after cursor",
+         keyset(select(Reminder), REMINDER_KEY, parse_reminder,
+                reminder_cursor, descending=True).limit(101),
+         {"reminders"}),
+        ("reminders: user listing",
+         select(Reminder).where(Reminder.user_id == user_id)
+         .order_by(Reminder.sent_at.desc()),
+         {"reminders"}),
+    ] + invoice_query_shapes(user_id)
+
+
+def invoice_query_shapes(user_id):
+    """Every sort order of the filtered listings, per user and admin-wide."""
+    today = date.today()
+    cursors = {
+        "due_date": encode_cursor(today - timedelta(days=365), 1),
+        "amount": encode_cursor(400.0, 1),
+        "customer_name": encode_cursor(customer_name(user_id, 1), today, 1),
+    }
+    shapes = []
+    for sort in INVOICE_SORTS:
+        for order in (sort, "-" + sort):
+            for scope, base in (("user", select(Invoice).where(Invoice.user_id == user_id)),
+                                ("admin", select(Invoice))):
+                query = InvoiceQuery(sort=order)
+                shapes.append((f"invoice query: {scope} sort={order}",
+                               query.apply(base).limit(101), {"invoices"}))
+                shapes.append((f"invoice query: {scope} sort={order}, after cursor",
+                               query.apply(base, cursors[sort]).limit(101), {"invoices"}))
+    filtered = [
+        ("status + amount_min, sort=-amount",
+         InvoiceQuery(status="Pending", amount_min=1000, sort="-amount")),
+        ("customer_name", InvoiceQuery(customer_name=customer_name(user_id, 1))),
+        ("due range, sort=amount",
+         InvoiceQuery(due_from=today - timedelta(days=30), due_to=today, sort="amount")),
+    ]
+    for label, query in filtered:
+        shapes.append((f"invoice query: user {label}",
+                       query.apply(select(Invoice).where(Invoice.user_id == user_id)).limit(101),
+                       {"invoices"}))
+    return shapes
+
+
+def relations(plan):
+    """Yield every relation the plan reads; partitions by their own name."""
+    if "Relation Name" in plan:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from relations(child)
+
+
+def seq_scans(plan, tables):
+    """Yield every relation in `tables` (or a partition of one) that the plan reads with a Seq Scan."""
+    relation = plan.get("Relation Name", "")
+    # invoices_other holds statuses the API never writes; scanning it is free
+    in_tables = relation in tables or (
+        "invoices" in tables and is_partition(relation) and relation != "invoices_other"
+    )
+    if plan.get("Node Type") == "Seq Scan" and in_tables:
+        yield relation
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child, tables)
+
+
+def check() -> list:
+    failures = []
+    with engine.connect() as conn:
+        for name, stmt, tables in hot_path_queries():
+            compiled = stmt.compile(dialect=conn.dialect)
+            plan = conn.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+            ).scalar()[0]["Plan"]
+            scanned = sorted(set(seq_scans(plan, tables)))
+            unpruned = sorted(set(relations(plan)) - {"invoices_pending"}) if name in PENDING_ONLY else []
+            print(f"{'FAIL' if scanned or unpruned else 'ok  '}  {name}"
+                  + (f"  (seq scan on {', '.join(scanned)})" if scanned else "")
+                  + (f"  (reads {', '.join(unpruned)})" if unpruned else ""))
+            if scanned or unpruned:
+                failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--invoices", type=int, default=200_000)
+    parser.add_argument("--no-seed", action="store_true",
+                        help="check plans against the data already present")
+    args = parser.parse_args()
+
+    command.upgrade(Config("alembic.ini"), "head")
+    if not args.no_seed:
+        from benchmarks.seed import seed
+        seed(args.users, args.invoices)
+
+    failed = check()
+    if failed:
+        print(f"\n{len(failed)} hot-path queries fell back to a sequential scan or were not pruned")
+        sys.exit(1)
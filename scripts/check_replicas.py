@@ -0,0 +1,130 @@
+"""
+Check read-replica routing against a primary and at least one streaming
+replica of it.
+
+    DATABASE_URL=postgresql://...primary DATABASE_REPLICA_URLS=postgresql://...replica \
+        python -m scripts.check_replicas
+
+Migrates the primary, then checks that a read-only route is served by a
+replica, writes by the primary, and that reads made with the same token
+right after a write stay on the primary, streams and exports included. It also checks that a replica
+that cannot be reached is skipped and marked down, and that reads fall
+back to the primary when no replica is healthy. Exits non-zero on any
+mismatch.
+"""
+import os
+import sys
+import uuid
+from datetime import date
+
+os.environ.update(OUTBOX_SENDER="0", DASHBOARD_CACHE_SIZE="0", REPLICA_CHECK_INTERVAL="0",
+                  ADMISSION_CLIENT_RATE="0", ADMISSION_EMAIL_RATE="0")
+
+
+def main() -> list:
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import database
+    from database import Replica, replicas
+
+    if not replicas:
+        print("DATABASE_REPLICA_URLS is not set")
+        sys.exit(2)
+    command.upgrade(Config("alembic.ini"), "head")
+    from main import app
+    from utils.security import create_access_token
+
+    # Which server ran each statement of the current request
+    servers = []
+    primary = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine else [])
+    for sync_engine in database.sync_engines():
+        label = "primary" if sync_engine in primary else "replica"
+        event.listen(sync_engine, "after_cursor_execute",
+                     lambda *args, label=label: servers.append(label))
+
+    failures = []
+
+    def expect(condition, message):
+        print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+        if not condition:
+            failures.append(message)
+
+    def served_by(client, method, path, **kwargs) -> set:
+        servers.clear()
+        response = client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text}")
+        return set(servers)
+
+    for replica in replicas:
+        replica.check()
+        expect(replica.healthy, f"{replica.name} is healthy, {replica.lag}s behind")
+
+    with TestClient(app) as client:
+        email = f"replica-{uuid.uuid4().hex[:8]}@example.com"
+        client.post("/users/register", json={
+            "name": "Replica", "email": email, "password": "password1"}).raise_for_status()
+        login = client.post("/users/login", json={"email": email, "password": "password1"}).json()
+        user_id = login["user"]["id"]
+        headers = {"Authorization": f"Bearer {login['access_token']}"}
+        listing = f"/users/{user_id}/invoices/"
+
+        expect(served_by(client, "GET", listing, headers=headers) == {"replica"},
+               "a read-only route reads from a replica")
+        expect(served_by(client, "GET", listing, headers=headers, params={"stream": True}) == {"replica"},
+               "a streamed listing reads from a replica")
+        created = served_by(client, "POST", f"/users/{user_id}/invoices/create", headers=headers, json={
+            "invoice_number": f"R-{uuid.uuid4().hex[:8]}", "customer_name": "Replica Ltd",
+            "amount": 10, "issue_date": date.today().isoformat(), "due_date": date.today().isoformat()})
+        expect(created == {"primary"}, "a write goes to the primary")
+        expect(served_by(client, "GET", listing, headers=headers) == {"primary"},
+               "the writer's next read stays on the primary")
+        expect(served_by(client, "GET", listing, headers=headers, params={"stream": True}) == {"primary"},
+               "so does the writer's next streamed read")
+        database._recent_writes.clear()
+        expect(served_by(client, "GET", listing, headers=headers) == {"replica"},
+               "reads return to the replica once the sticky window is over")
+
+        # Exports open their session once the download starts
+        admin = {"Authorization": "Bearer " + create_access_token(
+            {"sub": email, "role": "admin", "id": user_id})}
+        export = "/admin/exports/invoices"
+        expect(served_by(client, "GET", export, headers=admin, params={"user_id": user_id}) == {"replica"},
+               "an export reads from a replica")
+        served_by(client, "PUT", f"/admin/users/{user_id}", headers=admin, json={"name": "Replica 2"})
+        expect(served_by(client, "GET", export, headers=admin, params={"user_id": user_id}) == {"primary"},
+               "the writer's next export stays on the primary")
+        database._recent_writes.clear()
+
+        # A replica nobody listens on, first in the rotation
+        dead = Replica("postgresql://postgres@127.0.0.1:1/none")
+        replicas.insert(0, dead)
+        try:
+            for _ in range(len(replicas)):
+                expect(served_by(client, "GET", listing, headers=headers) == {"replica"},
+                       "a read skips the unreachable replica")
+            expect(not dead.healthy, "the unreachable replica is marked down")
+            dead.check()
+            expect(not dead.healthy and dead.error, "its health check keeps it down")
+        finally:
+            replicas.remove(dead)
+
+        for replica in replicas:
+            replica.healthy = False
+        expect(served_by(client, "GET", listing, headers=headers) == {"primary"},
+               "reads fall back to the primary with no healthy replica")
+        for replica in replicas:
+            replica.check()
+        expect(served_by(client, "GET", listing, headers=headers) == {"replica"},
+               "a replica that passes its check takes reads again")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = main()
+    if failed:
+        print(f"\n{len(failed)} replica checks failed")
+        sys.exit(1)
@@ -0,0 +1,116 @@
+"""
+Check the password reset flow against both token stores.
+
+Migrates the database at DATABASE_URL, then for each backend issues a token
+through /auth/user/forgot-password (read back from the email outbox),
+validates and redeems it, and checks that reuse, tampering and expiry are
+refused, that a signed token whose role contains "." still parses, and that
+the table backend purges expired rows. Exits non-zero on any mismatch.
+
+    python -m scripts.check_reset_tokens
+"""
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+
+os.environ.setdefault("OUTBOX_SENDER", "0")
+
+
+def main() -> list:
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    from database import SessionLocal
+    from models import EmailOutbox, PasswordResetToken
+
+    command.upgrade(Config("alembic.ini"), "head")
+    import routes.auth
+    from main import app  # TestClient runs the lifespan (create_all) after the migration
+    from utils.reset_tokens import INVALID, SignedTokenStore, TableTokenStore, _sign
+
+    failures = []
+
+    def expect(condition, message):
+        print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+        if not condition:
+            failures.append(message)
+
+    def issue(client, email) -> str:
+        client.post("/auth/user/forgot-password", json={"email": email}).raise_for_status()
+        with SessionLocal() as db:
+            body = db.scalar(
+                select(EmailOutbox.body)
+                .where(EmailOutbox.recipient == email)
+                .order_by(EmailOutbox.id.desc())
+                .limit(1)
+            )
+        return body.rsplit("token=", 1)[1]
+
+    def validate(client, token) -> dict:
+        return client.post("/auth/validate-reset-token", json={"token": token}).json()
+
+    def reset(client, token, password):
+        return client.post("/auth/reset-password", json={"token": token, "new_password": password})
+
+    with TestClient(app) as client:
+        for store in (SignedTokenStore(), TableTokenStore()):
+            name = type(store).__name__
+            routes.auth.reset_tokens = store
+            email = f"reset-{uuid.uuid4().hex[:8]}@example.com"
+            client.post("/users/register", json={
+                "name": "Reset", "email": email, "password": "password1", "role": "user"
+            }).raise_for_status()
+
+            token = issue(client, email)
+            expect(validate(client, token)["valid"], f"{name}: fresh token validates")
+            tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+            expect(not validate(client, tampered)["valid"], f"{name}: tampered token refused")
+            expect(not validate(client, "not a tøken")["valid"], f"{name}: garbage refused")
+
+            stale = issue(client, email)
+            expect(reset(client, token, "password2").status_code == 200, f"{name}: reset succeeds")
+            login = client.post("/users/login", json={"email": email, "password": "password2"})
+            expect(login.status_code == 200, f"{name}: new password logs in")
+            expect(reset(client, token, "password3").status_code == 400, f"{name}: reuse refused")
+            expect(not validate(client, token)["valid"], f"{name}: used token no longer validates")
+            if isinstance(store, SignedTokenStore):
+                # A second outstanding token dies with the password it was issued against
+                expect(reset(client, stale, "password3").status_code == 400,
+                       f"{name}: token issued before the reset refused")
+                # Roles are free strings; a "." in one must not break parsing
+                dotted = client.portal.call(
+                    store.issue, None, SimpleNamespace(id=1, role="team.lead", password="x")
+                )
+                claims, _ = store._claims(dotted)
+                expect(claims and claims[1] == "team.lead", f"{name}: dotted role parses")
+                short = "1.user.2"
+                response = client.post("/auth/validate-reset-token", json={"token": f"{short}.{_sign(short)}"})
+                expect(response.status_code == 200 and response.json()["message"] == INVALID,
+                       f"{name}: validly signed malformed token refused")
+
+            routes.auth.reset_tokens = type(store)(ttl_minutes=-1)
+            expired = issue(client, email)
+            expect(validate(client, expired)["message"] == "Token has expired",
+                   f"{name}: expired token reported as expired")
+            expect(reset(client, expired, "password3").status_code == 400,
+                   f"{name}: expired token refused")
+
+            if isinstance(store, TableTokenStore):
+                purged = client.portal.call(store.purge_expired)
+                with SessionLocal() as db:
+                    left = db.scalar(
+                        select(func.count()).select_from(PasswordResetToken)
+                        .where(PasswordResetToken.expires_at < func.now())
+                    )
+                expect(purged >= 1 and left == 0, f"{name}: purge removed {purged} expired rows")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = main()
+    if failed:
+        print(f"\n{len(failed)} reset token checks failed")
+        sys.exit(1)
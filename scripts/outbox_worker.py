@@ -0,0 +1,26 @@
+"""
+Drain the email outbox outside the API processes. Run one or more of these
+with OUTBOX_SENDER=0 on the app servers:
+
+    python -m scripts.outbox_worker
+"""
+import signal
+import threading
+
+from utils.outbox import OutboxSender
+
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    sender = OutboxSender()
+    sender.start()
+    stop.wait()
+    sender.stop()
+    print(sender.stats())
+
+
+if __name__ == "__main__":
+    main()
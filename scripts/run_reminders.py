@@ -0,0 +1,20 @@
+"""
+Create today's payment reminders for every Pending invoice that matches a
+configured cadence (REMINDER_CADENCES). Meant for a nightly cron:
+
+    python -m scripts.run_reminders
+"""
+import asyncio
+import json
+
+from database import session_scope
+from utils.reminder_scheduler import run_reminder_schedule
+
+
+async def main():
+    async with session_scope() as db:
+        return await run_reminder_schedule(db)
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), default=str))
@@ -0,0 +1,323 @@
+"""
+Admission control for the bcrypt-bound auth endpoints.
+
+Two checks run before such a request does any work:
+
+- Token buckets (GCRA) per client address and, on login, per email. Over
+  the limit is 429 with Retry-After. A credential-stuffing run from one
+  address, or against one account, stops here. Behind a proxy the address
+  comes from X-Forwarded-For, read only when the peer is one of
+  FORWARDED_ALLOW_IPS (see client_address).
+- A priority class. At most `concurrency` requests of a class run at once
+  in this process, up to `queue` more wait their turn for at most
+  ADMISSION_QUEUE_TIMEOUT seconds, and the rest get 503 with Retry-After.
+  Dashboards, listings and everything else are not in a class and never
+  wait, so a 9am login rush queues behind itself instead of behind reads.
+
+Concurrency is per process: it guards this worker's cores. The buckets are
+per process too unless ADMISSION_BACKEND=table keeps them in the unlogged
+rate_limit_buckets table, shared by every worker and host.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import text
+
+from database import session_scope
+from utils.metrics import Histogram
+
+# 'memory' (default) keeps buckets per process; 'table' shares them in Postgres
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "memory").lower()
+# Token buckets as "requests/seconds": bursts of `requests`, refilled at that
+# many per `seconds`; "0" turns a limit off
+ADMISSION_CLIENT_RATE = os.getenv("ADMISSION_CLIENT_RATE", "30/60")
+ADMISSION_EMAIL_RATE = os.getenv("ADMISSION_EMAIL_RATE", "10/300")
+# Auth requests running at once per process (0 = unlimited), and how many
+# more may wait for a slot
+ADMISSION_AUTH_CONCURRENCY = int(os.getenv(
+    "ADMISSION_AUTH_CONCURRENCY", str(max((os.cpu_count() or 1) // 2, 1))
+))
+ADMISSION_AUTH_QUEUE = int(os.getenv(
+    "ADMISSION_AUTH_QUEUE", str(ADMISSION_AUTH_CONCURRENCY * 4)
+))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+# Memory backend: keys tracked per process; table backend: takes between
+# deletes of buckets that have fully refilled
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "100000"))
+ADMISSION_PURGE_EVERY = int(os.getenv("ADMISSION_PURGE_EVERY", "1000"))
+# Proxies trusted to set X-Forwarded-For: comma-separated addresses or
+# networks, or "*". The variable uvicorn and gunicorn.conf.py read for
+# forwarded_allow_ips, so the server and the rate limits trust the same hops.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def parse_rate(spec: str):
+    """'20/60' -> (20, 60.0); '0' -> None."""
+    if spec.strip() == "0":
+        return None
+    count, _, seconds = spec.partition("/")
+    count, seconds = int(count), float(seconds or 1)
+    if count <= 0 or seconds <= 0:
+        raise RuntimeError(f"Bad rate {spec!r}; expected requests/seconds, e.g. 20/60")
+    return count, seconds
+
+
+RATES = {
+    "client": parse_rate(ADMISSION_CLIENT_RATE),
+    "email": parse_rate(ADMISSION_EMAIL_RATE),
+}
+
+
+def parse_trusted(spec: str):
+    """'10.0.0.0/8, 127.0.0.1' -> networks; '*' -> None (trust every peer)."""
+    hosts = [host.strip() for host in spec.split(",") if host.strip()]
+    if "*" in hosts:
+        return None
+    try:
+        return [ipaddress.ip_network(host, strict=False) for host in hosts]
+    except ValueError:
+        raise RuntimeError(f"Bad FORWARDED_ALLOW_IPS {spec!r}; expected addresses, networks or *")
+
+
+TRUSTED_PROXIES = parse_trusted(FORWARDED_ALLOW_IPS)
+
+
+def _trusted(host) -> bool:
+    if TRUSTED_PROXIES is None:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_address(request: Request) -> str:
+    """
+    The address the per-client bucket is keyed on. A request from a trusted
+    proxy is keyed on the right-most X-Forwarded-For entry that no trusted
+    proxy added, so clients cannot pick their key by sending the header
+    themselves; any other request on its peer address.
+    """
+    peer = request.client.host if request.client else None
+    if not _trusted(peer):
+        return peer or "unknown"
+    hops = [
+        host.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for host in header.split(",") if host.strip()
+    ]
+    for host in reversed(hops):
+        if not _trusted(host):
+            return host
+    # Every hop trusted: the left-most one is as far back as the header goes
+    return hops[0] if hops else peer or "unknown"
+
+
+class MemoryBuckets:
+    """
+    GCRA buckets in a dict: each key stores only the time at which its
+    bucket will be full again. A key whose time has passed is the same as
+    an absent one, so the least recently used keys can be dropped freely.
+    """
+
+    def __init__(self, maxsize: int = ADMISSION_MAX_KEYS):
+        self.maxsize = maxsize
+        self._full_at = OrderedDict()
+
+    async def take(self, key: str, count: int, seconds: float) -> float:
+        """0 if a request is allowed now, else seconds until one would be."""
+        now = time.monotonic()
+        interval = seconds / count
+        full_at = max(self._full_at.get(key, now), now)
+        if full_at + interval - now > seconds:
+            return full_at + interval - now - seconds
+        self._full_at[key] = full_at + interval
+        self._full_at.move_to_end(key)
+        while len(self._full_at) > self.maxsize:
+            self._full_at.popitem(last=False)
+        return 0.0
+
+
+class TableBuckets:
+    """
+    The same buckets in rate_limit_buckets, one row per key, updated with a
+    single conditional upsert on a session of its own. The bucket is
+    charged even when the route then fails (a wrong password, say), which
+    is the point. Keys are hashed so no email or address is stored.
+    """
+
+    _TAKE = text("""
+        WITH taken AS (
+            INSERT INTO rate_limit_buckets AS b (key, full_at)
+            VALUES (:key, clock_timestamp() + make_interval(secs => :interval))
+            ON CONFLICT (key) DO UPDATE
+            SET full_at = greatest(b.full_at, clock_timestamp()) + make_interval(secs => :interval)
+            WHERE greatest(b.full_at, clock_timestamp()) + make_interval(secs => :interval)
+                  <= clock_timestamp() + make_interval(secs => :seconds)
+            RETURNING 1
+        )
+        SELECT CASE WHEN EXISTS (SELECT 1 FROM taken) THEN 0.0 ELSE (
+            SELECT extract(epoch FROM full_at - clock_timestamp()) + :interval - :seconds
+            FROM rate_limit_buckets WHERE key = :key
+        ) END
+    """)
+
+    def __init__(self):
+        self._takes = 0
+
+    async def take(self, key: str, count: int, seconds: float) -> float:
+        key = hashlib.sha256(key.encode()).hexdigest()[:32]
+        self._takes += 1
+        async with session_scope() as db:
+            wait = await db.scalar(self._TAKE, {
+                "key": key, "interval": seconds / count, "seconds": seconds,
+            })
+            if ADMISSION_PURGE_EVERY and self._takes % ADMISSION_PURGE_EVERY == 0:
+                await db.execute(text("DELETE FROM rate_limit_buckets WHERE full_at < clock_timestamp()"))
+            await db.commit()
+        return max(float(wait or 0.0), 0.0)
+
+
+def get_buckets():
+    if ADMISSION_BACKEND == "memory":
+        return MemoryBuckets()
+    if ADMISSION_BACKEND == "table":
+        return TableBuckets()
+    raise RuntimeError(f"Unknown ADMISSION_BACKEND {ADMISSION_BACKEND!r}")
+
+
+buckets = get_buckets()
+rate_limited = {scope: 0 for scope in RATES}
+
+
+async def limit(scope: str, value: str):
+    """Charge one request to `value`'s bucket; 429 once it is empty."""
+    rate = RATES[scope]
+    if rate is None:
+        return
+    wait = await buckets.take(f"{scope}:{value.lower()}", *rate)
+    if wait > 0:
+        rate_limited[scope] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(max(math.ceil(wait), 1))},
+        )
+
+
+class PriorityClass:
+    """
+    Concurrency limit with a bounded FIFO queue. A finishing request hands
+    its slot straight to the oldest waiter, so a burst cannot overtake
+    requests that are already queued.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.running = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = Histogram()
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+
+    async def acquire(self):
+        if self.concurrency <= 0 or (self.running < self.concurrency and not self._waiters):
+            self.running += 1
+            self.admitted += 1
+            self.queue_wait.observe(0.0)
+            return
+        if len(self._waiters) >= self.queue:
+            self.rejected += 1
+            raise self._busy()
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        queued = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                self.release()  # handed a slot just as we gave up
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise self._busy()
+            raise
+        self.admitted += 1
+        self.queue_wait.observe(time.monotonic() - queued)
+
+    def release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "running": self.running,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": self.queue_wait.snapshot(),
+        }
+
+
+PRIORITY_CLASSES = {
+    "auth": PriorityClass(
+        "auth", ADMISSION_AUTH_CONCURRENCY, ADMISSION_AUTH_QUEUE, ADMISSION_QUEUE_TIMEOUT
+    ),
+}
+
+
+def admission(name: str):
+    """
+    Route dependency: the per-client rate limit, then a slot in priority
+    class `name`, held while the route function runs.
+    """
+    priority = PRIORITY_CLASSES[name]
+
+    async def admit(request: Request):
+        await limit("client", client_address(request))
+        await priority.acquire()
+        try:
+            yield
+        finally:
+            priority.release()
+
+    # "function": free the slot before the response is sent, not after
+    return Depends(admit, scope="function")
+
+
+def admission_stats() -> dict:
+    return {
+        "backend": ADMISSION_BACKEND,
+        "forwarded_allow_ips": FORWARDED_ALLOW_IPS,
+        "rates": {scope: rate and f"{rate[0]}/{rate[1]:g}" for scope, rate in RATES.items()},
+        "rate_limited": dict(rate_limited),
+        "classes": {name: priority.stats() for name, priority in PRIORITY_CLASSES.items()},
+    }
@@ -1,21 +1,49 @@
-from fastapi import Depends, HTTPException, status
+import hashlib
+import os
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from utils.security import decode_access_token
+from utils.cache import TTLCache
+from utils.security import ACCESS_TOKEN_EXPIRE_MINUTES, decode_access_token
 
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
+# Verified claims keyed by a digest of the token (raw tokens are never kept).
+# Entries expire at the token's own `exp`, so a cached token is never honoured
+# past the point where jwt.decode would have rejected it.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+token_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def verify_token(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is None:
+        claims = decode_access_token(token)
+        if claims and "exp" in claims:
+            token_cache.set(key, claims, expires_at=float(claims["exp"]))
+    return claims
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    # Memoized per request: router-level and route-level dependencies
+    # (e.g. get_admin_user on top of get_current_user) verify only once.
+    payload = getattr(request.state, "jwt_claims", None)
+    if payload is not None:
+        return payload
+
+    payload = verify_token(credentials.credentials)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    request.state.jwt_claims = payload = dict(payload)
     return payload
 
-def get_admin_user(current_user: dict = Depends(get_current_user)):
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
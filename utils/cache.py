@@ -0,0 +1,134 @@
+"""
+In-process caches. Each gunicorn worker holds its own: `invalidate_dashboards`
+drops the entries of the worker that handled the write, and the other
+workers keep serving theirs until DASHBOARD_CACHE_TTL (or midnight) expires
+them. A shared version row to check on every hit would put the admin
+dashboard's version on every write's path, the lock the read models avoid.
+Keep the TTL to the staleness the dashboards can show across workers.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and hit/miss counters.
+
+    Every key carries a version that `invalidate` bumps. A reader grabs the
+    version before computing a value and passes it back to `set`; if a write
+    invalidated the key in the meantime the stale value is dropped instead
+    of being cached.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def version(self, key) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def set(self, key, value, expires_at: float = None, version: int = None):
+        if self.maxsize <= 0:
+            return
+        now = time.time()
+        expires_at = min(expires_at or now + self.ttl, now + self.ttl)
+        with self._lock:
+            if version is not None and version != self._versions.get(key, 0):
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._entries.pop(key, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# ---------- DASHBOARD CACHE ----------
+
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "1024"))
+
+ADMIN_DASHBOARD_KEY = "admin"
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+
+def user_dashboard_key(user_id: int):
+    return ("user", user_id)
+
+
+def _next_midnight() -> float:
+    # Dashboards are computed against date.today(), so nothing survives a
+    # day rollover regardless of TTL.
+    tomorrow = date.today() + timedelta(days=1)
+    return datetime.combine(tomorrow, dt_time.min).timestamp()
+
+
+async def cached_dashboard(key, build):
+    value = dashboard_cache.get(key)
+    if value is not None:
+        return value
+    version = dashboard_cache.version(key)
+    value = await build()
+    dashboard_cache.set(key, value, expires_at=_next_midnight(), version=version)
+    return value
+
+
+def invalidate_dashboards(*user_ids):
+    """Drop the given users' dashboards and the global admin dashboard."""
+    dashboard_cache.invalidate(
+        ADMIN_DASHBOARD_KEY,
+        *(user_dashboard_key(user_id) for user_id in user_ids)
+    )
@@ -0,0 +1,150 @@
+import os
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from utils.metrics import Histogram
+
+# Per engine, per process: gunicorn multiplies these by WEB_CONCURRENCY
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a checkout waits for a free connection before raising
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this many seconds; -1 never does. Set it
+# below any server / load balancer idle timeout.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# "always": ping on every checkout (one extra round trip each time)
+# "idle":   ping only connections idle for DB_POOL_PING_IDLE_SECONDS or more
+# "never":  rely on DB_POOL_RECYCLE and let a dead connection fail the request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle").lower()
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+# PgBouncer in transaction mode: pooling happens in PgBouncer, so no pool
+# here, and no server-side prepared statements (the next transaction may
+# land on a different server connection).
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
+if DB_POOL_PRE_PING not in ("always", "idle", "never"):
+    raise RuntimeError(f"Unknown DB_POOL_PRE_PING {DB_POOL_PRE_PING!r}")
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.timeouts = 0
+        self.opened = 0
+        self.invalidated = 0
+        self.pings = 0
+
+
+class _InstrumentedPool:
+    """Times every checkout and counts the ones that hit DB_POOL_TIMEOUT."""
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.checkout_wait.observe(time.monotonic() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting across it
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPool, NullPool):
+    pass
+
+
+def pool_options(is_async: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments from the env."""
+    if DB_PGBOUNCER:
+        # Every checkout is a fresh connection to PgBouncer: nothing to ping
+        return {"poolclass": InstrumentedNullPool}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+    }
+
+
+def max_connections() -> int:
+    """Connections one engine may hold open at once."""
+    return DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+
+
+def instrument(sync_engine):
+    """Count connects / invalidations, and ping idle connections if configured."""
+    stats = lambda: sync_engine.pool.stats
+
+    @event.listens_for(sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        stats().opened += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        stats().invalidated += 1
+
+    if DB_PGBOUNCER or DB_POOL_PRE_PING != "idle":
+        return
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < DB_POOL_PING_IDLE_SECONDS:
+            return
+        stats().pings += 1
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # The pool discards the connection and retries with another
+            raise exc.DisconnectionError() from e
+
+
+def pool_stats(sync_engine) -> dict:
+    pool = sync_engine.pool
+    stats = pool.stats
+    snapshot = {
+        "pool": type(pool).__name__,
+        "connections_opened": stats.opened,
+        "invalidated": stats.invalidated,
+        "checkout_wait": stats.checkout_wait.snapshot(),
+    }
+    if isinstance(pool, NullPool):
+        return snapshot
+    snapshot.update({
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # Connections opened beyond pool_size right now
+        "overflow": max(pool.overflow(), 0),
+        "timeouts": stats.timeouts,
+        "pre_ping": DB_POOL_PRE_PING,
+        "idle_pings": stats.pings,
+    })
+    return snapshot
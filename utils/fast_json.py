@@ -0,0 +1,114 @@
+"""
+Opt-in fast path for large list responses (FAST_JSON=1).
+
+The default path loads ORM objects and lets FastAPI validate every row into
+the response model before dumping it. The fast path selects only the
+columns the response model declares and hands the row tuples to orjson, with
+no per-row model. Routes keep their `response_model`, so the OpenAPI schema
+and the JSON produced are unchanged (`python -m benchmarks.fast_json` checks
+both paths return identical bodies).
+"""
+import os
+
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from database import read_session_scope
+from utils.pagination import NEXT_CURSOR_HEADER, STREAM_BATCH_SIZE, encode_cursor
+
+try:
+    import orjson
+except ImportError:  # the fast path is optional: pip install orjson
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+if FAST_JSON and orjson is None:
+    raise RuntimeError("FAST_JSON=1 requires orjson (pip install orjson)")
+
+# Pydantic writes UTC datetimes with a "Z" suffix; match it byte for byte
+_DUMP_OPTIONS = orjson.OPT_UTC_Z if orjson is not None else 0
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, for content that is already plain data."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=_DUMP_OPTIONS)
+
+
+class RowShape:
+    """
+    The columns a response model reads from an ORM entity, and how to fold a
+    row of them back into the model's JSON shape. Fields typed as a nested
+    model are read through the relationship of the same name, joined in.
+    """
+
+    def __init__(self, schema: type[BaseModel], entity):
+        self.columns = []
+        self.relationships = []
+        self._fields = []  # (name, nested field names or None)
+        for name, field in schema.model_fields.items():
+            nested = field.annotation
+            if isinstance(nested, type) and issubclass(nested, BaseModel):
+                relationship = getattr(entity, name)
+                target = relationship.property.mapper.class_
+                self.relationships.append(relationship)
+                self.columns.extend(
+                    getattr(target, sub).label(f"{name}__{sub}") for sub in nested.model_fields
+                )
+                self._fields.append((name, tuple(nested.model_fields)))
+            else:
+                self.columns.append(getattr(entity, name).label(name))
+                self._fields.append((name, None))
+        self._flat = all(sub is None for _, sub in self._fields)
+        self._names = tuple(name for name, _ in self._fields)
+
+    def select(self, stmt):
+        """`stmt` (a keyset-ordered select of the entity) narrowed to the columns."""
+        stmt = stmt.with_only_columns(*self.columns)
+        for relationship in self.relationships:
+            stmt = stmt.join(relationship)
+        return stmt
+
+    def as_dict(self, row) -> dict:
+        if self._flat:
+            return dict(zip(self._names, row))
+        out, i = {}, 0
+        for name, sub in self._fields:
+            if sub is None:
+                out[name] = row[i]
+                i += 1
+            else:
+                out[name] = dict(zip(sub, row[i:i + len(sub)]))
+                i += len(sub)
+        return out
+
+
+async def fast_list(db, stmt, shape: RowShape) -> FastJSONResponse:
+    rows = (await db.execute(shape.select(stmt))).all()
+    return FastJSONResponse([shape.as_dict(row) for row in rows])
+
+
+async def fast_page(db, stmt, shape: RowShape, key_columns, limit: int) -> FastJSONResponse:
+    """`paginate` for the fast path: same page, same X-Next-Cursor."""
+    rows = (await db.execute(shape.select(stmt).limit(limit + 1))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*(getattr(last, col.key) for col in key_columns))
+    return FastJSONResponse([shape.as_dict(row) for row in rows], headers=headers)
+
+
+def fast_stream(stmt, shape: RowShape, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """`stream_ndjson` for the fast path: one chunk per server-side cursor batch."""
+    async def generate():
+        async with read_session_scope() as db:
+            result = await db.stream(shape.select(stmt).execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                yield b"".join(
+                    orjson.dumps(shape.as_dict(row), option=_DUMP_OPTIONS) + b"\n" for row in rows
+                )
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
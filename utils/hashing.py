@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from utils.metrics import Histogram
+from utils.security import hash_password, verify_password
+
+# Processes dedicated to bcrypt; 0 falls back to the default thread executor.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed in flight (running + queued) per app process before new
+# ones are refused with 503 instead of queueing behind a login burst.
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(max(HASH_WORKERS, 1) * 8)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+hash_latency = Histogram()
+queue_wait = Histogram()
+
+_pool = None
+_warmup = None
+_pending = 0
+_rejected = 0
+
+
+def _timed(fn, *args):
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+def _get_pool():
+    # Created on first use, never at import: a pool built before gunicorn
+    # forks its workers would be shared, broken, by every child.
+    global _pool
+    if _pool is None and HASH_WORKERS > 0:
+        _pool = ProcessPoolExecutor(
+            max_workers=HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def _run(fn, *args):
+    global _pending, _rejected
+    if _pending >= HASH_MAX_PENDING:
+        _rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+        )
+
+    _pending += 1
+    submitted = time.monotonic()
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, finished = await loop.run_in_executor(
+            _get_pool(), _timed, fn, *args
+        )
+    finally:
+        _pending -= 1
+
+    # time.monotonic is system-wide on Linux, so worker timestamps compare
+    queue_wait.observe(max(started - submitted, 0.0))
+    hash_latency.observe(finished - started)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def start_hash_pool():
+    """
+    Spawn the workers up front so the first logins don't pay for it. The
+    spawn runs in the background: the app serves other routes meanwhile,
+    and a login arriving early just queues behind the warm-up.
+    """
+    global _warmup
+    pool = _get_pool()
+    if pool is not None:
+        loop = asyncio.get_running_loop()
+        _warmup = asyncio.gather(*(
+            loop.run_in_executor(pool, time.monotonic)
+            for _ in range(HASH_WORKERS)
+        ))
+
+
+def shutdown_hash_pool():
+    global _pool, _warmup
+    if _warmup is not None:
+        _warmup.cancel()
+        _warmup = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def hashing_stats() -> dict:
+    return {
+        "workers": HASH_WORKERS,
+        "pending": _pending,
+        "max_pending": HASH_MAX_PENDING,
+        "rejected": _rejected,
+        "hash_latency": hash_latency.snapshot(),
+        "queue_wait": queue_wait.snapshot(),
+    }
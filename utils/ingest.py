@@ -0,0 +1,123 @@
+import codecs
+import csv
+import json
+
+from pydantic import ValidationError
+
+IMPORT_BATCH_SIZE = 1000
+# Bind parameters Postgres accepts in one statement
+MAX_BIND_PARAMS = 32767
+IMPORT_MAX_ERRORS = 1000
+# Longest line (or quoted multi-line CSV record) kept in memory, in characters
+IMPORT_MAX_LINE_LENGTH = 65536
+
+
+async def iter_lines(chunks, max_length: int = IMPORT_MAX_LINE_LENGTH):
+    """
+    Split an async stream of byte chunks into text lines, keeping the newline.
+    Only each new chunk is searched for newlines; the unfinished line is kept
+    as a list of parts. A line longer than `max_length` is discarded as it
+    arrives and a ValueError is yielded in its place.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    too_long = ValueError(f"Line longer than {max_length} characters")
+    parts, length = [], 0
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        end = text.rfind("\n")
+        if end < 0:
+            length += len(text)
+            if length <= max_length:
+                parts.append(text)
+            continue
+        # The first newline ends the line carried over from earlier chunks
+        start = text.find("\n")
+        length += start
+        yield too_long if length > max_length else "".join(parts) + text[:start + 1]
+        start += 1
+        while start <= end:
+            stop = text.index("\n", start)
+            yield too_long if stop - start > max_length else text[start:stop + 1]
+            start = stop + 1
+        tail = text[end + 1:]
+        parts, length = [tail], len(tail)
+
+    tail = decoder.decode(b"", final=True)
+    length += len(tail)
+    if length > max_length:
+        yield too_long
+    elif length:
+        yield "".join(parts) + tail
+
+
+async def iter_csv_rows(lines):
+    """
+    Yield (row_number, dict) per CSV record, keyed by the header row. A record
+    is only parsed once its double quotes balance, so quoted fields may span
+    lines (and chunk boundaries).
+    """
+    header = None
+    record, quotes = "", 0
+    row_number = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            record, quotes = "", 0
+            row_number += 1
+            yield row_number, line
+            continue
+        record += line
+        quotes += line.count('"')
+        if quotes % 2:
+            if len(record) > IMPORT_MAX_LINE_LENGTH:
+                record, quotes = "", 0
+                row_number += 1
+                yield row_number, ValueError(f"Record longer than {IMPORT_MAX_LINE_LENGTH} characters")
+            continue
+        values = next(csv.reader([record]), [])
+        record, quotes = "", 0
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values))
+    if record.strip():
+        row_number += 1
+        yield row_number, ValueError("Unterminated quoted field")
+
+
+async def iter_ndjson_rows(lines):
+    """Yield (row_number, dict) per non-blank line, or an error in its place."""
+    row_number = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            row_number += 1
+            yield row_number, line
+            continue
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(value, dict):
+            yield row_number, ValueError("Expected a JSON object")
+            continue
+        yield row_number, value
+
+
+def validate_row(schema, value):
+    """Return (model, None) or (None, [error, ...]) for one parsed row."""
+    if isinstance(value, Exception):
+        return None, [{"field": None, "message": str(value)}]
+    try:
+        return schema.model_validate(value), None
+    except ValidationError as e:
+        return None, [
+            {"field": ".".join(str(part) for part in err["loc"]), "message": err["msg"]}
+            for err in e.errors()
+        ]
@@ -0,0 +1,69 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from models import Invoice
+from utils.pagination import keyset
+
+# sort name -> (keyset columns, cursor parsers). The last column is always
+# the primary key so pages never overlap; each shape has a matching index
+# with and without a leading user_id (see migration 0008).
+INVOICE_SORTS = {
+    "due_date": ((Invoice.due_date, Invoice.id), (date.fromisoformat, int)),
+    "amount": ((Invoice.amount, Invoice.id), (float, int)),
+    # A customer's invoices stay in due order
+    "customer_name": (
+        (Invoice.customer_name, Invoice.due_date, Invoice.id), (str, date.fromisoformat, int)
+    ),
+}
+SORT_PATTERN = "^-?(" + "|".join(INVOICE_SORTS) + ")$"
+
+
+class InvoiceQuery:
+    """Filters and sort order for an invoice listing, pushed down into SQL."""
+
+    def __init__(self, status=None, due_from=None, due_to=None, amount_min=None,
+                 amount_max=None, customer_name=None, sort="due_date"):
+        self.status = status
+        self.due_from = due_from
+        self.due_to = due_to
+        self.amount_min = amount_min
+        self.amount_max = amount_max
+        self.customer_name = customer_name
+        self.descending = sort.startswith("-")
+        self.key, self.parsers = INVOICE_SORTS[sort.lstrip("-")]
+
+    def apply(self, stmt, after: Optional[str] = None):
+        """Filter `stmt` and order it on the sort key, seeking past `after`."""
+        if self.status:
+            stmt = stmt.where(Invoice.status == self.status)
+        if self.due_from:
+            stmt = stmt.where(Invoice.due_date >= self.due_from)
+        if self.due_to:
+            stmt = stmt.where(Invoice.due_date <= self.due_to)
+        if self.amount_min is not None:
+            stmt = stmt.where(Invoice.amount >= self.amount_min)
+        if self.amount_max is not None:
+            stmt = stmt.where(Invoice.amount <= self.amount_max)
+        if self.customer_name:
+            stmt = stmt.where(Invoice.customer_name == self.customer_name)
+        return keyset(stmt, self.key, self.parsers, after, descending=self.descending)
+
+
+def invoice_query(
+    status: Optional[str] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    customer_name: Optional[str] = Query(None, description="Exact match"),
+    sort: str = Query("due_date", pattern=SORT_PATTERN,
+                      description="due_date, amount or customer_name; prefix - for descending"),
+) -> InvoiceQuery:
+    """Query-parameter dependency shared by the invoice listings."""
+    if due_from and due_to and due_from > due_to:
+        raise HTTPException(status_code=400, detail="due_from is after due_to")
+    if amount_min is not None and amount_max is not None and amount_min > amount_max:
+        raise HTTPException(status_code=400, detail="amount_min is greater than amount_max")
+    return InvoiceQuery(status, due_from, due_to, amount_min, amount_max, customer_name, sort)
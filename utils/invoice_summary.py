@@ -0,0 +1,253 @@
+"""
+DDL for the invoice read models: `user_invoice_summary` (per-user totals)
+and `invoice_trend_daily` (paid/pending per user and issue day).
+
+Statement-level triggers on `invoices` fold each INSERT / UPDATE / DELETE
+into the read models through transition tables, so a bulk import of
+10k rows costs one upsert per affected user rather than one per row, and the
+summary commits (or rolls back) with the invoice change itself. Anything that
+bypasses triggers (TRUNCATE, `session_replication_role = replica`, manual
+fixes) is repaired with `python -m scripts.rebuild_invoice_summary`.
+"""
+
+
+def _apply(deltas: str) -> str:
+    # `deltas` yields (user_id, status, amount, n) with n = +1 / -1. Users are
+    # upserted in id order so concurrent statements lock rows consistently.
+    return f"""
+        INSERT INTO user_invoice_summary AS s (
+            user_id, invoice_count, pending_count, pending_amount,
+            paid_count, paid_amount, updated_at
+        )
+        SELECT
+            user_id,
+            sum(n),
+            coalesce(sum(n) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+            now()
+        FROM ({deltas}) AS delta
+        GROUP BY user_id
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            invoice_count = s.invoice_count + EXCLUDED.invoice_count,
+            pending_count = s.pending_count + EXCLUDED.pending_count,
+            pending_amount = s.pending_amount + EXCLUDED.pending_amount,
+            paid_count = s.paid_count + EXCLUDED.paid_count,
+            paid_amount = s.paid_amount + EXCLUDED.paid_amount,
+            updated_at = EXCLUDED.updated_at;"""
+
+
+# UPDATEs that leave user, status and amount alone (renames, due date moves)
+# produce no deltas and don't touch the summary row at all.
+_CHANGED = """
+    SELECT o.user_id, o.status, o.amount, -1 AS n
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE (o.user_id, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.status, n.amount)
+    UNION ALL
+    SELECT n.user_id, n.status, n.amount, 1
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE (o.user_id, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.status, n.amount)
+"""
+
+SUMMARY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION user_invoice_summary_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_apply("SELECT user_id, status, amount, 1 AS n FROM new_rows")}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_apply("SELECT user_id, status, amount, -1 AS n FROM old_rows")}
+    ELSE
+        {_apply(_CHANGED)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+SUMMARY_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS invoices_summary_insert ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_summary_update ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_summary_delete ON invoices",
+    """CREATE TRIGGER invoices_summary_insert AFTER INSERT ON invoices
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+    """CREATE TRIGGER invoices_summary_update AFTER UPDATE ON invoices
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+    """CREATE TRIGGER invoices_summary_delete AFTER DELETE ON invoices
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION user_invoice_summary_apply()""",
+]
+
+# Recompute every user's row from `invoices`. Callers hold a SHARE lock on
+# invoices so no write lands between the aggregate and the swap.
+REBUILD_SUMMARY = [
+    "DELETE FROM user_invoice_summary",
+    """INSERT INTO user_invoice_summary (
+           user_id, invoice_count, pending_count, pending_amount,
+           paid_count, paid_amount, updated_at
+       )
+       SELECT
+           user_id,
+           count(*),
+           count(*) FILTER (WHERE status = 'Pending'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0),
+           count(*) FILTER (WHERE status = 'Paid'),
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+           now()
+       FROM invoices
+       GROUP BY user_id""",
+]
+
+# Users whose stored row disagrees with a fresh aggregate (missing rows for
+# users with invoices count; zeroed rows for users without don't)
+SUMMARY_DRIFT = """
+    SELECT count(*) FROM (
+        SELECT user_id, count(*) AS invoice_count,
+               count(*) FILTER (WHERE status = 'Pending') AS pending_count,
+               coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0) AS pending_amount,
+               count(*) FILTER (WHERE status = 'Paid') AS paid_count,
+               coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0) AS paid_amount
+        FROM invoices GROUP BY user_id
+    ) AS actual
+    FULL JOIN user_invoice_summary AS s USING (user_id)
+    WHERE (
+        coalesce(actual.invoice_count, 0), coalesce(actual.pending_count, 0),
+        coalesce(actual.pending_amount, 0), coalesce(actual.paid_count, 0),
+        coalesce(actual.paid_amount, 0)
+    ) IS DISTINCT FROM (
+        coalesce(s.invoice_count, 0), coalesce(s.pending_count, 0),
+        coalesce(s.pending_amount, 0), coalesce(s.paid_count, 0),
+        coalesce(s.paid_amount, 0)
+    )
+"""
+
+
+# ---------- TREND ROLLUP ----------
+
+# Per user only: an all-users row per day would be upserted by every write
+# of that day, and concurrent writers across all users would queue on its
+# lock until commit. The admin trend sums the users' rows instead, through
+# the covering index on `day`.
+
+
+def _apply_trend(deltas: str) -> str:
+    # `deltas` yields (user_id, issue_date, status, amount, n)
+    return f"""
+        INSERT INTO invoice_trend_daily AS t (
+            user_id, day, paid_count, paid_amount, pending_count, pending_amount
+        )
+        SELECT
+            user_id,
+            issue_date,
+            coalesce(sum(n) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Paid'), 0),
+            coalesce(sum(n) FILTER (WHERE status = 'Pending'), 0),
+            coalesce(sum(n * amount::numeric) FILTER (WHERE status = 'Pending'), 0)
+        FROM ({deltas}) AS delta
+        WHERE status IN ('Paid', 'Pending')
+        GROUP BY user_id, issue_date
+        ORDER BY user_id, issue_date
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            paid_count = t.paid_count + EXCLUDED.paid_count,
+            paid_amount = t.paid_amount + EXCLUDED.paid_amount,
+            pending_count = t.pending_count + EXCLUDED.pending_count,
+            pending_amount = t.pending_amount + EXCLUDED.pending_amount;"""
+
+
+_TREND_KEY = "(o.user_id, o.issue_date, o.status, o.amount) IS DISTINCT FROM (n.user_id, n.issue_date, n.status, n.amount)"
+
+_TREND_CHANGED = f"""
+    SELECT o.user_id, o.issue_date, o.status, o.amount, -1 AS n
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+    UNION ALL
+    SELECT n.user_id, n.issue_date, n.status, n.amount, 1
+    FROM old_rows o JOIN new_rows n USING (id)
+    WHERE {_TREND_KEY}
+"""
+
+TREND_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION invoice_trend_daily_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, 1 AS n FROM new_rows")}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_apply_trend("SELECT user_id, issue_date, status, amount, -1 AS n FROM old_rows")}
+    ELSE
+        {_apply_trend(_TREND_CHANGED)}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+TREND_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS invoices_trend_insert ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_trend_update ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_trend_delete ON invoices",
+    """CREATE TRIGGER invoices_trend_insert AFTER INSERT ON invoices
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+    """CREATE TRIGGER invoices_trend_update AFTER UPDATE ON invoices
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+    """CREATE TRIGGER invoices_trend_delete AFTER DELETE ON invoices
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_trend_daily_apply()""",
+]
+
+_TREND_ACTUAL = """
+    SELECT user_id, issue_date AS day,
+           count(*) FILTER (WHERE status = 'Paid') AS paid_count,
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Paid'), 0) AS paid_amount,
+           count(*) FILTER (WHERE status = 'Pending') AS pending_count,
+           coalesce(sum(amount::numeric) FILTER (WHERE status = 'Pending'), 0) AS pending_amount
+    FROM invoices
+    WHERE status IN ('Paid', 'Pending')
+    GROUP BY user_id, issue_date
+"""
+
+REBUILD_TREND = [
+    "DELETE FROM invoice_trend_daily",
+    f"""INSERT INTO invoice_trend_daily (
+           user_id, day, paid_count, paid_amount, pending_count, pending_amount
+       ) {_TREND_ACTUAL}""",
+]
+
+# (user, day) buckets that disagree with a fresh aggregate; rows left at zero
+# by deletes are not drift
+TREND_DRIFT = f"""
+    SELECT count(*) FROM ({_TREND_ACTUAL}) AS actual
+    FULL JOIN invoice_trend_daily AS t USING (user_id, day)
+    WHERE (
+        coalesce(actual.paid_count, 0), coalesce(actual.paid_amount, 0),
+        coalesce(actual.pending_count, 0), coalesce(actual.pending_amount, 0)
+    ) IS DISTINCT FROM (
+        coalesce(t.paid_count, 0), coalesce(t.paid_amount, 0),
+        coalesce(t.pending_count, 0), coalesce(t.pending_amount, 0)
+    )
+"""
+
+
+def _install(connection, function, triggers, rebuild):
+    connection.exec_driver_sql(function)
+    for statement in triggers:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("LOCK TABLE invoices IN SHARE MODE")
+    for statement in rebuild:
+        connection.exec_driver_sql(statement)
+
+
+def install_summary(connection):
+    """Create the summary trigger function and triggers, then backfill."""
+    _install(connection, SUMMARY_FUNCTION, SUMMARY_TRIGGERS, REBUILD_SUMMARY)
+
+
+def install_trend(connection):
+    """Create the trend trigger function and triggers, then backfill."""
+    _install(connection, TREND_FUNCTION, TREND_TRIGGERS, REBUILD_TREND)
@@ -0,0 +1,129 @@
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+# Leave SMTP_HOST unset in development: messages are printed instead of sent.
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# starttls | ssl (implicit TLS, usually port 465) | none
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "starttls")
+SMTP_FROM = os.getenv("SMTP_FROM", "no-reply@payment-reminder.local")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+# Connections kept open between batches
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Servers drop idle sessions; don't reuse one that sat longer than this
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "30"))
+
+
+def build_message(recipient: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = SMTP_FROM
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+class SMTPPool:
+    """
+    Up to `size` logged-in SMTP sessions shared by the sender threads, so a
+    batch pays for the TCP/TLS handshake and AUTH once rather than per message.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, size=SMTP_POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+
+    def _connect(self):
+        context = ssl.create_default_context()
+        if SMTP_SECURITY == "ssl":
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=SMTP_TIMEOUT, context=context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+            if SMTP_SECURITY == "starttls":
+                conn.starttls(context=context)
+        if SMTP_USERNAME:
+            conn.login(SMTP_USERNAME, SMTP_PASSWORD or "")
+        self.opened += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), False
+            if time.monotonic() - last_used < SMTP_IDLE_SECONDS:
+                return conn, True
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            conn, reused = self._checkout()
+            try:
+                yield conn, reused
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server answered: the session itself is still usable
+                self._idle.put((conn, time.monotonic()))
+                raise
+            except Exception:
+                conn.close()
+                raise
+            self._idle.put((conn, time.monotonic()))
+
+    def send(self, message: EmailMessage):
+        reused = False
+        try:
+            with self.connection() as (conn, reused):
+                conn.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            if not reused:
+                raise
+            # A pooled session timed out server-side; retry once on a fresh one
+            with self.connection() as (conn, _):
+                conn.send_message(message)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+class ConsoleMailer:
+    """Development stand-in used when no SMTP_HOST is configured."""
+
+    def send(self, message: EmailMessage):
+        print("--- EMAIL SERVICE ---")
+        print(f"To: {message['To']}")
+        print(f"Subject: {message['Subject']}")
+        print(f"Body: {message.get_content()}")
+        print("----------------------")
+
+    def close(self):
+        pass
+
+
+def get_mailer():
+    return SMTPPool() if SMTP_HOST else ConsoleMailer()
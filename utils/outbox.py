@@ -0,0 +1,185 @@
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from database import SessionLocal
+from models import EmailOutbox
+from utils.mailer import SMTP_POOL_SIZE, build_message, get_mailer
+from utils.metrics import Histogram
+
+# Run the sender thread inside every app process. Turn off when a dedicated
+# `python -m scripts.outbox_worker` is deployed instead.
+OUTBOX_SENDER = os.getenv("OUTBOX_SENDER", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+# Seconds to sleep when the outbox has nothing due
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Retry delay doubles per attempt from the base up to the cap
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+
+# Shared with the scheduler, which renders the same text in SQL via format()
+REMINDER_SUBJECT = "Payment reminder: invoice %s"
+REMINDER_BODY = (
+    "Hello,\n\n"
+    "Invoice %s for %s, amount %s, is due on %s.\n"
+    "Please arrange payment if you have not already done so.\n"
+)
+
+
+def enqueue_email(db, kind: str, recipient: str, subject: str, body: str):
+    """Add a message to the caller's transaction; it is sent after commit."""
+    db.add(EmailOutbox(kind=kind, recipient=recipient, subject=subject, body=body))
+
+
+def reminder_email(invoice) -> tuple:
+    return (
+        REMINDER_SUBJECT % invoice.invoice_number,
+        REMINDER_BODY % (
+            invoice.invoice_number, invoice.customer_name,
+            f"{invoice.amount:.2f}", invoice.due_date.isoformat()
+        ),
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+    # Jitter so a burst that failed together doesn't retry together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies (bad mailbox, rejected content) won't succeed on retry
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class OutboxSender:
+    """
+    Claims due messages with FOR UPDATE SKIP LOCKED, so any number of app
+    processes and workers can drain the same outbox, and sends each batch
+    concurrently over the mailer's pooled connections.
+    """
+
+    def __init__(self, mailer=None, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.mailer = mailer or get_mailer()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.send_latency = Histogram()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=SMTP_POOL_SIZE, thread_name_prefix="outbox-smtp"
+        )
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _send(self, message):
+        started = time.monotonic()
+        try:
+            self.mailer.send(message)
+        except Exception as e:
+            return e
+        finally:
+            self.send_latency.observe(time.monotonic() - started)
+        return None
+
+    def send_batch(self) -> int:
+        """Send one batch of due messages; returns how many were claimed."""
+        with SessionLocal() as db:
+            rows = db.scalars(
+                select(EmailOutbox)
+                .where(
+                    EmailOutbox.status == "pending",
+                    EmailOutbox.next_attempt_at <= func.now()
+                )
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return 0
+
+            messages = [build_message(row.recipient, row.subject, row.body) for row in rows]
+            errors = list(self._executor.map(self._send, messages))
+
+            now = datetime.now(timezone.utc)
+            for row, error in zip(rows, errors):
+                row.attempts += 1
+                if error is None:
+                    row.status = "sent"
+                    row.sent_at = now
+                    row.last_error = None
+                    self.sent += 1
+                elif _is_permanent(error) or row.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    row.status = "failed"
+                    row.last_error = repr(error)
+                    self.failed += 1
+                else:
+                    row.next_attempt_at = now + timedelta(seconds=retry_delay(row.attempts))
+                    row.last_error = repr(error)
+                    self.retried += 1
+            db.commit()
+            return len(rows)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.send_batch()
+            except Exception as e:
+                print(f"Outbox sender error: {e}")
+                claimed = 0
+            # A full batch means more may be waiting; only sleep when drained
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="outbox-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.mailer.close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connections_opened": getattr(self.mailer, "opened", 0),
+            "send_latency": self.send_latency.snapshot(),
+        }
+
+
+_sender = None
+
+
+def start_outbox_sender():
+    global _sender
+    if OUTBOX_SENDER and _sender is None:
+        _sender = OutboxSender()
+        _sender.start()
+
+
+def stop_outbox_sender():
+    global _sender
+    if _sender is not None:
+        _sender.stop()
+        _sender = None
+
+
+def outbox_stats() -> dict:
+    return _sender.stats() if _sender is not None else {"running": False}
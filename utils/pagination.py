@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+
+from database import read_session_scope
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row of a page into an opaque cursor."""
+    raw = json.dumps([
+        v.isoformat() if isinstance(v, (date, datetime)) else v
+        for v in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("cursor arity mismatch")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(stmt, key_columns, parsers, after=None, descending=False):
+    """
+    Order `stmt` by `key_columns` and, if a cursor is given, seek past it.
+    The last key column must be unique (the primary key) so pages never overlap.
+    """
+    if after:
+        key = tuple_(*key_columns)
+        values = tuple_(*decode_cursor(after, *parsers))
+        stmt = stmt.where(key < values if descending else key > values)
+    order = [col.desc() if descending else col.asc() for col in key_columns]
+    return stmt.order_by(*order)
+
+
+async def paginate(db, stmt, key_columns, limit: int, response: Response):
+    """
+    Fetch one page of an already keyset-ordered statement. When more rows
+    exist, the cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    rows = (await db.scalars(stmt.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            *(getattr(last, col.key) for col in key_columns)
+        )
+    return rows
+
+
+def stream_ndjson(stmt, schema, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Stream every row of `stmt` as newline-delimited JSON.
+
+    Rows are pulled through a server-side cursor (`yield_per`), so memory stays
+    bounded by `batch_size` regardless of table size. The generator owns its
+    own session because it outlives the request's `get_read_db` dependency;
+    it is routed to a replica or the primary the same way.
+    """
+    async def generate():
+        async with read_session_scope() as db:
+            result = await db.stream_scalars(
+                stmt.execution_options(yield_per=batch_size)
+            )
+            async for obj in result:
+                yield schema.model_validate(obj).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -0,0 +1,172 @@
+"""
+Partition layout of `invoices`, and the job that archives old Paid ones.
+
+    invoices               PARTITION BY LIST (status)
+      invoices_pending     'Pending'
+      invoices_paid        'Paid', PARTITION BY RANGE (due_date)
+        invoices_paid_2023   one archive partition per year, made by the job
+        invoices_paid_recent DEFAULT: Paid invoices not archived yet
+      invoices_other       DEFAULT: any other status
+
+Every dashboard figure that reads invoices filters on status = 'Pending', so
+it is planned against invoices_pending alone, and that partition's indexes
+grow with outstanding work rather than with history. Marking an invoice Paid
+moves its row across partitions (an UPDATE of the partition key); the read
+model triggers on `invoices` see that as an ordinary update.
+
+The primary key has to contain every partitioning column, so it is
+(id, status, due_date), and the mapper still identifies invoices by `id`
+alone. A partitioned table cannot enforce a unique `id` or be the target of
+reminders.invoice_id's foreign key, so statement-level triggers keep every
+invoice id in `invoice_ids` (id PRIMARY KEY): an INSERT or UPDATE that
+would duplicate an id fails on its primary key, explicit ids included, and
+reminders.invoice_id references it, so a reminder's invoice must exist and
+an invoice with reminders cannot be deleted. Rows written to a partition
+directly, or with triggers bypassed, are not registered; repair the table
+with `python -m scripts.rebuild_invoice_summary`.
+"""
+import os
+from datetime import date
+
+# Paid invoices due in a calendar year that ended at least this many days
+# ago are moved out of invoices_paid_recent into that year's partition
+INVOICE_ARCHIVE_AFTER_DAYS = int(os.getenv("INVOICE_ARCHIVE_AFTER_DAYS", "365"))
+
+PARTITIONS = (
+    "CREATE TABLE IF NOT EXISTS invoices_pending PARTITION OF {parent} FOR VALUES IN ('Pending')",
+    "CREATE TABLE IF NOT EXISTS invoices_paid PARTITION OF {parent} FOR VALUES IN ('Paid') "
+    "PARTITION BY RANGE (due_date)",
+    "CREATE TABLE IF NOT EXISTS invoices_paid_recent PARTITION OF invoices_paid DEFAULT",
+    "CREATE TABLE IF NOT EXISTS invoices_other PARTITION OF {parent} DEFAULT",
+)
+
+
+INVOICE_IDS_FUNCTION = """
+CREATE OR REPLACE FUNCTION invoice_ids_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO invoice_ids (id) SELECT id FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM invoice_ids WHERE id IN (SELECT id FROM old_rows);
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM invoice_ids;
+    ELSE
+        -- Only the ids the UPDATE changed; a status change keeps its id
+        DELETE FROM invoice_ids WHERE id IN (SELECT id FROM old_rows EXCEPT SELECT id FROM new_rows);
+        INSERT INTO invoice_ids (id) SELECT id FROM new_rows EXCEPT ALL SELECT id FROM old_rows;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+INVOICE_IDS_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS invoices_ids_insert ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_ids_update ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_ids_delete ON invoices",
+    "DROP TRIGGER IF EXISTS invoices_ids_truncate ON invoices",
+    """CREATE TRIGGER invoices_ids_insert AFTER INSERT ON invoices
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_ids_apply()""",
+    """CREATE TRIGGER invoices_ids_update AFTER UPDATE ON invoices
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_ids_apply()""",
+    """CREATE TRIGGER invoices_ids_delete AFTER DELETE ON invoices
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_ids_apply()""",
+    """CREATE TRIGGER invoices_ids_truncate AFTER TRUNCATE ON invoices
+       FOR EACH STATEMENT EXECUTE FUNCTION invoice_ids_apply()""",
+]
+
+# Register missing ids and drop ones without an invoice (which fails while
+# a reminder still points at one). Callers hold a SHARE lock on invoices.
+REBUILD_INVOICE_IDS = [
+    "INSERT INTO invoice_ids (id) SELECT DISTINCT id FROM invoices ON CONFLICT DO NOTHING",
+    "DELETE FROM invoice_ids WHERE NOT EXISTS (SELECT 1 FROM invoices WHERE invoices.id = invoice_ids.id)",
+]
+
+# Ids registered without an invoice, or invoices whose id is not registered
+INVOICE_IDS_DRIFT = """
+    SELECT count(*) FROM (SELECT DISTINCT id FROM invoices) AS actual
+    FULL JOIN invoice_ids AS registered USING (id)
+    WHERE actual.id IS NULL OR registered.id IS NULL
+"""
+
+
+def install_partitions(connection, parent: str = "invoices"):
+    """Create the fixed partitions under `parent`, a table partitioned by status."""
+    for statement in PARTITIONS:
+        connection.exec_driver_sql(statement.format(parent=parent))
+
+
+def install_invoice_ids(connection):
+    """Create the invoice_ids trigger function and triggers, then backfill."""
+    connection.exec_driver_sql(INVOICE_IDS_FUNCTION)
+    for statement in INVOICE_IDS_TRIGGERS:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("LOCK TABLE invoices IN SHARE MODE")
+    for statement in REBUILD_INVOICE_IDS:
+        connection.exec_driver_sql(statement)
+
+
+def is_partition(name: str) -> bool:
+    return name in ("invoices_pending", "invoices_paid", "invoices_paid_recent", "invoices_other") \
+        or (name.startswith("invoices_paid_") and name[len("invoices_paid_"):].isdigit())
+
+
+def archive_cutoff(today: date = None, after_days: int = INVOICE_ARCHIVE_AFTER_DAYS) -> date:
+    """First day not yet archivable: 1 January of the year `after_days` ago."""
+    today = today or date.today()
+    return date(date.fromordinal(today.toordinal() - after_days).year, 1, 1)
+
+
+def archive_year(connection, year: int) -> int:
+    """
+    Move year `year`'s Paid invoices from invoices_paid_recent into a new
+    invoices_paid_<year> partition and attach it; returns the rows moved.
+
+    One transaction: readers see the rows in the default partition until the
+    commit and in the archive partition after it. Attaching scans the
+    default partition under an ACCESS EXCLUSIVE lock, so recent Paid
+    invoices are unreadable for that long -- run it off-peak. The CHECK
+    constraint spares the scan of the new partition and is dropped again.
+    """
+    name = f"invoices_paid_{year}"
+    start, end = f"'{year}-01-01'", f"'{year + 1}-01-01'"
+    connection.exec_driver_sql(f"CREATE TABLE {name} (LIKE invoices INCLUDING DEFAULTS)")
+    connection.exec_driver_sql(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bound "
+        f"CHECK (status = 'Paid' AND due_date >= {start} AND due_date < {end})"
+    )
+    moved = connection.exec_driver_sql(f"""
+        WITH moved AS (
+            DELETE FROM invoices_paid_recent
+            WHERE due_date >= {start} AND due_date < {end}
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """).rowcount
+    connection.exec_driver_sql(
+        f"ALTER TABLE invoices_paid ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})"
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bound")
+    connection.exec_driver_sql(f"ANALYZE {name}")
+    return moved
+
+
+def archive_paid_invoices(engine, today: date = None,
+                          after_days: int = INVOICE_ARCHIVE_AFTER_DAYS) -> dict:
+    """Archive every whole year before the cutoff, oldest first, one transaction each."""
+    cutoff = archive_cutoff(today, after_days)
+    archived = {}
+    while True:
+        with engine.begin() as connection:
+            oldest = connection.exec_driver_sql(
+                "SELECT min(due_date) FROM invoices_paid_recent WHERE due_date < %(cutoff)s",
+                {"cutoff": cutoff},
+            ).scalar()
+            if oldest is None:
+                break
+            archived[oldest.year] = archive_year(connection, oldest.year)
+    return archived
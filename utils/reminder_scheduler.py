@@ -0,0 +1,142 @@
+import os
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import and_, case, exists, func, insert, literal, or_, select
+
+from models import EmailOutbox, Invoice, Reminder
+from utils.outbox import REMINDER_BODY, REMINDER_SUBJECT
+
+# Comma-separated cadences, checked against every Pending invoice:
+#   before:N   N days before the due date
+#   due        on the due date
+#   overdue:N  once N days overdue, then whenever this cadence's reminder
+#              type was last sent N or more days ago (a missed run is caught
+#              up on the next one rather than N days later)
+# Append @type to set the reminder_type (default "email"). When several
+# cadences match the same invoice, the last one listed wins, so escalations
+# go at the end: "before:3,due,overdue:7,overdue:30@escalation"
+REMINDER_CADENCES = os.getenv("REMINDER_CADENCES", "before:3,due,overdue:7")
+# An invoice reminded within this many days is skipped
+REMINDER_WINDOW_DAYS = int(os.getenv("REMINDER_WINDOW_DAYS", "1"))
+
+# pg_advisory_xact_lock key so overlapping runs (cron + admin) don't double up
+SCHEDULER_LOCK_ID = 7_301_001
+
+
+class Cadence(NamedTuple):
+    kind: str
+    days: int
+    reminder_type: str
+
+
+def parse_cadences(spec: str) -> list:
+    cadences = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        rule, _, reminder_type = item.partition("@")
+        kind, _, days = rule.partition(":")
+        if kind not in ("before", "due", "overdue"):
+            raise ValueError(f"Unknown reminder cadence: {item!r}")
+        days = int(days or 0)
+        if kind == "overdue" and days <= 0:
+            raise ValueError(f"overdue cadence needs a positive interval: {item!r}")
+        cadences.append(Cadence(kind, days, reminder_type or "email"))
+    return cadences
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min).astimezone()
+
+
+def _matches(cadence: Cadence, today: date):
+    if cadence.kind == "before":
+        return Invoice.due_date == today + timedelta(days=cadence.days)
+    if cadence.kind == "due":
+        return Invoice.due_date == today
+    # Per type, so a weekly reminder does not hold back a monthly escalation.
+    # Planned like the window check below: one pass over recent reminders.
+    sent_recently = exists().where(
+        Reminder.invoice_id == Invoice.id,
+        Reminder.sent_at >= _day_start(today - timedelta(days=cadence.days - 1)),
+        Reminder.reminder_type == cadence.reminder_type,
+    )
+    return and_(Invoice.due_date <= today - timedelta(days=cadence.days), ~sent_recently)
+
+
+def build_schedule_statement(cadences: list, today: date, window_days: int):
+    """
+    One INSERT ... SELECT over Pending invoices that creates a reminder for
+    every invoice matching a cadence today and not reminded within the window.
+    Each new reminder also queues its email in the outbox, in the same
+    statement. Returns the count inserted per reminder_type.
+    """
+    window_start = _day_start(today - timedelta(days=window_days - 1))
+    conditions = [_matches(cadence, today) for cadence in cadences]
+    reminder_type = case(
+        *[(cond, cadence.reminder_type)
+          for cond, cadence in reversed(list(zip(conditions, cadences)))]
+    )
+    already_reminded = exists().where(
+        Reminder.invoice_id == Invoice.id,
+        Reminder.sent_at >= window_start
+    )
+    due = select(
+        Invoice.user_id,
+        Invoice.id,
+        reminder_type,
+        literal("sent"),
+    ).where(
+        Invoice.status == "Pending",
+        or_(*conditions),
+        ~already_reminded
+    )
+    inserted = (
+        insert(Reminder)
+        .from_select(["user_id", "invoice_id", "reminder_type", "status"], due)
+        .returning(Reminder.invoice_id, Reminder.reminder_type)
+        .cte("inserted")
+    )
+    emails = select(
+        literal("reminder"),
+        Invoice.user_email,
+        func.format(REMINDER_SUBJECT, Invoice.invoice_number),
+        func.format(
+            REMINDER_BODY,
+            Invoice.invoice_number,
+            Invoice.customer_name,
+            func.to_char(Invoice.amount, "FM999999999990.00"),
+            func.to_char(Invoice.due_date, "YYYY-MM-DD"),
+        ),
+        literal("pending"),
+        literal(0),
+    ).join(inserted, inserted.c.invoice_id == Invoice.id)
+    queued = (
+        insert(EmailOutbox)
+        .from_select(
+            ["kind", "recipient", "subject", "body", "status", "attempts"], emails,
+            include_defaults=False
+        )
+        .cte("queued")
+    )
+    return select(inserted.c.reminder_type, func.count()).group_by(
+        inserted.c.reminder_type
+    ).add_cte(queued)
+
+
+async def run_reminder_schedule(db, today: date = None) -> dict:
+    today = today or date.today()
+    cadences = parse_cadences(REMINDER_CADENCES)
+    if not cadences:
+        return {"date": today, "created": 0, "by_type": {}}
+
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(SCHEDULER_LOCK_ID)))
+    if not locked:
+        await db.rollback()
+        return {"date": today, "skipped": "another run is in progress"}
+
+    result = await db.execute(
+        build_schedule_statement(cadences, today, REMINDER_WINDOW_DAYS)
+    )
+    by_type = {reminder_type: count for reminder_type, count in result.all()}
+    await db.commit()
+    return {"date": today, "created": sum(by_type.values()), "by_type": by_type}
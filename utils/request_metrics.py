@@ -0,0 +1,212 @@
+import contextvars
+import hmac
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+
+from database import async_engine, engine, sync_engines
+from utils.admission import PRIORITY_CLASSES, rate_limited
+from utils.hashing import hash_latency, queue_wait
+from utils.metrics import Histogram
+
+# Log requests slower than this many milliseconds, with the SQL they ran;
+# 0 disables the log (and the per-statement capture it needs)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+# Bearer token the scraper must send to /metrics; unset leaves it open
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "captured")
+
+    def __init__(self, capture: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.captured = [] if capture else None
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram()
+        self.responses = {}  # status code -> count
+
+
+# The request being served; copied into the threadpool (DB_MODE=sync) and
+# into SQLAlchemy's greenlets (asyncpg), so the cursor hooks see it
+_current = contextvars.ContextVar("request_stats", default=None)
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+# ---------- SQL HOOKS ----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_metrics_started", None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if stats.captured is not None and len(stats.captured) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.captured.append((elapsed, statement))
+
+
+def instrument_engines():
+    """Attach the cursor hooks; statements outside a request are not counted."""
+    for sync_engine in sync_engines():
+        if not event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+            event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- MIDDLEWARE ----------
+
+def _route_metrics(method: str, route: str) -> RouteMetrics:
+    key = (method, route)
+    metrics = _routes.get(key)
+    if metrics is None:
+        with _routes_lock:
+            metrics = _routes.setdefault(key, RouteMetrics())
+    return metrics
+
+
+def _log_slow(scope, status, elapsed, stats):
+    print(
+        f"SLOW REQUEST {scope['method']} {scope['path']} -> {status} "
+        f"{elapsed * 1000:.0f}ms, {stats.statements} statements, "
+        f"{stats.db_seconds * 1000:.0f}ms in DB"
+    )
+    for seconds, statement in stats.captured:
+        print(f"  {seconds * 1000:8.1f}ms  {' '.join(statement.split())[:500]}")
+    if stats.statements > len(stats.captured):
+        print(f"  ... {stats.statements - len(stats.captured)} more")
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-route latency, statement count and DB time. A plain ASGI middleware
+    rather than BaseHTTPMiddleware, so streamed responses are timed until
+    their last chunk and nothing is buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(capture=SLOW_REQUEST_MS > 0)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics = _route_metrics(scope["method"], route)
+            metrics.latency.observe(elapsed)
+            metrics.statements.observe(stats.statements)
+            metrics.db_time.observe(stats.db_seconds)
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(scope, status, elapsed, stats)
+
+
+# ---------- PROMETHEUS ----------
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_prometheus() -> str:
+    with _routes_lock:
+        routes = sorted(_routes.items())
+    labels = {key: f'method="{_label(key[0])}",route="{_label(key[1])}"' for key, _ in routes}
+    lines = []
+
+    _family(lines, "http_requests_total", "counter", "Requests by route and status.")
+    for key, metrics in routes:
+        for status, count in sorted(metrics.responses.items()):
+            lines.append(f'http_requests_total{{{labels[key]},status="{status}"}} {count}')
+
+    for name, attr, help_text in (
+        ("http_request_duration_seconds", "latency", "Time to last response byte."),
+        ("http_request_db_statements", "statements", "SQL statements per request."),
+        ("http_request_db_seconds", "db_time", "Time spent executing SQL per request."),
+    ):
+        _family(lines, name, "histogram", help_text)
+        for key, metrics in routes:
+            lines.extend(getattr(metrics, attr).prometheus(name, labels[key]))
+
+    pools = [("sync", engine)] + ([("async", async_engine.sync_engine)] if async_engine else [])
+    _family(lines, "db_pool_checked_out", "gauge", "Connections currently checked out.")
+    for name, sync_engine in pools:
+        checked_out = getattr(sync_engine.pool, "checkedout", lambda: 0)()
+        lines.append(f'db_pool_checked_out{{engine="{name}"}} {checked_out}')
+    _family(lines, "db_pool_checkout_timeouts_total", "counter", "Checkouts that hit DB_POOL_TIMEOUT.")
+    for name, sync_engine in pools:
+        lines.append(f'db_pool_checkout_timeouts_total{{engine="{name}"}} {sync_engine.pool.stats.timeouts}')
+    _family(lines, "db_pool_checkout_wait_seconds", "histogram", "Time waiting for a pooled connection.")
+    for name, sync_engine in pools:
+        lines.extend(sync_engine.pool.stats.checkout_wait.prometheus(
+            "db_pool_checkout_wait_seconds", f'engine="{name}"'
+        ))
+
+    _family(lines, "password_hash_seconds", "histogram", "bcrypt hash / verify time.")
+    lines.extend(hash_latency.prometheus("password_hash_seconds"))
+    _family(lines, "password_hash_queue_seconds", "histogram", "Wait for a hash worker.")
+    lines.extend(queue_wait.prometheus("password_hash_queue_seconds"))
+
+    _family(lines, "admission_running", "gauge", "Requests holding a slot, by priority class.")
+    for name, priority in PRIORITY_CLASSES.items():
+        lines.append(f'admission_running{{class="{name}"}} {priority.running}')
+    _family(lines, "admission_rejected_total", "counter", "Requests turned away with 503, by class.")
+    for name, priority in PRIORITY_CLASSES.items():
+        lines.append(f'admission_rejected_total{{class="{name}",reason="queue_full"}} {priority.rejected}')
+        lines.append(f'admission_rejected_total{{class="{name}",reason="timeout"}} {priority.timed_out}')
+    _family(lines, "admission_queue_seconds", "histogram", "Wait for a slot, by class.")
+    for name, priority in PRIORITY_CLASSES.items():
+        lines.extend(priority.queue_wait.prometheus("admission_queue_seconds", f'class="{name}"'))
+    _family(lines, "rate_limited_total", "counter", "Requests refused with 429, by bucket scope.")
+    for scope, count in sorted(rate_limited.items()):
+        lines.append(f'rate_limited_total{{scope="{scope}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response(request: Request):
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
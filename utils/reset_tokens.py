@@ -0,0 +1,257 @@
+import asyncio
+import base64
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+from database import session_scope
+from models import PasswordResetToken, User
+from utils.auth_utils import generate_secure_token
+from utils.security import SECRET_KEY
+
+# 'signed' (default) issues self-expiring HMAC tokens and never stores them;
+# 'table' keeps the password_reset_tokens rows
+RESET_TOKEN_BACKEND = os.getenv("RESET_TOKEN_BACKEND", "signed").lower()
+RESET_TOKEN_TTL_MINUTES = int(os.getenv("RESET_TOKEN_TTL_MINUTES", "15"))
+# Table backend only: seconds between purges of expired rows, and rows per DELETE
+RESET_TOKEN_PURGE_INTERVAL = float(os.getenv("RESET_TOKEN_PURGE_INTERVAL", "300"))
+RESET_TOKEN_PURGE_BATCH = int(os.getenv("RESET_TOKEN_PURGE_BATCH", "1000"))
+
+INVALID = "Invalid token"
+EXPIRED = "Token has expired"
+
+# Separate key per purpose, so a reset signature can never pass as a JWT's
+_SIGNING_KEY = hmac.new(SECRET_KEY.encode(), b"password-reset", hashlib.sha256).digest()
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(_SIGNING_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def _password_fingerprint(password_hash: str) -> str:
+    # Changes with every password change, which retires outstanding tokens
+    return _b64(hmac.new(_SIGNING_KEY, password_hash.encode(), hashlib.sha256).digest()[:12])
+
+
+class NonceLedger:
+    """
+    Nonces of tokens already redeemed by this process. An entry is only
+    needed until its token expires -- after that the expiry check rejects
+    the token anyway -- so entries are dropped in expiry order on insert.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            _, nonce = heapq.heappop(self._heap)
+            self._expiry.pop(nonce, None)
+
+    def add(self, nonce: str, expires_at: float):
+        with self._lock:
+            self._prune(time.time())
+            self._expiry[nonce] = expires_at
+            heapq.heappush(self._heap, (expires_at, nonce))
+
+    def __contains__(self, nonce: str) -> bool:
+        with self._lock:
+            expires_at = self._expiry.get(nonce)
+            return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._prune(time.time())
+            return len(self._expiry)
+
+
+class SignedTokenStore:
+    """
+    Tokens carry `user id . role . expiry . nonce . password fingerprint`
+    signed with HMAC-SHA256. Checking one is a constant-time digest
+    comparison plus a ledger lookup; nothing is written when a token is
+    issued and Postgres is only read when a token is redeemed.
+
+    Single use holds across processes: redeeming a token changes the
+    password, so its fingerprint no longer matches the user row. The ledger
+    lets this process reject a redeemed token without that lookup.
+    """
+
+    def __init__(self, ttl_minutes: int = RESET_TOKEN_TTL_MINUTES):
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self.used = NonceLedger()
+
+    async def issue(self, db, user) -> str:
+        expires_at = int((datetime.now(timezone.utc) + self.ttl).timestamp())
+        payload = ".".join((
+            str(user.id), user.role, str(expires_at),
+            secrets.token_urlsafe(16), _password_fingerprint(user.password)
+        ))
+        return f"{payload}.{_sign(payload)}"
+
+    def _claims(self, token: str):
+        """(claims, None) for a usable token, else (None, reason)."""
+        payload, _, signature = token.rpartition(".")
+        # Bytes: compare_digest refuses non-ASCII str, and tokens are user input
+        if not hmac.compare_digest(_sign(payload).encode(), signature.encode()):
+            return None, INVALID
+        # Roles are free strings and may contain "."; every other field cannot
+        try:
+            user_id, rest = payload.split(".", 1)
+            role, expires_at, nonce, fingerprint = rest.rsplit(".", 3)
+            user_id, expires_at = int(user_id), int(expires_at)
+        except ValueError:
+            return None, INVALID
+        if expires_at < time.time():
+            return None, EXPIRED
+        if nonce in self.used:
+            return None, INVALID
+        return (user_id, role, expires_at, nonce, fingerprint), None
+
+    async def check(self, db, token: str):
+        """None if the token can be redeemed, else the reason it cannot."""
+        return self._claims(token)[1]
+
+    async def consume(self, db, token: str):
+        """Lock and return the token's user; the caller commits the new password."""
+        claims, reason = self._claims(token)
+        if reason:
+            raise HTTPException(status_code=400, detail=reason)
+        user_id, role, expires_at, nonce, fingerprint = claims
+
+        # FOR UPDATE: a concurrent redeem of the same token waits here, then
+        # sees the new password and fails the fingerprint check
+        user = await db.scalar(
+            select(User).where(User.id == user_id, User.role == role).with_for_update()
+        )
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        if not hmac.compare_digest(_password_fingerprint(user.password).encode(), fingerprint.encode()):
+            raise HTTPException(status_code=400, detail=INVALID)
+        self.used.add(nonce, expires_at)
+        return user
+
+    def stats(self) -> dict:
+        return {"backend": "signed", "redeemed_nonces": len(self.used)}
+
+
+class TableTokenStore:
+    """The password_reset_tokens table, with expired rows purged in batches."""
+
+    def __init__(self, ttl_minutes: int = RESET_TOKEN_TTL_MINUTES):
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self.purged = 0
+
+    async def issue(self, db, user) -> str:
+        token = generate_secure_token()
+        db.add(PasswordResetToken(
+            email=user.email,
+            token=token,
+            role=user.role,
+            expires_at=datetime.now(timezone.utc) + self.ttl
+        ))
+        return token
+
+    async def _row(self, db, token: str):
+        return await db.scalar(select(PasswordResetToken).where(PasswordResetToken.token == token))
+
+    async def check(self, db, token: str):
+        row = await self._row(db, token)
+        if not row:
+            return INVALID
+        if row.expires_at < datetime.now(timezone.utc):
+            return EXPIRED
+        return None
+
+    async def consume(self, db, token: str):
+        row = await self._row(db, token)
+        if not row or row.expires_at < datetime.now(timezone.utc):
+            # Left for the purge job; deleting here would cost a commit per miss
+            raise HTTPException(status_code=400, detail=EXPIRED if row else INVALID)
+        user = await db.scalar(select(User).where(User.email == row.email, User.role == row.role))
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        # One-time use: removed in the caller's transaction
+        await db.delete(row)
+        return user
+
+    async def purge_expired(self, batch_size: int = RESET_TOKEN_PURGE_BATCH) -> int:
+        """Delete expired rows in short transactions; returns how many went."""
+        total = 0
+        while True:
+            expired = (
+                select(PasswordResetToken.id)
+                .where(PasswordResetToken.expires_at < func.now())
+                .limit(batch_size)
+            )
+            async with session_scope() as db:
+                result = await db.execute(
+                    delete(PasswordResetToken)
+                    .where(PasswordResetToken.id.in_(expired.scalar_subquery()))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                self.purged += total
+                return total
+
+    def stats(self) -> dict:
+        return {"backend": "table", "purged": self.purged}
+
+
+def get_reset_token_store():
+    if RESET_TOKEN_BACKEND == "table":
+        return TableTokenStore()
+    if RESET_TOKEN_BACKEND != "signed":
+        raise RuntimeError(f"Unknown RESET_TOKEN_BACKEND {RESET_TOKEN_BACKEND!r}")
+    return SignedTokenStore()
+
+
+reset_tokens = get_reset_token_store()
+
+
+# ---------- TABLE PURGE ----------
+
+_purger = None
+
+
+async def _purge_loop():
+    while True:
+        try:
+            await reset_tokens.purge_expired()
+        except Exception as e:
+            print(f"Reset token purge error: {e}")
+        await asyncio.sleep(RESET_TOKEN_PURGE_INTERVAL)
+
+
+def start_token_purger():
+    global _purger
+    if isinstance(reset_tokens, TableTokenStore) and RESET_TOKEN_PURGE_INTERVAL > 0 \
+            and _purger is None:
+        _purger = asyncio.create_task(_purge_loop())
+
+
+async def stop_token_purger():
+    global _purger
+    if _purger is not None:
+        _purger.cancel()
+        try:
+            await _purger
+        except asyncio.CancelledError:
+            pass
+        _purger = None
@@ -0,0 +1,137 @@
+"""
+Invoice search by partial invoice number or customer name.
+
+Exact and prefix matches (`lower(x) = 'q'`, `lower(x) LIKE 'q%'`) are
+answered from btree indexes on lower(invoice_number) and lower(customer_name)
+(migration 0012). With the pg_trgm extension (installed by migration 0009,
+or by create_all on a fresh database, wherever the server offers it) both
+columns also carry GIN trigram indexes, and a query matches fuzzily by word
+similarity as well (`q <% column`, pg_trgm.word_similarity_threshold, 0.6 by
+default). Without pg_trgm the fuzzy part falls back to an unindexed
+ILIKE '%q%' scan: correct, but not fast on large tables.
+
+Results are ranked: exact invoice number, then prefix matches, then by
+similarity, and cut to `limit`. Indexes find matches but cannot return them
+in rank order, so each tier contributes at most SEARCH_CANDIDATES matches to
+the ranking: exact invoice numbers, number prefixes, customer prefixes and,
+only when those leave fewer than `limit` rows, fuzzy matches. An exact
+number is therefore always ranked, while a term common enough to exceed a
+tier's sample is ranked within that sample rather than across the table.
+"""
+import os
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, case, func, literal, or_, select, text, union
+from sqlalchemy.orm import aliased, joinedload
+
+from models import Invoice
+from schemas import InvoiceResponse
+
+# Trigram indexes need three characters to narrow anything down
+SEARCH_MIN_LENGTH = 3
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+# Matches fetched from the indexes and ranked per query
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+
+TRGM_INDEXES = (
+    ("ix_invoices_number_trgm", "invoice_number"),
+    ("ix_invoices_customer_trgm", "customer_name"),
+)
+
+# Whether pg_trgm is installed; checked on the first search in each process
+_trigram = None
+
+
+def install_search(connection, concurrently: bool = False) -> bool:
+    """Create pg_trgm and the trigram indexes if the server offers the extension."""
+    available = connection.exec_driver_sql(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    ).scalar()
+    if not available:
+        print("pg_trgm is not available on this server; invoice search will not be indexed")
+        return False
+    connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Indexes on a partitioned table cannot be built concurrently
+    concurrently = concurrently and connection.exec_driver_sql(
+        "SELECT relkind <> 'p' FROM pg_class WHERE oid = 'invoices'::regclass"
+    ).scalar()
+    for name, column in TRGM_INDEXES:
+        connection.exec_driver_sql(
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+            f"ON invoices USING gin ({column} gin_trgm_ops)"
+        )
+    return True
+
+
+async def trigram_enabled(db) -> bool:
+    global _trigram
+    if _trigram is None:
+        _trigram = bool(await db.scalar(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+        )))
+    return _trigram
+
+
+def search_term(q: str = Query(..., min_length=SEARCH_MIN_LENGTH, max_length=100)) -> str:
+    """The `q` parameter, stripped before its length is checked."""
+    q = q.strip()
+    if len(q) < SEARCH_MIN_LENGTH:
+        raise HTTPException(
+            status_code=422, detail=f"q needs at least {SEARCH_MIN_LENGTH} non-blank characters"
+        )
+    return q
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_statement(q: str, trigram: bool, user_id: int = None, limit: int = SEARCH_DEFAULT_LIMIT):
+    """Ranked (Invoice, score) rows matching `q`."""
+    term = q.lower()
+    prefix = _escape_like(term) + "%"
+
+    def tier(condition):
+        rows = select(Invoice).where(condition)
+        if user_id is not None:
+            rows = rows.where(Invoice.user_id == user_id)
+        return rows.limit(SEARCH_CANDIDATES)
+
+    number, customer = func.lower(Invoice.invoice_number), func.lower(Invoice.customer_name)
+    if trigram:
+        fuzzy = or_(literal(q).op("<%")(Invoice.invoice_number), literal(q).op("<%")(Invoice.customer_name))
+    else:
+        anywhere = "%" + _escape_like(term) + "%"
+        fuzzy = or_(number.like(anywhere), customer.like(anywhere))
+    # The btree tiers, each an index range scan that stops at its limit
+    indexed = union(tier(number == term), tier(number.like(prefix)), tier(customer.like(prefix))).cte("indexed")
+    # Fuzzy-only matches rank below every prefix match, so they are only
+    # looked up when the indexed tiers leave the page short
+    short = select(func.count()).select_from(indexed).scalar_subquery() < limit
+    found = aliased(Invoice, union(select(indexed), tier(and_(fuzzy, short))).subquery("candidates"))
+
+    is_exact = func.lower(found.invoice_number) == term
+    is_prefix = or_(func.lower(found.invoice_number).like(prefix), func.lower(found.customer_name).like(prefix))
+    if trigram:
+        score = func.greatest(
+            func.word_similarity(q, found.invoice_number), func.word_similarity(q, found.customer_name)
+        )
+    else:
+        score = case((is_prefix, 1.0), else_=0.5)
+    return (
+        select(found, score.label("score"))
+        .options(joinedload(found.user))
+        .order_by(is_exact.desc(), is_prefix.desc(), score.desc(), found.id)
+        .limit(limit)
+    )
+
+
+async def search_invoices(db, q: str, user_id: int = None, limit: int = SEARCH_DEFAULT_LIMIT) -> list:
+    """InvoiceSearchResult-shaped dicts, best match first."""
+    trigram = await trigram_enabled(db)
+    rows = (await db.execute(search_statement(q.strip(), trigram, user_id, limit))).all()
+    return [
+        {**InvoiceResponse.model_validate(invoice).model_dump(), "score": round(float(score), 3)}
+        for invoice, score in rows
+    ]
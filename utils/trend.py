@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import Date, DateTime, cast, func, select
+
+from models import InvoiceTrendDaily
+
+GRANULARITIES = ("day", "week", "month")
+GRANULARITY_PATTERN = "^(day|week|month)$"
+DEFAULT_TREND_DAYS = 365
+# Ten years of daily buckets
+MAX_TREND_BUCKETS = 3660
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Same boundaries as Postgres date_trunc (weeks start on Monday)."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def periods(start: date, end: date, granularity: str) -> list:
+    first = bucket_start(start, granularity)
+    if granularity == "month":
+        months = (end.year - first.year) * 12 + end.month - first.month + 1
+        count = max(months, 0)
+    else:
+        step = 7 if granularity == "week" else 1
+        count = max((end - first).days // step + 1, 0)
+    if count > MAX_TREND_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {MAX_TREND_BUCKETS} {granularity} buckets"
+        )
+    if granularity == "month":
+        return [
+            date(first.year + (first.month - 1 + i) // 12, (first.month - 1 + i) % 12 + 1, 1)
+            for i in range(count)
+        ]
+    return [first + timedelta(days=i * step) for i in range(count)]
+
+
+async def trend_series(db, user_id: int = None, start: date = None,
+                       end: date = None, granularity: str = "month") -> list:
+    """
+    Paid / pending totals per bucket of issue date, oldest first, with empty
+    buckets zero-filled; one user's, or with no `user_id` everyone's. Reads
+    only the rollup rows inside the range, so the cost follows the range
+    length (times the users active in it), not the invoice history.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_TREND_DAYS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    buckets = periods(start, end, granularity)
+
+    rollup = InvoiceTrendDaily
+    period = cast(
+        func.date_trunc(granularity, cast(rollup.day, DateTime)), Date
+    ).label("period")
+    stmt = select(
+        period,
+        func.sum(rollup.paid_amount).label("paid"),
+        func.sum(rollup.pending_amount).label("pending"),
+        func.sum(rollup.paid_count).label("paid_count"),
+        func.sum(rollup.pending_count).label("pending_count"),
+    ).where(
+        rollup.day >= buckets[0],
+        rollup.day <= end
+    ).group_by("period")
+    if user_id is not None:
+        stmt = stmt.where(rollup.user_id == user_id)
+    rows = (await db.execute(stmt)).all()
+
+    found = {row.period: row[1:] for row in rows}
+    empty = (0.0, 0.0, 0, 0)
+    series = []
+    for bucket in buckets:
+        paid, pending, paid_count, pending_count = found.get(bucket, empty)
+        series.append({
+            "period": bucket,
+            "paid": paid,
+            "pending": pending,
+            "paid_count": paid_count,
+            "pending_count": pending_count,
+        })
+    return series
+
+
+async def monthly_trend(db, user_id: int = None, today: date = None) -> list:
+    """
+    The dashboards' bar graph: the last twelve months, oldest first. The
+    current month's bucket runs to the month's last day, so invoices issued
+    later this month count in it (and in "completed this month").
+    """
+    today = today or date.today()
+    month_end = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    start = today.replace(day=1)
+    for _ in range(11):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return await trend_series(db, user_id, start, month_end, "month")